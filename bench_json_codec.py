@@ -0,0 +1,147 @@
+# bench_json_codec.py
+# JSON 디코드/인코드 행당 비용 비교: 표준 json(기존) vs encar_codec(선택된 백엔드)
+# - payload 소스: encar_dump.db raw 테이블 (없거나 비어 있으면 encar_100cars_detail.xlsx에서 payload 모양 복원)
+#
+# 사용:
+#   python bench_json_codec.py
+#   python bench_json_codec.py --rows 2000 --repeat 5
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import encar_codec
+import encar_db
+
+XLSX_PATH = Path("encar_100cars_detail.xlsx")
+
+# xlsx 시트 -> raw 테이블 (컬럼이 "vehicle.xxx.yyy" 처럼 평탄화돼 있음)
+XLSX_SHEETS = {
+    "vehicle_raw": ("vehicle_detail", "vehicle."),
+    "inspection_raw": ("inspection_detail_raw", "inspection."),
+    "record_raw": ("record_detail_raw", "record."),
+    "user_raw": ("seller_user", "user."),
+}
+
+
+def load_from_db(rows: int) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    if not encar_db.DB_PATH.exists():
+        return out
+    con = sqlite3.connect(str(encar_db.DB_PATH))
+    try:
+        for table in encar_codec.RAW_TABLES:
+            try:
+                got = con.execute(
+                    f"SELECT payload FROM {table} WHERE payload IS NOT NULL LIMIT ?", (rows,)
+                ).fetchall()
+            except sqlite3.Error:
+                continue
+            texts = [t for t in (encar_codec.decode_payload(r[0]) for r in got) if t]
+            if texts:
+                out[table] = texts
+    finally:
+        con.close()
+    return out
+
+
+def _cell(v: Any) -> Any:
+    if isinstance(v, str) and v[:1] in "[{":
+        try:
+            return json.loads(v)
+        except Exception:
+            return v
+    return v
+
+
+def load_from_xlsx() -> Dict[str, List[str]]:
+    """
+    평탄화된 엑셀 행을 다시 중첩 dict로 (리스트 값은 JSON 문자열로 들어 있음)
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(XLSX_PATH, read_only=True)
+    out: Dict[str, List[str]] = {}
+
+    for table, (sheet, prefix) in XLSX_SHEETS.items():
+        it = wb[sheet].iter_rows(values_only=True)
+        header = next(it)
+        texts = []
+        for row in it:
+            obj: Dict[str, Any] = {}
+            for k, v in zip(header, row):
+                if not k or not str(k).startswith(prefix) or v is None:
+                    continue
+                parts = str(k)[len(prefix):].split(".")
+                cur = obj
+                for p in parts[:-1]:
+                    if not isinstance(cur.get(p), dict):
+                        cur[p] = {}
+                    cur = cur[p]
+                cur[parts[-1]] = _cell(v)
+            texts.append(json.dumps(obj, ensure_ascii=False))
+        out[table] = texts
+
+    by_car: Dict[Any, List[Dict[str, Any]]] = {}
+    it = wb["options_choice_raw"].iter_rows(values_only=True)
+    header = next(it)
+    for row in it:
+        d = dict(zip(header, row))
+        by_car.setdefault(d.get("carId"), []).append(
+            {k[len("option."):]: v for k, v in d.items() if k and k.startswith("option.")}
+        )
+    out["options_choice_raw"] = [json.dumps(v, ensure_ascii=False) for v in by_car.values()]
+    return out
+
+
+def per_row_us(fn, items: List[Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for x in items:
+            fn(x)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e6 / max(1, len(items))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="JSON codec 행당 비용 벤치마크")
+    ap.add_argument("--rows", type=int, default=1000, help="raw 테이블별 최대 샘플 행 수")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    samples = load_from_db(args.rows)
+    source = str(encar_db.DB_PATH)
+    if not samples:
+        samples = load_from_xlsx()
+        source = str(XLSX_PATH)
+
+    print(f"source={source} backend={encar_codec.JSON_BACKEND} (loads/dumps)")
+    print(f"{'table':<20}{'rows':>6}{'avg_kb':>8}{'loads json':>12}{'loads new':>11}{'x':>6}"
+          f"{'dumps json':>12}{'dumps new':>11}{'x':>6}")
+
+    for table, texts in samples.items():
+        objs = [json.loads(t) for t in texts]
+
+        # 바이트 호환 확인 (content_hash가 바뀌면 안 됨)
+        for o in objs:
+            assert encar_codec.dumps(o, sort_keys=True) == json.dumps(
+                o, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+            ), f"{table}: dumps mismatch"
+            assert encar_codec.loads(encar_codec.dumps(o)) == o, f"{table}: loads mismatch"
+
+        l_old = per_row_us(json.loads, texts, args.repeat)
+        l_new = per_row_us(encar_codec.loads, texts, args.repeat)
+        d_old = per_row_us(lambda o: json.dumps(o, ensure_ascii=False), objs, args.repeat)
+        d_new = per_row_us(encar_codec.dumps, objs, args.repeat)
+        avg_kb = sum(len(t.encode("utf-8")) for t in texts) / len(texts) / 1024
+
+        print(f"{table:<20}{len(texts):>6}{avg_kb:>8.1f}{l_old:>10.1f}us{l_new:>9.1f}us{l_old / l_new:>5.1f}x"
+              f"{d_old:>10.1f}us{d_new:>9.1f}us{d_old / d_new:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
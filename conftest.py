@@ -0,0 +1,33 @@
+import pytest
+
+import encar_db
+import encar_seed_queue as sq
+import encar_worker
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "t.db"
+
+
+@pytest.fixture
+def con(db_path):
+    """Fresh encar DB (init_db) in tmp_path"""
+    con = encar_db.connect(db_path)
+    encar_db.init_db(con)
+    yield con
+    con.close()
+
+
+@pytest.fixture
+def seed_con(con):
+    """`con` plus the seeder tables (car_state, car_presence, seed_days, ...)"""
+    sq.ensure_tables(con)
+    return con
+
+
+@pytest.fixture
+def worker_db(con, db_path, monkeypatch):
+    """`con` with encar_worker.connect pointed at the same file (ResultWriter opens its own connection)"""
+    monkeypatch.setattr(encar_worker, "connect", lambda **kw: encar_db.connect(db_path, **kw))
+    return con
@@ -1,42 +1,62 @@
 from django.contrib import admin
-from .models import CarQueue, VehicleRaw, InspectionRaw, RecordRaw, OptionsChoiceRaw
+import encar_codec
+from .models import CarQueue, VehicleRaw, InspectionRaw, RecordRaw, OptionsChoiceRaw, VehicleFlat
 print("✅ encar.admin loaded")
 
+
+class PayloadTextMixin:
+    # payload가 압축 BLOB(encar_codec)이어도 JSON 텍스트로 보여줌
+    exclude = ("payload",)
+
+    @admin.display(description="payload")
+    def payload_text(self, obj):
+        return encar_codec.decode_payload(obj.payload)
+
 @admin.register(CarQueue)
 class CarQueueAdmin(admin.ModelAdmin):
-    list_display = ("car_id", "status", "retry_count", "updated_at")
-    list_filter = ("status",)
-    search_fields = ("car_id",)
+    list_display = (
+        "car_id", "status", "retry_count", "error_class", "next_attempt_at", "worker_id", "lease_until", "updated_at",
+    )
+    list_filter = ("status", "error_class")
+    search_fields = ("car_id", "worker_id")
     ordering = ("-updated_at",)
 
 
 @admin.register(VehicleRaw)
-class VehicleRawAdmin(admin.ModelAdmin):
+class VehicleRawAdmin(PayloadTextMixin, admin.ModelAdmin):
     list_display = ("car_id", "title", "year", "mileage", "price", "fetched_at")
     search_fields = ("car_id",)
     ordering = ("-fetched_at",)
-    readonly_fields = ("car_id", "payload", "fetched_at")
+    readonly_fields = ("car_id", "payload_text", "fetched_at")
 
 
 @admin.register(InspectionRaw)
-class InspectionRawAdmin(admin.ModelAdmin):
+class InspectionRawAdmin(PayloadTextMixin, admin.ModelAdmin):
     list_display = ("car_id", "vehicle_id", "is_not_found", "fetched_at")
     search_fields = ("car_id",)
     ordering = ("-fetched_at",)
-    readonly_fields = ("car_id", "payload", "fetched_at")
+    readonly_fields = ("car_id", "payload_text", "fetched_at")
 
 
 @admin.register(RecordRaw)
-class RecordRawAdmin(admin.ModelAdmin):
+class RecordRawAdmin(PayloadTextMixin, admin.ModelAdmin):
     list_display = ("car_id", "vehicle_no", "accident_cnt", "owner_change_cnt", "fetched_at")
     search_fields = ("car_id", "vehicle_no")
     ordering = ("-fetched_at",)
-    readonly_fields = ("car_id", "vehicle_no", "payload", "fetched_at")
+    readonly_fields = ("car_id", "vehicle_no", "payload_text", "fetched_at")
 
 
 @admin.register(OptionsChoiceRaw)
-class OptionsChoiceRawAdmin(admin.ModelAdmin):
+class OptionsChoiceRawAdmin(PayloadTextMixin, admin.ModelAdmin):
     list_display = ("car_id", "options_count", "options_top", "fetched_at")
     search_fields = ("car_id",)
     ordering = ("-fetched_at",)
-    readonly_fields = ("car_id", "payload", "fetched_at")
+    readonly_fields = ("car_id", "payload_text", "fetched_at")
+
+
+@admin.register(VehicleFlat)
+class VehicleFlatAdmin(admin.ModelAdmin):
+    list_display = ("car_id", "maker", "model", "trim", "model_year", "mileage", "price", "accident", "updated_at")
+    list_filter = ("maker", "accident", "simple_repair")
+    search_fields = ("car_id", "vehicle_no", "model", "trim")
+    ordering = ("-updated_at",)
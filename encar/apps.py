@@ -1,5 +1,15 @@
 from django.apps import AppConfig
 
+
 class EncarConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "encar"
\ No newline at end of file
+    name = "encar"
+
+    def ready(self):
+        from django.conf import settings
+
+        import encar_codec
+
+        db = settings.DATABASES.get("encar")
+        if db:
+            encar_codec.set_dict_db(db["NAME"])
@@ -0,0 +1,113 @@
+# encar/caches.py
+# 화면 API 프로세스 내 캐시
+# - 키에 vehicle_flat data_version(encar_db 트리거가 행 변경마다 +1)을 넣어서 데이터가 바뀌면 자동으로 안 맞게 됨
+#   (옛 버전 항목은 따로 지우지 않고 LRU로 밀려남)
+# - count: (정규화된 검색조건, 집계 방식, 버전) -> 전체 매물 수
+# - response: (endpoint, 정규화된 검색조건, sample, 버전) -> 응답 JSON 바이트 (전체 크기 RESPONSE_CACHE_BYTES 이하)
+
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from cachetools import LRUCache
+from django.db import DatabaseError
+from django.http import HttpResponse
+
+# -------------------------
+# 설정
+# -------------------------
+COUNT_CACHE_SIZE = 1024
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+
+_counts: LRUCache = LRUCache(maxsize=COUNT_CACHE_SIZE)
+_responses: LRUCache = LRUCache(maxsize=RESPONSE_CACHE_BYTES, getsizeof=len)
+_lock = threading.Lock()
+_MISS = object()
+
+# 이름별 hit/miss (count, summary, price-analysis ...)
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _record(name: str, hit: bool) -> None:
+    s = _stats.setdefault(name, {"hit": 0, "miss": 0})
+    s["hit" if hit else "miss"] += 1
+
+
+def data_version(cur) -> Optional[int]:
+    """
+    vehicle_flat 내용 버전 (data_version 테이블이 없는 옛 DB면 None -> 캐시 안 씀)
+    """
+    try:
+        cur.execute("SELECT version FROM data_version WHERE name = 'vehicle_flat'")
+        row = cur.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0]) if row else None
+
+
+def normalize_filter(tokens: List[str]) -> Tuple[str, ...]:
+    """
+    검색 토큰 -> 캐시 키 (AND 검색이라 순서/중복 무관, LIKE/trigram 둘 다 ASCII 대소문자 무시)
+    """
+    return tuple(sorted({t.lower() if t.isascii() else t for t in tokens}))
+
+
+def cached_count(cur, key: Hashable, compute: Callable[[], Any]) -> Any:
+    """
+    key + 현재 data_version 으로 count 결과 캐시 (없으면 compute() 후 저장)
+    """
+    version = data_version(cur)
+    if version is None:
+        return compute()
+    full_key = (key, version)
+    with _lock:
+        hit = _counts.get(full_key, _MISS)
+        _record("count", hit is not _MISS)
+    if hit is not _MISS:
+        return hit
+    value = compute()
+    with _lock:
+        _counts[full_key] = value
+    return value
+
+
+def get_response(endpoint: str, key: Hashable, version: Optional[int]) -> Optional[HttpResponse]:
+    """
+    캐시된 응답 (없으면 None) - 저장된 JSON 바이트를 그대로 돌려줘서 집계/직렬화 없음
+    """
+    if version is None:
+        return None
+    with _lock:
+        body = _responses.get((endpoint, key, version))
+        _record(endpoint, body is not None)
+    if body is None:
+        return None
+    resp = HttpResponse(body, content_type="application/json")
+    resp["X-Cache"] = "HIT"
+    return resp
+
+
+def put_response(endpoint: str, key: Hashable, version: Optional[int], resp: HttpResponse) -> HttpResponse:
+    """
+    정상(200) 응답 본문 저장 (RESPONSE_CACHE_BYTES보다 큰 응답은 cachetools가 ValueError -> 저장 안 함)
+    """
+    if version is not None and resp.status_code == 200:
+        with _lock:
+            try:
+                _responses[(endpoint, key, version)] = resp.content
+            except ValueError:
+                pass
+    resp["X-Cache"] = "MISS"
+    return resp
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "hits": {k: dict(v) for k, v in _stats.items()},
+            "count": {"entries": len(_counts), "max_entries": _counts.maxsize},
+            "response": {
+                "entries": len(_responses),
+                "bytes": _responses.currsize,
+                "max_bytes": _responses.maxsize,
+            },
+        }
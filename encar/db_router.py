@@ -6,6 +6,7 @@ class EncarRouter:
         "record_raw",
         "options_choice_raw",
         "user_raw",
+        "vehicle_flat",
     }
 
     def db_for_read(self, model, **hints):
@@ -3,7 +3,8 @@ from django.db import models
 # Create your models here.
 
 from django.db import models
-import json
+
+import encar_codec
 
 class CarQueue(models.Model):
     car_id = models.TextField(primary_key=True)
@@ -11,6 +12,10 @@ class CarQueue(models.Model):
     retry_count = models.IntegerField()
     last_error = models.TextField(null=True)
     updated_at = models.TextField(null=True)
+    worker_id = models.TextField(null=True)
+    lease_until = models.TextField(null=True)
+    error_class = models.TextField(null=True)
+    next_attempt_at = models.TextField(null=True)
 
     class Meta:
         db_table = "car_queue"
@@ -28,7 +33,7 @@ class VehicleRaw(models.Model):
 
     def _json(self):
         try:
-            return json.loads(self.payload) if self.payload else {}
+            return encar_codec.loads_payload(self.payload, {}) or {}
         except Exception:
             return {}
 
@@ -61,7 +66,7 @@ class InspectionRaw(models.Model):
 
     def _json(self):
         try:
-            return json.loads(self.payload) if self.payload else {}
+            return encar_codec.loads_payload(self.payload, {}) or {}
         except Exception:
             return {}
 
@@ -86,7 +91,7 @@ class RecordRaw(models.Model):
 
     def _json(self):
         try:
-            return json.loads(self.payload) if self.payload else {}
+            return encar_codec.loads_payload(self.payload, {}) or {}
         except Exception:
             return {}
 
@@ -110,7 +115,7 @@ class OptionsChoiceRaw(models.Model):
 
     def _json(self):
         try:
-            return json.loads(self.payload) if self.payload else []
+            return encar_codec.loads_payload(self.payload, []) or []
         except Exception:
             return []
 
@@ -130,3 +135,31 @@ class OptionsChoiceRaw(models.Model):
                     names.append(str(n))
         return " | ".join(names)
 
+
+
+class VehicleFlat(models.Model):
+    car_id = models.TextField(primary_key=True)
+    vehicle_no = models.TextField(null=True)
+    maker = models.TextField(null=True)
+    model = models.TextField(null=True)
+    trim = models.TextField(null=True)
+    sub_trim = models.TextField(null=True)
+    model_year = models.IntegerField(null=True)
+    first_reg = models.TextField(null=True)
+    fuel = models.TextField(null=True)
+    body = models.TextField(null=True)
+    color = models.TextField(null=True)
+    mileage = models.IntegerField(null=True)
+    price = models.IntegerField(null=True)
+    accident = models.IntegerField()
+    simple_repair = models.IntegerField()
+    accident_summary = models.TextField(null=True)
+    insurance_summary = models.TextField(null=True)
+    options_std = models.TextField(null=True)
+    options_paid = models.TextField(null=True)
+    option_paid_sum = models.IntegerField()
+    updated_at = models.TextField(null=True)
+
+    class Meta:
+        db_table = "vehicle_flat"
+        managed = False
@@ -9,4 +9,6 @@ urlpatterns = [
     path("api/debug/table", views.debug_table_api),
     path("api/combine/summary", views.combine_summary_api),
     path("api/combine/price-analysis", views.combine_price_analysis_api),
+    path("api/projection/lag", views.projection_lag_api),
+    path("api/cache/stats", views.cache_stats_api),
 ]
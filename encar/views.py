@@ -1,3 +1,4 @@
+import base64
 import json
 import re
 from datetime import datetime
@@ -9,59 +10,58 @@ from django.shortcuts import render
 
 from openpyxl import Workbook
 
+import encar_codec
+from encar_flat import combined_row_from_flat, lag_report
+
+from .caches import cache_stats, cached_count, data_version, get_response, normalize_filter, put_response
+
 
 # =========================================================
 # 설정
 # =========================================================
 DB_ALIAS = "encar"
 
-ACCIDENT_CODES = {"X", "W", "C"}
-
-OPTION_CODE_MAP: Dict[str, str] = {
-    "10": "선루프",
-    "1": "헤드램프(HID, LED)",
-    "59": "파워 전동 트렁크",
-    "80": "고스트 도어 클로징",
-    "24": "전동접이 사이드 미러",
-    "17": "알루미늄 휠",
-    "62": "루프랙",
-    "82": "열선 스티어링 휠",
-    "83": "전동 조절 스티어링 휠",
-    "84": "패들 시프트",
-    "31": "스티어링 휠 리모컨",
-    "30": "ECM 룸미러",
-    "74": "하이패스",
-    "6": "파워 도어록",
-    "8": "파워 스티어링 휠",
-    "7": "파워 윈도우",
-
-    "2": "에어백(운전석, 동승석)",
-    "20": "에어백(사이드)",
-    "56": "에어백(커튼)",
-    "19": "미끄럼 방지(TCS)",
-    "55": "차체자세 제어장치(ESC)",
-    "33": "타이어 공기압센서(TPMS)",
-    "88": "차선이탈 경보 시스템(LDWS)",
-    "86": "후측방 경보 시스템",
-    "58": "후방 카메라",
-    "87": "360도 어라운드 뷰",
-
-    "4": "크루즈 컨트롤(일반, 어댑티브)",
-    "95": "헤드업 디스플레이(HUD)",
-    "94": "전자식 주차브레이크(EPB)",
-    "23": "자동 에어컨",
-    "57": "스마트키",
-    "15": "무선도어 잠금장치",
-    "81": "레인센서",
-    "97": "오토 라이트",
-    "96": "블루투스",
-    "72": "USB 단자",
-    "71": "AUX 단자",
-
-    "14": "가죽시트",
-    "89": "전동시트(뒷좌석)",
-    "90": "통풍시트(뒷좌석)",
-    "91": "마사지 시트",
+# 목록/집계는 vehicle_flat(encar_flat.py가 수집 시점에 채우는 평탄화 테이블)에서 컬럼으로 바로 읽음
+FLAT_SELECT = """
+SELECT
+  f.rowid AS rid, f.car_id, f.vehicle_no, f.maker, f.model, f.trim, f.sub_trim, f.model_year, f.first_reg,
+  f.fuel, f.body, f.color, f.mileage, f.price, f.accident, f.simple_repair,
+  f.accident_summary, f.insurance_summary, f.options_std, f.options_paid, f.option_paid_sum
+FROM vehicle_flat f
+"""
+
+# 키워드 매칭 대상: 문자 토큰은 제조사/모델/트림/세부트림/차량번호, 숫자 토큰은 모델/트림/세부트림만 (옵션/이력 잡매칭 방지)
+FLAT_BROAD_COLS = ("maker", "model", "trim", "sub_trim", "vehicle_no")
+FLAT_NUMERIC_COLS = ("model", "trim", "sub_trim")
+
+# 3글자 이상 토큰은 FTS5 trigram 인덱스(vehicle_flat_fts)로 찾음 (trigram은 3글자 미만을 못 찾음)
+FTS_MIN_TOKEN = 3
+_HAS_FTS = False
+
+# 주행거리 구간 (km, 하한 포함/상한 미포함)
+MILEAGE_RANGES: List[Tuple[int, Optional[int], str]] = [
+    (0, 30000, "0-3만km"),
+    (30000, 60000, "3-6만km"),
+    (60000, 100000, "6-10만km"),
+    (100000, 150000, "10-15만km"),
+    (150000, 200000, "15-20만km"),
+    (200000, None, "20만km+"),
+]
+
+
+# withTotal=estimate: 짧은 토큰만 있는(LIKE 전체 스캔) 검색은 rowid 구간 표본으로 추정
+# - 표본에서 ESTIMATE_MIN_HITS 건 이상 걸리는 넓은 검색만 추정, 드문 검색은 추정이 부정확하니 정확히 셈
+ESTIMATE_BLOCKS = 20
+ESTIMATE_BLOCK_ROWS = 500
+ESTIMATE_MIN_HITS = 200
+
+# 목록 정렬 (keyset 페이지네이션: 정렬 컬럼 인덱스를 커서 다음 위치부터 읽으므로 깊은 페이지도 첫 페이지와 같은 비용)
+# - 인덱스가 있는 컬럼만 허용, car_id 외에는 같은 값끼리 f.rowid로 순서 고정 (인덱스 항목이 (값, rowid) 순이라 정렬 없음)
+# - NULL은 SQLite 기본대로 오름차순 맨 앞 / 내림차순 맨 뒤
+LIST_SORTS = {
+    "car_id": "f.car_id",
+    "price": "f.price",
+    "mileage": "f.mileage",
 }
 
 
@@ -78,135 +78,182 @@ def is_numeric_token(t: str) -> bool:
     # 5.0 / 3.3 / 3800 등
     return bool(re.fullmatch(r"\d+(\.\d+)?", t))
 
-def row_matches_tokens(vraw: Dict[str, Any], tokens: List[str]) -> bool:
+def has_fts() -> bool:
     """
-    2차 정밀 필터:
-    - 문자열 토큰은 제조사/모델/트림/세부트림/차량번호에서 AND 매칭
-    - 숫자 토큰은 트림/세부트림/모델명 위주로 AND 매칭(옵션/이력에서 매칭 방지)
+    vehicle_flat_fts(encar_db.ensure_fts) 존재 여부 (있으면 프로세스 동안 기억)
     """
-    maker = str(safe_get(vraw, ["category", "manufacturerName"]) or "").lower()
-    model = str(safe_get(vraw, ["category", "modelName"]) or "").lower()
-    trim  = str(safe_get(vraw, ["category", "gradeName"]) or "").lower()
-    subtrim = str(safe_get(vraw, ["category", "gradeDetailName"]) or "").lower()
-    carno = str(safe_get(vraw, ["vehicleNo"]) or "").lower()
+    global _HAS_FTS
+    if not _HAS_FTS:
+        with connections[DB_ALIAS].cursor() as cur:
+            cur.execute("SELECT 1 FROM sqlite_master WHERE name='vehicle_flat_fts'")
+            _HAS_FTS = cur.fetchone() is not None
+    return _HAS_FTS
 
-    # 넓은 텍스트(문자 토큰은 여기도 허용)
-    broad_text = " ".join([maker, model, trim, subtrim, carno])
 
-    # 숫자 토큰은 여기만 보자(잡매칭 방지)
-    numeric_text = " ".join([model, trim, subtrim])
+def fts_phrase(t: str, numeric: bool) -> str:
+    cols = " ".join(FLAT_NUMERIC_COLS if numeric else FLAT_BROAD_COLS)
+    return f'{{{cols}}} : "{t.replace(chr(34), chr(34) * 2)}"'
 
+
+def fts_split(tokens: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    토큰 -> (FTS MATCH 구문 목록, LIKE로 찾을 짧은 토큰 목록)
+    """
+    fts = has_fts()
+    phrases, short = [], []
     for t in tokens:
-        tt = t.lower()
-        if is_numeric_token(tt):
-            if tt not in numeric_text:
-                return False
+        if fts and len(t) >= FTS_MIN_TOKEN:
+            phrases.append(fts_phrase(t, is_numeric_token(t)))
         else:
-            if tt not in broad_text:
-                return False
-    return True
+            short.append(t)
+    return phrases, short
 
 
-def yn(v: Any) -> str:
-    return "Y" if bool(v) else "N"
+def keyword_where(tokens: List[str], ordered: bool = False) -> Tuple[str, List[Any]]:
+    """
+    토큰 AND 검색 -> (" WHERE ..." | "", params)
+    - 문자 토큰은 제조사/모델/트림/세부트림/차량번호, 숫자 토큰은 모델/트림/세부트림에서 부분 일치
+    - FTS_MIN_TOKEN 글자 이상 토큰은 vehicle_flat_fts MATCH 한 번으로, 짧은 토큰(K7, 기아 등)은 컬럼별 LIKE로
+    - ordered=True(ORDER BY car_id LIMIT): +f.rowid로 rowid 조회를 막아 car_id 인덱스 순으로 훑다가 LIMIT에서 멈춤
+      (매칭이 수만 건이면 rowid 조회 + 정렬보다 훨씬 빠르고, 적어도 인덱스 한 번 훑기로 상한이 있음)
+    """
+    if not tokens:
+        return "", []
+    phrases, short = fts_split(tokens)
+    conds = []
+    params: List[Any] = []
+    if phrases:
+        conds.append(("+f.rowid" if ordered else "f.rowid")
+                     + " IN (SELECT rowid FROM vehicle_flat_fts WHERE vehicle_flat_fts MATCH %s)")
+        params.append(" AND ".join(phrases))
+    for t in short:
+        cols = FLAT_NUMERIC_COLS if is_numeric_token(t) else FLAT_BROAD_COLS
+        conds.append("(" + " OR ".join(f"f.{c} LIKE %s" for c in cols) + ")")
+        params.extend([f"%{t}%"] * len(cols))
+    return " WHERE " + " AND ".join(conds), params
+
+
+def count_matches(cur, tokens: List[str]) -> int:
+    """
+    검색조건 전체 매물 수 (토큰이 전부 FTS면 vehicle_flat 안 거치고 FTS 인덱스에서 바로 셈)
+    """
+    phrases, short = fts_split(tokens)
+    if phrases and not short:
+        cur.execute("SELECT COUNT(*) FROM vehicle_flat_fts WHERE vehicle_flat_fts MATCH %s", [" AND ".join(phrases)])
+    else:
+        where_sql, params = keyword_where(tokens)
+        cur.execute("SELECT COUNT(*) FROM vehicle_flat f" + where_sql, params)
+    return int(cur.fetchone()[0])
 
 
-def normalize_opt_code(code: Any) -> str:
-    s = str(code).strip()
-    s2 = s.lstrip("0")
-    return s2 if s2 else "0"
+def estimate_matches(cur, tokens: List[str]) -> Optional[int]:
+    """
+    rowid 전 구간에 고르게 ESTIMATE_BLOCKS개 블록을 떠서 매칭 비율 x 전체 행 수
+    - 표본 매칭이 ESTIMATE_MIN_HITS 미만이면 None (정확히 세야 함)
+    """
+    cur.execute("SELECT MIN(rowid), MAX(rowid) FROM vehicle_flat")
+    lo, hi = cur.fetchone()
+    if lo is None:
+        return 0
+    where_sql, params = keyword_where(tokens)
+    step = max(ESTIMATE_BLOCK_ROWS, (hi - lo + 1) // ESTIMATE_BLOCKS)
+    seen = hits = 0
+    for start in range(lo, hi + 1, step):
+        rng = [start, start + ESTIMATE_BLOCK_ROWS - 1]
+        cur.execute("SELECT COUNT(*) FROM vehicle_flat f WHERE f.rowid BETWEEN %s AND %s", rng)
+        seen += int(cur.fetchone()[0])
+        cur.execute(f"SELECT COUNT(*) FROM vehicle_flat f{where_sql} AND f.rowid BETWEEN %s AND %s", params + rng)
+        hits += int(cur.fetchone()[0])
+    if hits < ESTIMATE_MIN_HITS or seen == 0:
+        return None
+    cur.execute("SELECT COUNT(*) FROM vehicle_flat")
+    return int(round(hits / seen * int(cur.fetchone()[0])))
 
 
-def parse_json_maybe(v: Any) -> Any:
-    if v is None:
-        return None
-    if isinstance(v, (dict, list)):
-        return v
-    if isinstance(v, (bytes, bytearray)):
-        v = v.decode("utf-8", errors="ignore")
-    if isinstance(v, str):
-        t = v.strip()
-        if not t:
-            return None
-        try:
-            return json.loads(t)
-        except Exception:
-            return None
-    return None
-
-
-def safe_get(d: Any, path: List[Any], default=None):
-    cur = d
-    for p in path:
-        if cur is None:
-            return default
-        if isinstance(p, int):
-            if isinstance(cur, list) and 0 <= p < len(cur):
-                cur = cur[p]
-            else:
-                return default
-        else:
-            if isinstance(cur, dict) and p in cur:
-                cur = cur[p]
-            else:
-                return default
-    return default if cur is None else cur
+def total_matches(cur, tokens: List[str], estimate: bool = False) -> Tuple[int, bool]:
+    """
+    전체 매물 수 -> (total, 추정 여부)
+    - 정규화된 검색조건 + data_version 으로 캐시 (페이지 넘길 때마다 다시 세지 않음)
+    - estimate=True면 짧은 토큰만 있는 넓은 검색만 표본 추정 (FTS 토큰이 하나라도 있으면 정확히 세도 빠름)
+    """
+    key = normalize_filter(tokens)
+    phrases, short = fts_split(tokens)
+    if estimate and short and not phrases:
+        est = cached_count(cur, ("estimate", key), lambda: estimate_matches(cur, tokens))
+        if est is not None:
+            return est, True
+    return cached_count(cur, ("count", key), lambda: count_matches(cur, tokens)), False
 
 
-def yyyymmdd_to_iso(s: Optional[str]) -> str:
-    if not s:
-        return ""
-    s = str(s).strip()
-    if len(s) == 8 and s.isdigit():
-        return f"{s[0:4]}-{s[4:6]}-{s[6:8]}"
-    return s
+def encode_cursor(sort: str, desc: bool, value: Any, rid: int) -> str:
+    raw = json.dumps([sort, int(desc), value, rid], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
 
 
-def to_int(v: Any, default: int = 0) -> int:
+def decode_cursor(token: str) -> Tuple[str, bool, Any, int]:
+    """
+    after 커서 -> (sort, desc, 마지막 행 정렬값, 마지막 행 rowid)
+    - 깨졌거나 지금 정렬과 다른 커서면 ValueError
+    """
     try:
-        if v is None:
-            return default
-        if isinstance(v, bool):
-            return int(v)
-        if isinstance(v, (int, float)):
-            return int(v)
-        s = str(v).strip().replace(",", "")
-        if s == "":
-            return default
-        return int(float(s))
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort, desc, value, rid = json.loads(raw)
+        return str(sort), bool(desc), value, int(rid)
     except Exception:
-        return default
+        raise ValueError("invalid after cursor")
 
 
-def percentile(sorted_vals: List[int], p: float) -> int:
-    if not sorted_vals:
-        return 0
+def list_order_sql(sort: str, desc: bool) -> str:
+    d = " DESC" if desc else ""
+    col = LIST_SORTS[sort]
+    if sort == "car_id":
+        return f" ORDER BY {col}{d}"
+    return f" ORDER BY {col}{d}, f.rowid{d}"
+
+
+def after_segments(sort: str, desc: bool, value: Any, rid: int) -> List[Tuple[str, List[Any]]]:
+    """
+    커서 다음 행 조건들 (ORDER BY list_order_sql(sort, desc) 순서대로 앞 구간부터 읽음)
+    - NULL 구간/같은 값 구간/나머지 값 구간을 OR로 묶으면 인덱스 범위 탐색이 안 돼서 구간을 나눠 차례로 조회
+      (같은 값이 수만 건이어도 (값, rowid)로 바로 찾아감)
+    """
+    col = LIST_SORTS[sort]
+    op = "<" if desc else ">"
+    if sort == "car_id":
+        return [(f"{col} {op} %s", [value])]
+    if value is None:
+        null_seg = (f"{col} IS NULL AND f.rowid {op} %s", [rid])
+        return [null_seg] if desc else [null_seg, (f"{col} IS NOT NULL", [])]
+    segs = [(f"{col} = %s AND f.rowid {op} %s", [value, rid]), (f"{col} {op} %s", [value])]
+    return segs + [(f"{col} IS NULL", [])] if desc else segs
+
+
+def sampled_source(tokens: List[str], sample: int) -> Tuple[str, List[Any]]:
+    """
+    집계 대상 서브쿼리 (sample>0이면 car_id 순 처음 N대만)
+    """
+    if sample > 0:
+        where_sql, params = keyword_where(tokens, ordered=True)
+        return f"(SELECT f.* FROM vehicle_flat f{where_sql} ORDER BY f.car_id LIMIT %s)", params + [sample]
+    where_sql, params = keyword_where(tokens)
+    return f"(SELECT f.* FROM vehicle_flat f{where_sql})", params
+
+
+def percentile_index(n: int, p: float) -> int:
     # p: 0~1
-    n = len(sorted_vals)
     idx = int(round((n - 1) * p))
-    idx = max(0, min(n - 1, idx))
-    return sorted_vals[idx]
-
-def _parse_options_choice_payload(payload: Any) -> List[Dict[str, Any]]:
-    p = parse_json_maybe(payload)
-    if isinstance(p, list):
-        return [x for x in p if isinstance(x, dict)]
-    if isinstance(p, dict):
-        return [p]
-    return []
+    return max(0, min(n - 1, idx))
 
 
-def make_hist(values: List[int], bins: int = 12) -> Dict[str, Any]:
+def make_hist(cur, src_sql: str, params: List[Any], mn: int, mx: int, n: int, bins: int = 12) -> Dict[str, Any]:
     """
-    가격 히스토그램: bins개 구간으로 쪼개서 {labels, counts, min, max}
+    가격 히스토그램: bins개 구간으로 쪼개서 {labels, counts, min, max} (구간별 개수는 SQL GROUP BY)
     """
-    values = [v for v in values if v > 0]
-    if not values:
+    if n <= 0:
         return {"labels": [], "counts": [], "min": 0, "max": 0, "bin_size": 0}
 
-    mn, mx = min(values), max(values)
     if mn == mx:
-        return {"labels": [f"{mn:,}"], "counts": [len(values)], "min": mn, "max": mx, "bin_size": 0}
+        return {"labels": [f"{mn:,}"], "counts": [n], "min": mn, "max": mx, "bin_size": 0}
 
     span = mx - mn
     bin_size = max(1, int(span / bins))
@@ -214,11 +261,12 @@ def make_hist(values: List[int], bins: int = 12) -> Dict[str, Any]:
     # bin_size = ((bin_size + 9999) // 10000) * 10000  # 1만원 단위로
     counts = [0] * bins
 
-    for v in values:
-        i = int((v - mn) / bin_size)
-        if i >= bins:
-            i = bins - 1
-        counts[i] += 1
+    cur.execute(
+        f"SELECT MIN((s.price - %s) / %s, %s) AS b, COUNT(*) FROM {src_sql} s WHERE s.price > 0 GROUP BY b",
+        [mn, bin_size, bins - 1] + params,
+    )
+    for i, c in cur.fetchall():
+        counts[int(i)] = int(c)
 
     labels = []
     for i in range(bins):
@@ -229,30 +277,13 @@ def make_hist(values: List[int], bins: int = 12) -> Dict[str, Any]:
     return {"labels": labels, "counts": counts, "min": mn, "max": mx, "bin_size": bin_size}
 
 
+def mileage_range_case() -> str:
+    parts = []
+    for lo, hi, name in MILEAGE_RANGES:
+        cond = f"s.mileage >= {lo}" + (f" AND s.mileage < {hi}" if hi is not None else "")
+        parts.append(f"WHEN {cond} THEN '{name}'")
+    return "CASE " + " ".join(parts) + " END"
 
-# --------------------------
-# LATEST JOIN (빠른 버전)
-# --------------------------
-LATEST_JOIN_SQL = """
-SELECT
-  v.car_id,
-  v.payload AS vehicle_payload,
-  i.payload AS inspection_payload,
-  r.payload AS record_payload,
-  o.payload AS options_choice_payload
-FROM vehicle_raw_latest v
-LEFT JOIN inspection_raw_latest i ON i.car_id = v.car_id
-LEFT JOIN record_raw_latest r ON r.car_id = v.car_id
-LEFT JOIN options_choice_raw_latest o ON o.car_id = v.car_id
-"""
-
-def _parse_options_choice_payload(payload: Any) -> List[Dict[str, Any]]:
-    p = parse_json_maybe(payload)
-    if isinstance(p, list):
-        return [x for x in p if isinstance(x, dict)]
-    if isinstance(p, dict):
-        return [p]
-    return []
 
 # --------------------------
 # summary API
@@ -261,117 +292,64 @@ def combine_price_analysis_api(request: HttpRequest):
     """
     /encar/api/combine/price-analysis?keyword=K7
     - 연식별, 주행거리별 시세 분석
-    - 연식과 주행거리 구간별로 평균 가격을 제공
+    - 연식과 주행거리 구간별로 평균 가격을 제공 (vehicle_flat GROUP BY)
+    - 응답은 (검색조건, sample, data_version) 키로 캐시 (X-Cache: HIT|MISS)
     """
     try:
         keyword = (request.GET.get("keyword") or "").strip()
         sample = int(request.GET.get("sample", "5000"))  # 0이면 전체
         sample = max(0, sample)
 
-        conn = connections[DB_ALIAS]
-
-        where_sql = ""
-        params: List[Any] = []
-
-        if keyword:
-            where_sql = " WHERE v.payload LIKE %s"
-            params.append(f"%{keyword}%")
-
-        # 집계 대상 select
-        sql = LATEST_JOIN_SQL + (where_sql if where_sql else "") + " ORDER BY v.car_id"
-        if sample > 0:
-            sql += " LIMIT %s"
-            params2 = params + [sample]
-        else:
-            params2 = params
-
-        # 연식별, 주행거리별 데이터 수집
-        year_mileage_prices = {}  # {year: {mileage_range: [prices]}}
-
-        # 주행거리 구간 정의 (km)
-        mileage_ranges = [
-            (0, 30000, "0-3만km"),
-            (30000, 60000, "3-6만km"), 
-            (60000, 100000, "6-10만km"),
-            (100000, 150000, "10-15만km"),
-            (150000, 200000, "15-20만km"),
-            (200000, float('inf'), "20만km+")
-        ]
+        tokens = split_keyword_tokens(keyword)
 
+        # ✅ 같은 검색조건/sample + 같은 data_version이면 저장된 응답 그대로
+        cache_key = (normalize_filter(tokens), sample)
+        conn = connections[DB_ALIAS]
         with conn.cursor() as cur:
-            cur.execute(sql, params2)
-            while True:
-                rows = cur.fetchmany(800)
-                if not rows:
-                    break
-                for car_id, v_payload, i_payload, r_payload, o_payload in rows:
-                    vraw = parse_json_maybe(v_payload) or {}
-                    if not isinstance(vraw, dict):
-                        continue
-
-                    # 연식, 주행거리, 가격 추출
-                    year = safe_get(vraw, ["category", "formYear"]) or safe_get(vraw, ["category", "yearMonth"], "")[:4] or ""
-                    price = to_int(safe_get(vraw, ["advertisement", "price"]), 0)
-                    mileage = to_int(safe_get(vraw, ["spec", "mileage"]), 0)
-
-                    if not year or price <= 0 or mileage < 0:
-                        continue
+            version = data_version(cur)
+        cached = get_response("price-analysis", cache_key, version)
+        if cached is not None:
+            return cached
 
-                    year = str(year).strip()
-                    if not year.isdigit() or len(year) != 4:
-                        continue
+        src_sql, src_params = sampled_source(tokens, sample)
 
-                    # 주행거리 구간 찾기
-                    mileage_range_name = None
-                    for min_km, max_km, range_name in mileage_ranges:
-                        if min_km <= mileage < max_km:
-                            mileage_range_name = range_name
-                            break
+        # {year: {mileage_range: (avg, min, max, count)}}
+        year_mileage_prices: Dict[str, Dict[str, Tuple[int, int, int, int]]] = {}
 
-                    if not mileage_range_name:
-                        continue
-
-                    # 데이터 저장
-                    if year not in year_mileage_prices:
-                        year_mileage_prices[year] = {}
-                    if mileage_range_name not in year_mileage_prices[year]:
-                        year_mileage_prices[year][mileage_range_name] = []
-
-                    year_mileage_prices[year][mileage_range_name].append(price)
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT s.model_year, {mileage_range_case()} AS mr,
+                       AVG(s.price), MIN(s.price), MAX(s.price), COUNT(*)
+                FROM {src_sql} s
+                WHERE s.model_year IS NOT NULL AND s.price > 0 AND s.mileage >= 0
+                GROUP BY s.model_year, mr
+                """,
+                src_params,
+            )
+            for year, mr, avg_p, min_p, max_p, cnt in cur.fetchall():
+                if mr is None:
+                    continue
+                year_mileage_prices.setdefault(str(year), {})[mr] = (int(avg_p), int(min_p), int(max_p), int(cnt))
 
         # 결과 정리
         analysis_data = []
         for year in sorted(year_mileage_prices.keys(), reverse=True):  # 최신 연식부터
             year_data = {"year": year, "mileage_ranges": []}
 
-            for min_km, max_km, range_name in mileage_ranges:
-                if range_name in year_mileage_prices[year]:
-                    prices = year_mileage_prices[year][range_name]
-                    if prices:
-                        avg_price = int(sum(prices) / len(prices))
-                        min_price = min(prices)
-                        max_price = max(prices)
-                        count = len(prices)
-
-                        year_data["mileage_ranges"].append({
-                            "range": range_name,
-                            "avg_price": avg_price,
-                            "min_price": min_price,
-                            "max_price": max_price,
-                            "count": count
-                        })
-                else:
-                    year_data["mileage_ranges"].append({
-                        "range": range_name,
-                        "avg_price": 0,
-                        "min_price": 0,
-                        "max_price": 0,
-                        "count": 0
-                    })
+            for _, _, range_name in MILEAGE_RANGES:
+                avg_price, min_price, max_price, count = year_mileage_prices[year].get(range_name, (0, 0, 0, 0))
+                year_data["mileage_ranges"].append({
+                    "range": range_name,
+                    "avg_price": avg_price,
+                    "min_price": min_price,
+                    "max_price": max_price,
+                    "count": count
+                })
 
             analysis_data.append(year_data)
 
-        return JsonResponse(
+        return put_response("price-analysis", cache_key, version, JsonResponse(
             {
                 "ok": True,
                 "meta": {
@@ -379,10 +357,10 @@ def combine_price_analysis_api(request: HttpRequest):
                     "sample_size": sample if sample > 0 else "전체",
                 },
                 "analysis": analysis_data,
-                "mileage_ranges": [range_name for _, _, range_name in mileage_ranges]
+                "mileage_ranges": [range_name for _, _, range_name in MILEAGE_RANGES]
             },
             json_dumps_params={"ensure_ascii": False},
-        )
+        ))
 
     except Exception as e:
         import traceback
@@ -401,95 +379,66 @@ def combine_summary_api(request: HttpRequest):
     """
     /encar/api/combine/summary?keyword=K7
     - 현재 검색조건에 대한 요약 (가격 범위/평균/중앙값/분포 등)
-    - SQLite가 스크래핑 중이면 전체 스캔이 부담될 수 있으니, sample 파라미터 지원
-      예) sample=5000 (기본 5000) => 처음 N개만 집계(빠름)
+    - sample 파라미터 지원: sample=5000 (기본 5000) => car_id 순 처음 N개만 집계, 0이면 전체
+    - 집계는 전부 vehicle_flat 컬럼 SQL (payload 파싱 없음)
+    - 응답은 (검색조건, sample, data_version) 키로 캐시 (X-Cache: HIT|MISS)
     """
     try:
         keyword = (request.GET.get("keyword") or "").strip()
         sample = int(request.GET.get("sample", "5000"))  # 0이면 전체
         sample = max(0, sample)
 
-        conn = connections[DB_ALIAS]
-
-        where_sql = ""
-        params: List[Any] = []
+        tokens = split_keyword_tokens(keyword)
 
-        # ⚠️ payload LIKE는 인덱스가 안타서 비용 있음. 그래도 latest만이라 훨씬 낫고,
-        # sample로 현실 타협 가능.
-        if keyword:
-            where_sql = " WHERE v.payload LIKE %s"
-            params.append(f"%{keyword}%")
-
-        # total (정확한 전체 매물 수)
-        total = None
+        # ✅ 같은 검색조건/sample + 같은 data_version이면 저장된 응답 그대로
+        cache_key = (normalize_filter(tokens), sample)
+        conn = connections[DB_ALIAS]
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT COUNT(*) FROM vehicle_raw_latest v" + (where_sql if where_sql else ""),
-                params,
-            )
-            total = int(cur.fetchone()[0])
+            version = data_version(cur)
+        cached = get_response("summary", cache_key, version)
+        if cached is not None:
+            return cached
 
-        # 집계 대상 select
-        sql = LATEST_JOIN_SQL + (where_sql if where_sql else "") + " ORDER BY v.car_id"
-        if sample > 0:
-            sql += " LIMIT %s"
-            params2 = params + [sample]
-        else:
-            params2 = params
-
-        prices: List[int] = []
-        mileages: List[int] = []
-        accident_y = 0
-        simple_y = 0
-        n = 0
+        src_sql, src_params = sampled_source(tokens, sample)
 
-        # 스트리밍 집계 (메모리 절약)
         with conn.cursor() as cur:
-            cur.execute(sql, params2)
-            while True:
-                rows = cur.fetchmany(800)
-                if not rows:
-                    break
-                for car_id, v_payload, i_payload, r_payload, o_payload in rows:
-                    vraw = parse_json_maybe(v_payload) or {}
-                    if not isinstance(vraw, dict):
-                        continue
-
-                    iraw = parse_json_maybe(i_payload) if i_payload else None
-                    iraw = iraw if isinstance(iraw, dict) else None
+            # total (정확한 전체 매물 수)
+            total, _ = total_matches(cur, tokens)
 
-                    # 가격/주행거리 (네 payload 구조 기준)
-                    price = to_int(safe_get(vraw, ["advertisement", "price"]), 0)
-                    mileage = to_int(safe_get(vraw, ["spec", "mileage"]), 0)
-
-                    if price > 0:
-                        prices.append(price)
-                    if mileage > 0:
-                        mileages.append(mileage)
-
-                    if iraw:
-                        if bool(safe_get(iraw, ["master", "accdient"])):  # 원본 오타 accdient
-                            accident_y += 1
-                        if bool(safe_get(iraw, ["master", "simpleRepair"])):
-                            simple_y += 1
-
-                    n += 1
-
-        # 통계 계산
-        prices_sorted = sorted(prices)
-        mile_sorted = sorted(mileages)
-
-        price_min = min(prices_sorted) if prices_sorted else 0
-        price_max = max(prices_sorted) if prices_sorted else 0
-        price_avg = int(sum(prices_sorted) / len(prices_sorted)) if prices_sorted else 0
-        price_med = percentile(prices_sorted, 0.5) if prices_sorted else 0
-
-        mile_avg = int(sum(mile_sorted) / len(mile_sorted)) if mile_sorted else 0
-        mile_med = percentile(mile_sorted, 0.5) if mile_sorted else 0
-
-        hist = make_hist(prices_sorted, bins=12)
-
-        return JsonResponse(
+            cur.execute(
+                f"""
+                SELECT COUNT(*),
+                       COALESCE(SUM(s.accident), 0),
+                       COALESCE(SUM(s.simple_repair), 0),
+                       SUM(s.price > 0), MIN(CASE WHEN s.price > 0 THEN s.price END),
+                       MAX(CASE WHEN s.price > 0 THEN s.price END), AVG(CASE WHEN s.price > 0 THEN s.price END),
+                       SUM(s.mileage > 0), AVG(CASE WHEN s.mileage > 0 THEN s.mileage END)
+                FROM {src_sql} s
+                """,
+                src_params,
+            )
+            n, accident_y, simple_y, n_price, price_min, price_max, price_avg, n_mile, mile_avg = cur.fetchone()
+            n, n_price, n_mile = int(n or 0), int(n_price or 0), int(n_mile or 0)
+
+            # 중앙값: 정렬 후 percentile 위치 한 행만
+            price_med = 0
+            if n_price:
+                cur.execute(
+                    f"SELECT s.price FROM {src_sql} s WHERE s.price > 0 ORDER BY s.price LIMIT 1 OFFSET %s",
+                    src_params + [percentile_index(n_price, 0.5)],
+                )
+                price_med = int(cur.fetchone()[0])
+            mile_med = 0
+            if n_mile:
+                cur.execute(
+                    f"SELECT s.mileage FROM {src_sql} s WHERE s.mileage > 0 ORDER BY s.mileage LIMIT 1 OFFSET %s",
+                    src_params + [percentile_index(n_mile, 0.5)],
+                )
+                mile_med = int(cur.fetchone()[0])
+
+            hist = make_hist(cur, src_sql, src_params, int(price_min or 0), int(price_max or 0), n_price, bins=12)
+
+        return put_response("summary", cache_key, version, JsonResponse(
             {
                 "ok": True,
                 "meta": {
@@ -500,14 +449,14 @@ def combine_summary_api(request: HttpRequest):
                     "count_used": n,             # 실제 집계에 사용된 row 수
                 },
                 "price": {
-                    "min": price_min,
-                    "max": price_max,
-                    "avg": price_avg,
+                    "min": int(price_min or 0),
+                    "max": int(price_max or 0),
+                    "avg": int(price_avg or 0),
                     "median": price_med,
                     "hist": hist,  # labels, counts
                 },
                 "mileage": {
-                    "avg": mile_avg,
+                    "avg": int(mile_avg or 0),
                     "median": mile_med,
                 },
                 "rates": {
@@ -516,7 +465,7 @@ def combine_summary_api(request: HttpRequest):
                 },
             },
             json_dumps_params={"ensure_ascii": False},
-        )
+        ))
 
     except Exception as e:
         import traceback
@@ -531,196 +480,6 @@ def combine_summary_api(request: HttpRequest):
         )
 
 
-# =========================================================
-# 사고/보험/옵션 요약
-# =========================================================
-def accident_easy_summary(inspection_raw: Optional[Dict[str, Any]]) -> str:
-    if not inspection_raw:
-        return ""
-    outers = inspection_raw.get("outers") or []
-    if not outers:
-        return "무사고"
-
-    items: List[str] = []
-    for o in outers:
-        part = safe_get(o, ["type", "title"]) or safe_get(o, ["type", "code"]) or ""
-        sts = o.get("statusTypes") or []
-        for s in sts:
-            cd = str(s.get("code") or "").strip()
-            title = str(s.get("title") or "").strip()
-            if cd in ACCIDENT_CODES:
-                items.append(f"{part}-{title or cd}")
-                break
-
-    return "무사고" if not items else " / ".join(items)
-
-
-def insurance_summary(record_raw: Optional[Dict[str, Any]]) -> str:
-    if not record_raw:
-        return ""
-
-    r = record_raw
-    if isinstance(record_raw, dict) and isinstance(record_raw.get("record"), dict):
-        r = record_raw["record"]
-
-    def pick(*keys):
-        for k in keys:
-            if isinstance(r, dict) and k in r and r[k] is not None:
-                return r[k]
-        return None
-
-    acc_cnt = pick("accidentCnt", "acc_cnt", "accCnt", "totalAccidentCnt")
-    my_cnt = pick("myAccidentCnt", "my_cnt", "myAccCnt")
-    other_cnt = pick("otherAccidentCnt", "other_cnt", "otherAccCnt")
-    my_cost = pick("myAccidentCost", "my_cost", "myAccCost")
-    other_cost = pick("otherAccidentCost", "other_cost", "otherAccCost")
-
-    parts = []
-    try:
-        if acc_cnt is not None:
-            parts.append(f"보험이력 {int(acc_cnt)}건")
-        if my_cnt is not None:
-            parts.append(f"내차 {int(my_cnt)}건")
-        if my_cost is not None:
-            parts.append(f"내차 {int(my_cost):,}원")
-        if other_cnt is not None:
-            parts.append(f"타차 {int(other_cnt)}건")
-        if other_cost is not None:
-            parts.append(f"타차 {int(other_cost):,}원")
-    except Exception:
-        return str(record_raw)[:200]
-
-    return " / ".join(parts)
-
-
-def standard_options_kr(vehicle_raw: Dict[str, Any]) -> str:
-    std_codes = safe_get(vehicle_raw, ["options", "standard"], default=[]) or []
-    names: List[str] = []
-    for c in std_codes:
-        k = normalize_opt_code(c)
-        nm = OPTION_CODE_MAP.get(k)
-        names.append(nm or f"({c})")
-    return ", ".join(names)
-
-
-def paid_options_kr_and_sum(
-    vehicle_raw: Dict[str, Any],
-    options_choice_list: List[Dict[str, Any]]
-) -> Tuple[str, str, int]:
-    choice_codes = safe_get(vehicle_raw, ["options", "choice"], default=[]) or []
-    choice_codes = [str(x).strip() for x in choice_codes if str(x).strip()]
-
-    # optionCd -> {name, price}
-    m: Dict[str, Dict[str, Any]] = {}
-    for it in options_choice_list or []:
-        cd = str(it.get("optionCd") or "").strip()
-        if not cd:
-            continue
-        m[cd] = {"name": it.get("optionName"), "price": it.get("price")}
-
-    all_names: List[str] = []
-    paid_names: List[str] = []
-    paid_sum = 0
-
-    for cd in choice_codes:
-        info = m.get(cd)
-        if not info:
-            all_names.append(f"({cd})")
-            continue
-
-        nm = info.get("name") or f"({cd})"
-        all_names.append(nm)
-
-        price_int = to_int(info.get("price"), 0)
-        if price_int > 0:
-            paid_names.append(nm)
-            paid_sum += price_int
-
-    return ", ".join(all_names), ", ".join(paid_names), paid_sum
-
-
-# =========================================================
-# SQL (latest 테이블 기반: 초고속)
-# =========================================================
-JOIN_LATEST_BASE = """
-SELECT
-  v.car_id,
-  v.payload AS vehicle_payload,
-  i.payload AS inspection_payload,
-  r.payload AS record_payload,
-  o.payload AS options_choice_payload
-FROM vehicle_raw_latest v
-LEFT JOIN inspection_raw_latest i ON i.car_id = v.car_id
-LEFT JOIN record_raw_latest r     ON r.car_id = v.car_id
-LEFT JOIN options_choice_raw_latest o ON o.car_id = v.car_id
-"""
-
-
-def build_combined_row(
-    vehicle_raw: Dict[str, Any],
-    inspection_raw: Optional[Dict[str, Any]],
-    record_raw: Optional[Dict[str, Any]],
-    options_choice_list: List[Dict[str, Any]],
-) -> Dict[str, Any]:
-    carid = safe_get(vehicle_raw, ["vehicleId"]) or safe_get(vehicle_raw, ["manage", "dummyVehicleId"]) or ""
-
-    car_no = safe_get(vehicle_raw, ["vehicleNo"]) or ""
-    maker = safe_get(vehicle_raw, ["category", "manufacturerName"]) or ""
-    model_detail = safe_get(vehicle_raw, ["category", "modelName"]) or ""
-    trim = safe_get(vehicle_raw, ["category", "gradeName"]) or ""
-    sub_trim = safe_get(vehicle_raw, ["category", "gradeDetailName"]) or ""
-
-    model_year = (
-        safe_get(vehicle_raw, ["category", "formYear"])
-        or (safe_get(vehicle_raw, ["category", "yearMonth"], "")[:4] or "")
-        or ""
-    )
-
-    fuel = safe_get(vehicle_raw, ["spec", "fuelName"]) or ""
-    body_type = safe_get(vehicle_raw, ["spec", "bodyName"]) or ""
-    mileage_km = safe_get(vehicle_raw, ["spec", "mileage"]) or ""
-    color = safe_get(vehicle_raw, ["spec", "colorName"]) or ""
-    price = safe_get(vehicle_raw, ["advertisement", "price"]) or ""
-
-    first_reg = ""
-    if inspection_raw:
-        first_reg = yyyymmdd_to_iso(safe_get(inspection_raw, ["master", "detail", "firstRegistrationDate"]))
-
-    accident_yn = yn(inspection_raw and safe_get(inspection_raw, ["master", "accdient"]))
-    simple_repair_yn = yn(inspection_raw and safe_get(inspection_raw, ["master", "simpleRepair"]))
-
-    accident_easy = accident_easy_summary(inspection_raw)
-    insurance = insurance_summary(record_raw)
-
-    opt_std_kr = standard_options_kr(vehicle_raw)
-    _, opt_paid_kr, opt_paid_sum = paid_options_kr_and_sum(vehicle_raw, options_choice_list)
-
-    # ✅ UI에서 바로 쓰는 키로 내려준다
-    return {
-        "carid": carid,
-        "차량번호": car_no,
-        "색상": color,
-        "제조사": maker,
-        "세부모델": model_detail,
-        "트림": trim,
-        "세부트림": sub_trim,
-        "연식": str(model_year).strip() if model_year is not None else "",
-        "최초등록일": first_reg,
-        "유종": fuel,
-        "차형": body_type,
-        "주행거리": mileage_km,
-        "판매가": price,
-        "단순수리 Y/N": simple_repair_yn,
-        "사고여부 Y/N": accident_yn,
-
-        "사고이력": accident_easy,
-        "보험이력": insurance,
-        "옵션": opt_std_kr,
-        "유상옵션": opt_paid_kr,
-        "옵션 합계금액": opt_paid_sum,
-    }
-
-
 # =========================================================
 # Views
 # =========================================================
@@ -730,13 +489,16 @@ def combine_page(request: HttpRequest):
 
 def combine_list_api(request: HttpRequest):
     """
-    /encar/api/combine/list?keyword=G90 5.0&page=1&size=100&withTotal=1
+    /encar/api/combine/list?keyword=G90 5.0&page=1&size=100&withTotal=1   (withTotal=estimate: 넓은 검색은 추정 total)
+    /encar/api/combine/list?keyword=G90 5.0&size=100&sort=price&dir=desc&after=<meta.next_after>
     - page/size 지원(프론트 Tabulator remote pagination 대응)
-    - keyword 토큰 AND 검색 + 2차 정밀필터로 잡매칭 감소
+    - after 커서가 있으면 OFFSET 대신 keyset (정렬 인덱스를 커서 위치부터 읽음 -> 깊은 페이지도 첫 페이지 비용)
+    - sort: LIST_SORTS 중 하나(기본 car_id), dir: asc|desc
+    - keyword 토큰 AND 검색 (문자: 제조사/모델/트림/세부트림/차량번호, 숫자: 모델/트림/세부트림)
     """
     try:
         keyword = (request.GET.get("keyword") or "").strip()
-        with_total = (request.GET.get("withTotal") or "0") == "1"
+        with_total = (request.GET.get("withTotal") or "0").lower()  # 1 | estimate
 
         # ✅ page/size 우선 지원 (없으면 limit/offset fallback)
         page = request.GET.get("page")
@@ -757,65 +519,71 @@ def combine_list_api(request: HttpRequest):
             page = (offset // limit) + 1
             size = limit
 
-        tokens = split_keyword_tokens(keyword) if keyword else []
+        sort = (request.GET.get("sort") or "car_id").strip()
+        if sort not in LIST_SORTS:
+            return JsonResponse(
+                {"ok": False, "error": f"sort must be one of {list(LIST_SORTS)}"},
+                status=400,
+                json_dumps_params={"ensure_ascii": False},
+            )
+        desc = (request.GET.get("dir") or "asc").lower() == "desc"
+
+        after = (request.GET.get("after") or "").strip()
+        if after:
+            try:
+                c_sort, c_desc, c_value, c_rid = decode_cursor(after)
+            except ValueError as e:
+                return JsonResponse({"ok": False, "error": str(e)}, status=400)
+            if (c_sort, c_desc) != (sort, desc):
+                return JsonResponse({"ok": False, "error": "after cursor does not match sort/dir"}, status=400)
+            offset = 0
 
-        where_sql = ""
-        params: List[Any] = []
+        tokens = split_keyword_tokens(keyword) if keyword else []
 
-        # ✅ 1차 후보군: payload LIKE를 토큰 AND로
-        # (tokens가 2개 이상이면 정확도 확 올라감)
-        if tokens:
-            conds = []
-            for t in tokens:
-                conds.append("v.payload LIKE %s")
-                params.append(f"%{t}%")
-            where_sql = " WHERE " + " AND ".join(conds)
+        # ✅ 토큰 AND 검색을 flat 컬럼에 바로 (2차 필터 없음 -> 페이지가 꽉 차고 total도 정확)
+        where_sql, params = keyword_where(tokens, ordered=True)
 
-        # ✅ SQL 실행
-        sql = JOIN_LATEST_BASE + where_sql + " ORDER BY v.car_id LIMIT %s OFFSET %s"
-        params_sql = params + [limit, offset]
+        # ✅ SQL 실행 (limit+1개 읽어서 다음 페이지 유무 확인)
+        segments = after_segments(sort, desc, c_value, c_rid) if after else [("", [])]
+        order_sql = list_order_sql(sort, desc)
 
         conn = connections[DB_ALIAS]
         rows: List[Dict[str, Any]] = []
+        got: List[Dict[str, Any]] = []
+        next_after = None
 
         with conn.cursor() as cur:
-            cur.execute(sql, params_sql)
-            fetched = cur.fetchall()
-
-            for car_id, v_payload, i_payload, r_payload, o_payload in fetched:
-                vraw = parse_json_maybe(v_payload) or {}
-                if not isinstance(vraw, dict):
-                    continue
-
-                # ✅ 2차 정밀 필터: 숫자 토큰 잡매칭 방지
-                if tokens and (not row_matches_tokens(vraw, tokens)):
-                    continue
-
-                iraw = parse_json_maybe(i_payload) if i_payload else None
-                iraw = iraw if isinstance(iraw, dict) else None
-
-                rraw = parse_json_maybe(r_payload) if r_payload else None
-                rraw = rraw if isinstance(rraw, dict) else None
-
-                olist = _parse_options_choice_payload(o_payload)
-
-                row = build_combined_row(vraw, iraw, rraw, olist)
-                if not row.get("carid"):
-                    row["carid"] = str(car_id)
+            for cond, cond_params in segments:
+                page_sql = where_sql
+                if cond:
+                    page_sql = (where_sql + " AND " if where_sql else " WHERE ") + cond
+                cur.execute(
+                    FLAT_SELECT + page_sql + order_sql + " LIMIT %s OFFSET %s",
+                    params + cond_params + [limit + 1 - len(got), offset],
+                )
+                cols = [c[0] for c in cur.description]
+                got += [dict(zip(cols, r)) for r in cur.fetchall()]
+                if len(got) > limit:
+                    break
 
-                rows.append(row)
+        if len(got) > limit:
+            got = got[:limit]
+            last = got[-1]
+            next_after = encode_cursor(sort, desc, last[sort], last["rid"])
+        for r in got:
+            rows.append(combined_row_from_flat(r))
 
         total = None
+        total_estimated = False
         last_page = None
-        if with_total:
-            # total은 1차(where_sql) 기준으로 세되, 2차 필터가 있으면 정확 total은 어려움.
-            # 현실적으로는 1차 total을 쓰고, 2차 필터는 "표본 정확도"로 보자.
-            cnt_sql = "SELECT COUNT(*) FROM vehicle_raw_latest v" + (where_sql if tokens else "")
+        if with_total in ("1", "estimate"):
             with conn.cursor() as cur:
-                cur.execute(cnt_sql, params)
-                total = int(cur.fetchone()[0])
+                total, total_estimated = total_matches(cur, tokens, estimate=(with_total == "estimate"))
 
-            last_page = max(1, (total + size - 1) // size) if total is not None else None
+            last_page = max(1, (total + size - 1) // size)
+            if total_estimated:
+                # 추정치로 마지막 페이지를 자르지 않게, 실제로 다음/끝이 확인된 만큼은 보장
+                last_page = max(last_page, page + 1) if next_after else page
 
         return JsonResponse(
             {
@@ -830,7 +598,12 @@ def combine_list_api(request: HttpRequest):
                     "keyword": keyword,
                     "tokens": tokens,
                     "total": total,
+                    "total_estimated": total_estimated,   # True면 표본 추정치 (화면에 ≈ 표시)
                     "last_page": last_page,
+                    "sort": sort,
+                    "dir": "desc" if desc else "asc",
+                    "after": after or None,
+                    "next_after": next_after,   # 다음 페이지 커서 (없으면 마지막 페이지)
                 },
                 "rows": rows,
             },
@@ -854,7 +627,7 @@ def combine_list_api(request: HttpRequest):
 def combine_export_xlsx(request: HttpRequest):
     """
     /encar/api/combine/export.xlsx?keyword=... (선택)
-    - latest 기반 + fetchmany로 메모리 안정
+    - vehicle_flat 기반 + fetchmany로 메모리 안정
     """
     try:
         keyword = (request.GET.get("keyword") or "").strip()
@@ -882,13 +655,8 @@ def combine_export_xlsx(request: HttpRequest):
             "옵션 합계금액",
         ]
 
-        where_sql = ""
-        params: List[Any] = []
-        if keyword:
-            where_sql = " WHERE v.payload LIKE %s "
-            params.append(f"%{keyword}%")
-
-        sql = JOIN_LATEST_BASE + where_sql + " ORDER BY v.car_id"
+        where_sql, params = keyword_where(split_keyword_tokens(keyword), ordered=True)
+        sql = FLAT_SELECT + where_sql + " ORDER BY f.car_id"
 
         wb = Workbook(write_only=True)
         ws = wb.create_sheet(title="Encar Combine")
@@ -897,28 +665,14 @@ def combine_export_xlsx(request: HttpRequest):
         conn = connections[DB_ALIAS]
         with conn.cursor() as cur:
             cur.execute(sql, params)
+            cols = [c[0] for c in cur.description]
             while True:
                 batch = cur.fetchmany(500)
                 if not batch:
                     break
 
-                for car_id, v_payload, i_payload, r_payload, o_payload in batch:
-                    vraw = parse_json_maybe(v_payload) or {}
-                    if not isinstance(vraw, dict):
-                        vraw = {"_payload": vraw}
-
-                    iraw = parse_json_maybe(i_payload) if i_payload else None
-                    iraw = iraw if isinstance(iraw, dict) else None
-
-                    rraw = parse_json_maybe(r_payload) if r_payload else None
-                    rraw = rraw if isinstance(rraw, dict) else None
-
-                    olist = _parse_options_choice_payload(o_payload)
-
-                    row = build_combined_row(vraw, iraw, rraw, olist)
-                    if not row.get("carid"):
-                        row["carid"] = str(car_id)
-
+                for r in batch:
+                    row = combined_row_from_flat(dict(zip(cols, r)))
                     ws.append([row.get(h, "") for h in headers])
 
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -945,6 +699,42 @@ def combine_export_xlsx(request: HttpRequest):
         )
 
 
+def projection_lag_api(request: HttpRequest):
+    """
+    /encar/api/projection/lag
+    - vehicle_flat(목록/집계가 읽는 평탄화 테이블)이 raw 테이블보다 얼마나 뒤처졌는지
+    - 워커는 raw와 같은 트랜잭션에서 갱신하므로 평소엔 0, 밀렸으면 python encar_flat.py sync
+    """
+    try:
+        conn = connections[DB_ALIAS]
+        conn.ensure_connection()
+        return JsonResponse(
+            {"ok": True, "lag": lag_report(conn.connection)},
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+    except Exception as e:
+        import traceback
+        return JsonResponse(
+            {
+                "ok": False,
+                "error": str(e),
+                "trace": traceback.format_exc(),
+                "db_alias": DB_ALIAS,
+            },
+            status=500,
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+
+def cache_stats_api(request: HttpRequest):
+    """
+    /encar/api/cache/stats
+    - encar.caches hit/miss 카운터 + count/응답 캐시 크기 (프로세스별)
+    """
+    return JsonResponse({"ok": True, **cache_stats()}, json_dumps_params={"ensure_ascii": False})
+
+
 def debug_table_api(request: HttpRequest):
     table = (request.GET.get("table") or "").strip()
     if not table:
@@ -963,7 +753,10 @@ def debug_table_api(request: HttpRequest):
             for r in rows:
                 d = {}
                 for i, c in enumerate(cols):
-                    d[c] = r[i] if i < len(r) else None
+                    v = r[i] if i < len(r) else None
+                    if isinstance(v, (bytes, bytearray, memoryview)):
+                        v = encar_codec.decode_payload(v)
+                    d[c] = v
                 sample.append(d)
 
         return JsonResponse(
@@ -0,0 +1,425 @@
+# encar_codec.py
+# JSON 인코딩/디코딩 + raw payload 저장 포맷
+# - loads/dumps: 설치된 가장 빠른 JSON 백엔드(orjson > ujson > json) 사용, 없으면 표준 json
+#   (dumps는 표준 json과 바이트 단위로 같은 결과가 나오는 백엔드만 사용 -> content_hash 불변)
+# - payload 기본: JSON 텍스트
+# - payload 옵션: zlib(deflate) + 우리 데이터로 학습한 preset 사전으로 압축한 BLOB
+#   (같은 키/한글 라벨/옵션 카탈로그가 행마다 반복돼서 사전 효과가 큼)
+#
+# 사용:
+#   python encar_codec.py train              # raw 테이블별 사전 학습 -> payload_dict 저장
+#   python encar_codec.py compress --vacuum  # 기존 텍스트 payload를 압축 BLOB으로 변환
+#   python encar_codec.py stats              # 테이블별 텍스트/압축 행 수, 바이트
+
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import encar_db
+
+# -------------------------
+# 설정
+# -------------------------
+# True면 워커가 새로 쓰는 payload를 압축 BLOB으로 저장 (읽기는 설정과 무관하게 둘 다 지원)
+STORE_COMPRESSED = False
+
+ZLIB_LEVEL = 6
+DICT_SIZE = 32 * 1024          # deflate window(32KB)보다 크면 의미 없음
+TRAIN_SAMPLE_ROWS = 2000
+TRAIN_MIN_DOC_FREQ = 0.02      # 샘플의 2% 이상 행에 나오는 조각만 사전에 넣음
+
+RAW_TABLES: Dict[str, str] = {
+    "vehicle_raw": "car_id",
+    "inspection_raw": "car_id",
+    "record_raw": "car_id",
+    "options_choice_raw": "car_id",
+    "user_raw": "user_id",
+}
+
+# 압축 BLOB 헤더: MAGIC(3) + dict_id(2, big endian, 0=사전 없음) + raw deflate
+# JSON 텍스트는 \x00 으로 시작할 수 없어서 텍스트와 헷갈리지 않음
+MAGIC = b"\x00EZ"
+HEADER_LEN = len(MAGIC) + 2
+
+# JSON 문자열 토큰 ("key": 포함)
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"\s*:?')
+
+
+# -------------------------
+# JSON 백엔드
+# -------------------------
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 선택 의존성
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover - 선택 의존성
+    ujson = None
+
+
+def _std_dumps(obj: Any, sort_keys: bool = False) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+
+
+def _orjson_dumps(obj: Any, sort_keys: bool = False) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode("utf-8")
+
+
+def _ujson_dumps(obj: Any, sort_keys: bool = False) -> str:
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, sort_keys=sort_keys)
+
+
+# 백엔드 채택 전 비교용 샘플 (실제 payload에 나오는 타입/문자 위주)
+_PROBE: List[Any] = [
+    {"Id": "41066722", "price": 1490, "year": 201305.0, "rate": 12.5, "ok": True, "none": None},
+    {"title": "그랜저 HG300 프라임", "path": "/carsdata/cars/a.jpg", "q": "a\"b\\c\n\t\u0001", "emoji": "🚗"},
+    [{"code": "S00", "title": "자기진단", "children": [], "price": None}, 0, -3.25, 0.1, 9007199254740993],
+    {"jatoVehicleId": 8.179934202205191e18, "tiny": 1e-07, "big": 1e16},
+    {"small": 5.8888751134383556e-05},
+    {"b": 1, "a": {"d": [1, 2, {"c": "x"}], "c": ""}},
+    # 표준 json은 되는데 백엔드마다 다른 값: 64bit 넘는 정수(float로 바뀌면 안 됨), NaN/Infinity, 짝 없는 surrogate
+    #   (항목마다 따로 둬야 한 값의 예외 -> 표준 json 경로가 다른 값의 차이를 가리지 않음)
+    {"huge": 2 ** 70, "neg": -(2 ** 64)},
+    {"nan": float("nan"), "inf": float("-inf")},
+    {"s": "a\ud800b"},
+]
+
+
+def _guard_exponent(fast_dumps):
+    def _dumps(obj: Any, sort_keys: bool = False) -> str:
+        out = fast_dumps(obj, sort_keys)
+        # 지수 표기 숫자(1e+16 등)는 백엔드마다 표기가 달라서 표준 json으로 다시 씀
+        # (문자열 안의 "e-mail" 같은 것도 걸리지만 느린 경로로 갈 뿐 결과는 같음)
+        if "e+" in out or "e-" in out:
+            return _std_dumps(obj, sort_keys)
+        return out
+
+    return _dumps
+
+
+def _or_std(fast, std, *args: Any) -> Any:
+    # loads/dumps와 같은 규칙: 빠른 백엔드가 예외를 내면 표준 json 결과
+    try:
+        return fast(*args)
+    except Exception:
+        return std(*args)
+
+
+def _pick_backend() -> Tuple[str, Any, Any]:
+    """
+    (이름, loads, dumps)
+    - loads: 샘플을 표준 json과 같은 객체로 읽는 가장 빠른 백엔드
+      (비교는 표준 json으로 다시 써서 -> NaN, int/float 차이도 걸림)
+    - dumps: 샘플을 표준 json(compact, ensure_ascii=False)과 바이트 단위로 같게 쓰는 가장 빠른 백엔드
+    - 예외는 실제 loads/dumps처럼 표준 json으로 넘어간 결과로 비교 (조용히 다른 값을 내는 백엔드만 탈락)
+    """
+    texts = [_std_dumps(o) for o in _PROBE] + [json.dumps(o) for o in _PROBE]
+    loads_fn, dumps_fn, names = json.loads, _std_dumps, ["json", "json"]
+
+    candidates = []
+    if orjson is not None:
+        candidates.append(("orjson", orjson.loads, _orjson_dumps))
+    if ujson is not None:
+        candidates.append(("ujson", ujson.loads, _ujson_dumps))
+
+    for name, lf, fast in reversed(candidates):
+        df = _guard_exponent(fast)
+        if all(_std_dumps(_or_std(lf, json.loads, t)) == _std_dumps(json.loads(t)) for t in texts):
+            loads_fn, names[0] = lf, name
+        if all(_or_std(df, _std_dumps, o, k) == _std_dumps(o, k) for o in _PROBE for k in (False, True)):
+            dumps_fn, names[1] = df, name
+
+    return "/".join(names), loads_fn, dumps_fn
+
+
+JSON_BACKEND, _fast_loads, _fast_dumps = _pick_backend()
+
+
+def loads(v: Any) -> Any:
+    """
+    JSON 텍스트/bytes -> 객체
+    - 빠른 백엔드가 못 읽으면(NaN/Infinity, 짝 없는 surrogate 등) 표준 json으로 다시 읽음
+      (orjson.JSONDecodeError도 json.JSONDecodeError 하위라 예외 종류로 거르지 않음)
+    - 깨진 JSON은 백엔드와 무관하게 json.JSONDecodeError(ValueError)로 올림
+    """
+    if isinstance(v, memoryview):
+        v = v.tobytes()
+    try:
+        return _fast_loads(v)
+    except Exception:
+        return json.loads(v)
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """
+    객체 -> compact JSON 텍스트 (ensure_ascii=False, 구분자 공백 없음)
+    - 빠른 백엔드가 못 쓰는 값(정수 키, 64bit 넘는 정수 등)은 표준 json으로
+      (loads와 같게 예외 종류로 거르지 않음: orjson.JSONEncodeError 등 백엔드 고유 예외도 포함)
+    - 표준 json으로도 못 쓰는 객체는 표준 json의 TypeError가 그대로 올라감
+    """
+    try:
+        return _fast_dumps(obj, sort_keys)
+    except Exception:
+        return _std_dumps(obj, sort_keys)
+
+
+# -------------------------
+# 사전 관리
+# -------------------------
+_DICTS: Dict[int, bytes] = {}
+_ACTIVE: Dict[str, Tuple[int, bytes]] = {}
+_LOCK = threading.Lock()
+_DICT_DB: Optional[Path] = None
+
+
+def set_dict_db(db_path: Any) -> None:
+    """
+    사전을 읽어올 DB 파일 지정 (기본: encar_db.DB_PATH)
+    - Django 쪽은 settings.DATABASES["encar"]["NAME"]로 지정
+    """
+    global _DICT_DB
+    _DICT_DB = Path(db_path)
+
+
+def _load_dict(dict_id: int) -> Optional[bytes]:
+    with _LOCK:
+        if dict_id in _DICTS:
+            return _DICTS[dict_id]
+
+    # 조회 중인 커넥션을 건드리지 않도록 별도 읽기 전용 커넥션으로 읽음
+    path = _DICT_DB or encar_db.DB_PATH
+    con = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True)
+    try:
+        row = con.execute("SELECT data FROM payload_dict WHERE dict_id=?", (dict_id,)).fetchone()
+    finally:
+        con.close()
+
+    if row is None:
+        return None
+    with _LOCK:
+        _DICTS[dict_id] = bytes(row[0])
+        return _DICTS[dict_id]
+
+
+def load_active_dicts(con: sqlite3.Connection) -> Dict[str, int]:
+    """
+    테이블별 최신 사전을 쓰기용으로 올림 (워커 writer 시작 시 호출)
+    반환: {table: dict_id}
+    """
+    rows = con.execute(
+        """
+        SELECT d.table_name, d.dict_id, d.data
+        FROM payload_dict d
+        WHERE d.dict_id = (SELECT MAX(dict_id) FROM payload_dict x WHERE x.table_name = d.table_name)
+        """
+    ).fetchall()
+    with _LOCK:
+        _ACTIVE.clear()
+        for table, dict_id, data in rows:
+            _DICTS[int(dict_id)] = bytes(data)
+            _ACTIVE[str(table)] = (int(dict_id), bytes(data))
+        return {t: v[0] for t, v in _ACTIVE.items()}
+
+
+# -------------------------
+# encode / decode
+# -------------------------
+def compress_text(text: str, dict_id: int = 0, zdict: Optional[bytes] = None) -> bytes:
+    if zdict:
+        co = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        co = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15)
+        dict_id = 0
+    body = co.compress(text.encode("utf-8")) + co.flush()
+    return MAGIC + int(dict_id).to_bytes(2, "big") + body
+
+
+def encode_payload(table: str, text: str) -> Any:
+    """
+    저장용 값: STORE_COMPRESSED면 압축 BLOB(테이블 최신 사전 사용), 아니면 텍스트 그대로
+    """
+    if not STORE_COMPRESSED:
+        return text
+    dict_id, zdict = _ACTIVE.get(table, (0, None))
+    return compress_text(text, dict_id, zdict)
+
+
+def is_compressed(v: Any) -> bool:
+    return isinstance(v, (bytes, bytearray, memoryview)) and bytes(v[:len(MAGIC)]) == MAGIC
+
+
+def decode_payload(v: Any) -> Optional[str]:
+    """
+    DB에서 읽은 payload(TEXT 또는 압축 BLOB) -> JSON 텍스트
+    """
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v
+    if isinstance(v, memoryview):
+        v = v.tobytes()
+    if not isinstance(v, (bytes, bytearray)):
+        return None
+
+    if bytes(v[:len(MAGIC)]) != MAGIC:
+        return bytes(v).decode("utf-8", errors="ignore")
+
+    dict_id = int.from_bytes(v[len(MAGIC):HEADER_LEN], "big")
+    if dict_id:
+        zdict = _load_dict(dict_id)
+        if zdict is None:
+            raise ValueError(f"payload_dict {dict_id} not found")
+        do = zlib.decompressobj(-15, zdict=zdict)
+    else:
+        do = zlib.decompressobj(-15)
+    return (do.decompress(bytes(v[HEADER_LEN:])) + do.flush()).decode("utf-8")
+
+
+def loads_payload(v: Any, default: Any = None) -> Any:
+    """
+    payload -> 파이썬 객체 (빈 값/깨진 값이면 default)
+    """
+    try:
+        t = decode_payload(v)
+        if t is None:
+            return default
+        t = t.strip()
+        return loads(t) if t else default
+    except Exception:
+        return default
+
+
+# -------------------------
+# 사전 학습
+# -------------------------
+def train_dict(samples: Iterable[str], size: int = DICT_SIZE) -> bytes:
+    """
+    샘플 payload에서 자주 나오는 JSON 문자열 조각("key": / 라벨 값)을 모아 deflate preset 사전 생성
+    - 점수 = 나온 행 수 x 바이트 길이 (많이, 길게 반복될수록 이득)
+    - deflate는 가까운(뒤쪽) 사전 내용을 더 짧게 참조하므로 점수 높은 조각을 뒤에 둠
+    """
+    df: Counter = Counter()
+    n = 0
+    for text in samples:
+        if not text:
+            continue
+        n += 1
+        df.update(set(_TOKEN_RE.findall(text)))
+
+    min_df = max(2, int(n * TRAIN_MIN_DOC_FREQ))
+    scored = sorted(
+        ((cnt * len(tok.encode("utf-8")), tok) for tok, cnt in df.items() if cnt >= min_df),
+        reverse=True,
+    )
+
+    picked: List[bytes] = []
+    total = 0
+    for _, tok in scored:
+        b = tok.encode("utf-8")
+        if total + len(b) > size:
+            continue
+        picked.append(b)
+        total += len(b)
+
+    return b"".join(reversed(picked))
+
+
+def train_and_store(con: sqlite3.Connection, table: str, sample_rows: int = TRAIN_SAMPLE_ROWS) -> Optional[int]:
+    rows = con.execute(
+        f"SELECT payload FROM {table} WHERE payload IS NOT NULL ORDER BY random() LIMIT ?",
+        (sample_rows,),
+    ).fetchall()
+    samples = [t for t in (decode_payload(r[0]) for r in rows) if t]
+    if len(samples) < 10:
+        return None
+
+    data = train_dict(samples)
+    cur = con.execute(
+        "INSERT INTO payload_dict(table_name, data, sample_rows) VALUES(?, ?, ?)",
+        (table, data, len(samples)),
+    )
+    con.commit()
+    return int(cur.lastrowid)
+
+
+def compress_existing(con: sqlite3.Connection, table: str, batch: int = 500) -> int:
+    """
+    텍스트로 저장된 기존 payload를 최신 사전으로 압축 (content_hash는 내용 기준이라 그대로)
+    """
+    dict_id, zdict = _ACTIVE.get(table, (0, None))
+    n = 0
+    last_rowid = 0
+    while True:
+        rows = con.execute(
+            f"""
+            SELECT rowid, payload FROM {table}
+            WHERE rowid > ? AND typeof(payload)='text'
+            ORDER BY rowid LIMIT ?
+            """,
+            (last_rowid, batch),
+        ).fetchall()
+        if not rows:
+            break
+        con.executemany(
+            f"UPDATE {table} SET payload=? WHERE rowid=?",
+            [(compress_text(r[1], dict_id, zdict), r[0]) for r in rows],
+        )
+        con.commit()
+        last_rowid = rows[-1][0]
+        n += len(rows)
+    return n
+
+
+def print_stats(con: sqlite3.Connection) -> None:
+    for table in RAW_TABLES:
+        r = con.execute(
+            f"""
+            SELECT
+              SUM(typeof(payload)='text'), SUM(CASE WHEN typeof(payload)='text' THEN length(CAST(payload AS BLOB)) END),
+              SUM(typeof(payload)='blob'), SUM(CASE WHEN typeof(payload)='blob' THEN length(payload) END)
+            FROM {table}
+            """
+        ).fetchone()
+        print(
+            f"{table}: text_rows={r[0] or 0} text_bytes={r[1] or 0:,} "
+            f"compressed_rows={r[2] or 0} compressed_bytes={r[3] or 0:,}"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="raw payload 압축 사전 학습/변환")
+    ap.add_argument("command", choices=["train", "compress", "stats"])
+    ap.add_argument("--table", choices=list(RAW_TABLES), help="지정하지 않으면 raw 테이블 전체")
+    ap.add_argument("--sample", type=int, default=TRAIN_SAMPLE_ROWS)
+    ap.add_argument("--vacuum", action="store_true", help="compress 후 VACUUM으로 파일 크기 회수")
+    args = ap.parse_args()
+
+    con = encar_db.connect()
+    encar_db.init_db(con)
+    tables = [args.table] if args.table else list(RAW_TABLES)
+
+    if args.command == "train":
+        for t in tables:
+            dict_id = train_and_store(con, t, args.sample)
+            print(f"✅ {t}: dict_id={dict_id}" if dict_id else f"⚠️ {t}: 샘플 부족, 건너뜀")
+
+    elif args.command == "compress":
+        load_active_dicts(con)
+        for t in tables:
+            print(f"✅ {t}: compressed={compress_existing(con, t)} dict_id={_ACTIVE.get(t, (0,))[0]}")
+        if args.vacuum:
+            con.execute("VACUUM")
+
+    print_stats(con)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,190 @@
 # encar_db.py
 import sqlite3
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 DB_PATH = Path("encar_dump.db")
 
+# RUNNING 으로 가져간 뒤 이 시간 안에 DONE/ERROR 가 안 되면 reaper가 PENDING 으로 되돌림
+LEASE_SEC = 600
+
 DDL = """
 CREATE TABLE IF NOT EXISTS car_queue (
   car_id TEXT PRIMARY KEY,
   status TEXT NOT NULL DEFAULT 'PENDING',   -- PENDING | RUNNING | DONE | ERROR
   retry_count INTEGER NOT NULL DEFAULT 0,
   last_error TEXT,
-  updated_at TEXT DEFAULT (datetime('now'))
+  updated_at TEXT DEFAULT (datetime('now')),
+  worker_id TEXT,                            -- RUNNING 을 가져간 워커
+  lease_until TEXT,                          -- 이 시각이 지나면 reaper 대상
+  error_class TEXT,                          -- ERROR 분류: transient(429/5xx/timeout) | permanent(400/404)
+  next_attempt_at TEXT                       -- ERROR 재시도 예정 시각 (NULL이면 재시도 안 함)
 );
 CREATE INDEX IF NOT EXISTS ix_car_queue_status ON car_queue(status);
 
 CREATE TABLE IF NOT EXISTS vehicle_raw (
   car_id TEXT PRIMARY KEY,
   payload TEXT,
-  fetched_at TEXT DEFAULT (datetime('now'))
+  fetched_at TEXT DEFAULT (datetime('now')),
+  content_hash TEXT,                        -- payload 내용 해시 (같으면 재기록 안 함)
+  changed INTEGER,                          -- 마지막 수집에서 내용이 바뀌었으면 1, 그대로면 0
+  changed_at TEXT                           -- 내용이 마지막으로 바뀐 시각
 );
 
 CREATE TABLE IF NOT EXISTS inspection_raw (
   car_id TEXT PRIMARY KEY,
   payload TEXT,
-  fetched_at TEXT DEFAULT (datetime('now'))
+  fetched_at TEXT DEFAULT (datetime('now')),
+  content_hash TEXT,
+  changed INTEGER,
+  changed_at TEXT
 );
 
 CREATE TABLE IF NOT EXISTS record_raw (
   car_id TEXT PRIMARY KEY,
   vehicle_no TEXT,
   payload TEXT,
-  fetched_at TEXT DEFAULT (datetime('now'))
+  fetched_at TEXT DEFAULT (datetime('now')),
+  content_hash TEXT,
+  changed INTEGER,
+  changed_at TEXT
 );
 
 CREATE TABLE IF NOT EXISTS options_choice_raw (
   car_id TEXT PRIMARY KEY,
   payload TEXT,
-  fetched_at TEXT DEFAULT (datetime('now'))
+  fetched_at TEXT DEFAULT (datetime('now')),
+  content_hash TEXT,
+  changed INTEGER,
+  changed_at TEXT
 );
 
 CREATE TABLE IF NOT EXISTS user_raw (
   user_id TEXT PRIMARY KEY,
   payload TEXT,
-  fetched_at TEXT DEFAULT (datetime('now'))
+  fetched_at TEXT DEFAULT (datetime('now')),
+  content_hash TEXT,
+  changed INTEGER,
+  changed_at TEXT
+);
+
+-- 목록/집계용 차량 1행 평탄화 (encar_flat.py: 워커가 upsert 때 갱신, rebuild로 전체 재생성)
+CREATE TABLE IF NOT EXISTS vehicle_flat (
+  car_id TEXT PRIMARY KEY,
+  vehicle_no TEXT,
+  maker TEXT,
+  model TEXT,
+  trim TEXT,
+  sub_trim TEXT,
+  model_year INTEGER,                       -- formYear (없으면 yearMonth 앞 4자리)
+  first_reg TEXT,                           -- 최초등록일 YYYY-MM-DD (성능점검 기준)
+  fuel TEXT,
+  body TEXT,
+  color TEXT,
+  mileage INTEGER,                          -- km
+  price INTEGER,                            -- 만원
+  accident INTEGER NOT NULL DEFAULT 0,      -- 성능점검 사고 1/0 (점검 없으면 0)
+  simple_repair INTEGER NOT NULL DEFAULT 0,
+  accident_summary TEXT,                    -- 표시용 요약 문자열
+  insurance_summary TEXT,
+  options_std TEXT,
+  options_paid TEXT,
+  option_paid_sum INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS ix_vehicle_flat_maker_model ON vehicle_flat(maker, model);
+CREATE INDEX IF NOT EXISTS ix_vehicle_flat_price ON vehicle_flat(price);
+CREATE INDEX IF NOT EXISTS ix_vehicle_flat_mileage ON vehicle_flat(mileage);
+CREATE INDEX IF NOT EXISTS ix_vehicle_flat_year_mileage ON vehicle_flat(model_year, mileage);
+
+-- 테이블 내용 버전 (행이 바뀔 때마다 트리거가 +1, 화면 캐시 키에 포함 -> 바뀌면 자동 무효화)
+CREATE TABLE IF NOT EXISTS data_version (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO data_version(name, version) VALUES ('vehicle_flat', 0);
+CREATE TRIGGER IF NOT EXISTS vehicle_flat_ver_ai AFTER INSERT ON vehicle_flat BEGIN
+  UPDATE data_version SET version = version + 1 WHERE name = 'vehicle_flat';
+END;
+CREATE TRIGGER IF NOT EXISTS vehicle_flat_ver_ad AFTER DELETE ON vehicle_flat BEGIN
+  UPDATE data_version SET version = version + 1 WHERE name = 'vehicle_flat';
+END;
+-- 같은 값으로 덮어쓴 upsert(updated_at만 바뀜)는 버전을 올리지 않음
+CREATE TRIGGER IF NOT EXISTS vehicle_flat_ver_au AFTER UPDATE ON vehicle_flat
+WHEN (old.vehicle_no, old.maker, old.model, old.trim, old.sub_trim, old.model_year, old.first_reg,
+      old.fuel, old.body, old.color, old.mileage, old.price, old.accident, old.simple_repair,
+      old.accident_summary, old.insurance_summary, old.options_std, old.options_paid, old.option_paid_sum)
+  IS NOT (new.vehicle_no, new.maker, new.model, new.trim, new.sub_trim, new.model_year, new.first_reg,
+      new.fuel, new.body, new.color, new.mileage, new.price, new.accident, new.simple_repair,
+      new.accident_summary, new.insurance_summary, new.options_std, new.options_paid, new.option_paid_sum)
+BEGIN
+  UPDATE data_version SET version = version + 1 WHERE name = 'vehicle_flat';
+END;
+
+-- raw payload 압축 사전 (encar_codec.py train 으로 생성, 압축 BLOB 헤더의 dict_id로 참조)
+CREATE TABLE IF NOT EXISTS payload_dict (
+  dict_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  data BLOB NOT NULL,
+  sample_rows INTEGER,
+  created_at TEXT DEFAULT (datetime('now'))
 );
 """
 
+# 기존 DB 파일에는 없을 수 있는 컬럼 (init_db에서 ALTER TABLE로 보강)
+MIGRATE_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "car_queue": [
+        ("worker_id", "TEXT"),
+        ("lease_until", "TEXT"),
+        ("error_class", "TEXT"),
+        ("next_attempt_at", "TEXT"),
+    ],
+    **{
+        t: [("content_hash", "TEXT"), ("changed", "INTEGER"), ("changed_at", "TEXT")]
+        for t in ("vehicle_raw", "inspection_raw", "record_raw", "options_choice_raw", "user_raw")
+    },
+}
+
+# 보강된 컬럼에 걸리는 인덱스는 컬럼 추가 이후에 생성
+INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS ix_car_queue_status_updated ON car_queue(status, updated_at);
+CREATE INDEX IF NOT EXISTS ix_car_queue_status_lease ON car_queue(status, lease_until);
+CREATE INDEX IF NOT EXISTS ix_car_queue_status_next ON car_queue(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS ix_vehicle_raw_changed_at ON vehicle_raw(changed_at);
+-- vehicle_flat 지연 확인(encar_flat.lag_report)이 raw 본문을 안 읽고 인덱스만 훑도록
+CREATE INDEX IF NOT EXISTS ix_vehicle_raw_changed_car ON vehicle_raw(changed_at, car_id);
+CREATE INDEX IF NOT EXISTS ix_inspection_raw_changed_car ON inspection_raw(changed_at, car_id);
+CREATE INDEX IF NOT EXISTS ix_record_raw_changed_car ON record_raw(changed_at, car_id);
+CREATE INDEX IF NOT EXISTS ix_options_choice_raw_changed_car ON options_choice_raw(changed_at, car_id);
+"""
+
+# vehicle_flat 키워드 검색 인덱스 (FTS5 trigram = 3글자 이상 부분 일치, external content라 본문은 vehicle_flat에만)
+# - vehicle_flat이 바뀌면 트리거로 같이 갱신
+# - FTS5/trigram이 없는 SQLite(3.34 미만)면 만들지 않고 화면은 LIKE 검색으로 동작
+FTS_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_flat_fts USING fts5(
+  maker, model, trim, sub_trim, vehicle_no,
+  content='vehicle_flat', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS vehicle_flat_fts_ai AFTER INSERT ON vehicle_flat BEGIN
+  INSERT INTO vehicle_flat_fts(rowid, maker, model, trim, sub_trim, vehicle_no)
+  VALUES (new.rowid, new.maker, new.model, new.trim, new.sub_trim, new.vehicle_no);
+END;
+CREATE TRIGGER IF NOT EXISTS vehicle_flat_fts_ad AFTER DELETE ON vehicle_flat BEGIN
+  INSERT INTO vehicle_flat_fts(vehicle_flat_fts, rowid, maker, model, trim, sub_trim, vehicle_no)
+  VALUES ('delete', old.rowid, old.maker, old.model, old.trim, old.sub_trim, old.vehicle_no);
+END;
+CREATE TRIGGER IF NOT EXISTS vehicle_flat_fts_au AFTER UPDATE OF maker, model, trim, sub_trim, vehicle_no ON vehicle_flat
+WHEN (old.maker, old.model, old.trim, old.sub_trim, old.vehicle_no)
+  IS NOT (new.maker, new.model, new.trim, new.sub_trim, new.vehicle_no)
+BEGIN
+  INSERT INTO vehicle_flat_fts(vehicle_flat_fts, rowid, maker, model, trim, sub_trim, vehicle_no)
+  VALUES ('delete', old.rowid, old.maker, old.model, old.trim, old.sub_trim, old.vehicle_no);
+  INSERT INTO vehicle_flat_fts(rowid, maker, model, trim, sub_trim, vehicle_no)
+  VALUES (new.rowid, new.maker, new.model, new.trim, new.sub_trim, new.vehicle_no);
+END;
+"""
+
 PRAGMAS = [
     "PRAGMA journal_mode=WAL;",
     "PRAGMA synchronous=NORMAL;",
@@ -55,16 +194,58 @@ PRAGMAS = [
 ]
 
 
-def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
-    con = sqlite3.connect(str(db_path))
+def connect(db_path: Path = DB_PATH, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    - check_same_thread=False: 만든 스레드가 아닌 스레드에서도 쓸 수 있게 (한 번에 한 스레드만 쓰는 건 호출부 책임)
+    """
+    con = sqlite3.connect(str(db_path), check_same_thread=check_same_thread)
     con.row_factory = sqlite3.Row
     for p in PRAGMAS:
         con.execute(p)
     return con
 
 
+def ensure_columns(con: sqlite3.Connection, table: str, columns: List[Tuple[str, str]]) -> None:
+    have = {r[1] for r in con.execute(f"PRAGMA table_info({table})").fetchall()}
+    for name, decl in columns:
+        if name not in have:
+            con.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def drop_triggers_without_when(con: sqlite3.Connection, names: List[str]) -> None:
+    """
+    WHEN 조건 없이 만들어진 옛 트리거 삭제 (CREATE TRIGGER IF NOT EXISTS는 정의를 바꾸지 않아서 다시 만들게 함)
+    """
+    for name in names:
+        row = con.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,)).fetchone()
+        if row is not None and "WHEN" not in row[0].upper():
+            con.execute(f"DROP TRIGGER {name}")
+
+
+def ensure_fts(con: sqlite3.Connection) -> bool:
+    """
+    vehicle_flat_fts 생성 (+ 처음 만들 때 기존 vehicle_flat 내용으로 채움)
+    반환: FTS 검색 사용 가능 여부
+    """
+    existed = con.execute("SELECT 1 FROM sqlite_master WHERE name='vehicle_flat_fts'").fetchone() is not None
+    drop_triggers_without_when(con, ["vehicle_flat_fts_au"])
+    try:
+        con.executescript(FTS_DDL)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 trigram unavailable, keyword search falls back to LIKE: {e}")
+        return False
+    if not existed:
+        con.execute("INSERT INTO vehicle_flat_fts(vehicle_flat_fts) VALUES('rebuild')")
+    return True
+
+
 def init_db(con: sqlite3.Connection) -> None:
+    drop_triggers_without_when(con, ["vehicle_flat_ver_au"])
     con.executescript(DDL)
+    for table, columns in MIGRATE_COLUMNS.items():
+        ensure_columns(con, table, columns)
+    con.executescript(INDEX_DDL)
+    ensure_fts(con)
     con.commit()
 
 
@@ -76,26 +257,175 @@ def seed_one(con: sqlite3.Connection, car_id: str) -> None:
     con.commit()
 
 
-def set_status(con: sqlite3.Connection, car_id: str, status: str, err: str | None = None, inc_retry: bool = False) -> None:
-    if inc_retry:
-        con.execute(
-            """
-            UPDATE car_queue
-            SET status=?, last_error=?, retry_count=retry_count+1, updated_at=datetime('now')
-            WHERE car_id=?
-            """,
-            (status, err, car_id),
-        )
-    else:
-        con.execute(
-            """
-            UPDATE car_queue
-            SET status=?, last_error=?, updated_at=datetime('now')
-            WHERE car_id=?
-            """,
-            (status, err, car_id),
+def _owner_clause(worker_id: str | None) -> Tuple[str, Tuple[str, ...]]:
+    # worker_id를 주면 지금도 그 워커가 잡고 있는(RUNNING) 행만 (lease가 만료돼 다른 워커가 다시 가져간 행은 건드리지 않음)
+    if worker_id is None:
+        return "", ()
+    return " AND status='RUNNING' AND worker_id=?", (worker_id,)
+
+
+def set_status(
+    con: sqlite3.Connection,
+    car_id: str,
+    status: str,
+    err: str | None = None,
+    inc_retry: bool = False,
+    commit: bool = True,
+    worker_id: str | None = None,
+) -> bool:
+    """
+    반환: 행이 갱신됐는지 (worker_id를 줬는데 False면 lease를 잃은 것)
+    """
+    owner, owner_args = _owner_clause(worker_id)
+    retry = "retry_count=retry_count+1, " if inc_retry else ""
+    cur = con.execute(
+        f"""
+        UPDATE car_queue
+        SET status=?, last_error=?, {retry}updated_at=datetime('now'),
+            worker_id=NULL, lease_until=NULL, next_attempt_at=NULL
+        WHERE car_id=?{owner}
+        """,
+        (status, err, car_id, *owner_args),
+    )
+    if commit:
+        con.commit()
+    return cur.rowcount > 0
+
+
+def set_error(
+    con: sqlite3.Connection,
+    car_id: str,
+    err: str,
+    error_class: str,
+    base_sec: int,
+    max_sec: int,
+    max_retries: int,
+    commit: bool = True,
+    worker_id: str | None = None,
+) -> bool:
+    """
+    ERROR 기록 + 재시도 예약
+    - retry_count 증가, 다음 시도 = now + min(base_sec * 2^(이전 retry_count), max_sec)
+    - 증가한 retry_count가 max_retries 이상이면 next_attempt_at=NULL (더 이상 재시도 안 함)
+    - worker_id를 주면 그 워커가 잡고 있는 행만 (반환 False = lease를 잃음)
+    """
+    owner, owner_args = _owner_clause(worker_id)
+    cur = con.execute(
+        f"""
+        UPDATE car_queue
+        SET status='ERROR', last_error=?, error_class=?, retry_count=retry_count+1,
+            next_attempt_at=CASE
+              WHEN retry_count + 1 >= ? THEN NULL
+              ELSE datetime('now', '+' || min(?, ? * (1 << min(retry_count, 20))) || ' seconds')
+            END,
+            updated_at=datetime('now'), worker_id=NULL, lease_until=NULL
+        WHERE car_id=?{owner}
+        """,
+        (err, error_class, int(max_retries), int(max_sec), int(base_sec), car_id, *owner_args),
+    )
+    if commit:
+        con.commit()
+    return cur.rowcount > 0
+
+
+def claim_batch(con: sqlite3.Connection, worker_id: str, limit: int, lease_sec: int = LEASE_SEC) -> List[str]:
+    """
+    재시도 시각이 된 ERROR + PENDING 최대 limit건을 한 문장(UPDATE ... RETURNING)으로 RUNNING 전환 + lease 부여
+    - SQLite 쓰기 잠금 안에서 선택/갱신이 같이 일어나서 여러 워커 프로세스가 같은 차량을 가져가지 않음
+    - 둘 다 (status, ...) 인덱스로 찾음: ERROR는 next_attempt_at, PENDING은 updated_at 순
+    - 재시도 대상을 먼저 채움 (건수가 적고 오래 기다린 차량이라)
+    """
+    rows = con.execute(
+        """
+        UPDATE car_queue
+        SET status='RUNNING', worker_id=?, lease_until=datetime('now', ?), updated_at=datetime('now'),
+            next_attempt_at=NULL
+        WHERE car_id IN (
+            SELECT car_id FROM (
+                SELECT car_id FROM (
+                    SELECT car_id
+                    FROM car_queue
+                    WHERE status='ERROR' AND next_attempt_at <= datetime('now')
+                    ORDER BY next_attempt_at ASC
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT car_id FROM (
+                    SELECT car_id
+                    FROM car_queue
+                    WHERE status='PENDING'
+                    ORDER BY updated_at ASC
+                    LIMIT ?
+                )
+            )
+            LIMIT ?
         )
+        RETURNING car_id
+        """,
+        (worker_id, f"+{int(lease_sec)} seconds", limit, limit, limit),
+    ).fetchall()
+    con.commit()
+    return [r[0] for r in rows]
+
+
+def renew_leases(con: sqlite3.Connection, worker_id: str, lease_sec: int = LEASE_SEC, commit: bool = True) -> int:
+    """
+    이 워커가 잡고 있는 RUNNING 전부 lease 연장 (처리 중인 차량을 다른 워커의 reaper가 가져가지 않게)
+    반환: 연장한 행 수
+    """
+    cur = con.execute(
+        """
+        UPDATE car_queue SET lease_until=datetime('now', ?)
+        WHERE status='RUNNING' AND worker_id=?
+        """,
+        (f"+{int(lease_sec)} seconds", worker_id),
+    )
+    if commit:
+        con.commit()
+    return cur.rowcount
+
+
+def reap_expired_leases(con: sqlite3.Connection, stale_sec: int = LEASE_SEC) -> int:
+    """
+    lease가 만료된 RUNNING(죽은 워커가 남긴 것)을 PENDING으로 되돌림
+    - lease 컬럼이 생기기 전에 RUNNING으로 남은 행은 updated_at 기준으로 판단
+    """
+    cur = con.execute(
+        """
+        UPDATE car_queue
+        SET status='PENDING', worker_id=NULL, lease_until=NULL, updated_at=datetime('now')
+        WHERE status='RUNNING'
+          AND (
+            lease_until < datetime('now')
+            OR (lease_until IS NULL AND updated_at < datetime('now', ?))
+          )
+        """,
+        (f"-{int(stale_sec)} seconds",),
+    )
+    con.commit()
+    return cur.rowcount
+
+
+def schedule_legacy_errors(con: sqlite3.Connection, max_retries: int) -> int:
+    """
+    재시도 예약 컬럼이 생기기 전에 ERROR로 남은 행 분류 + 예약 (error_class가 NULL인 ERROR만)
+    - last_error가 HTTP 4xx(400/404/410)면 permanent로 두고 예약 안 함
+    - 나머지는 transient, retry_count가 max_retries 미만이면 바로 재시도 대상
+    """
+    cur = con.execute(
+        """
+        UPDATE car_queue
+        SET error_class=CASE WHEN last_error LIKE 'HTTP 4%' THEN 'permanent' ELSE 'transient' END,
+            next_attempt_at=CASE
+              WHEN last_error LIKE 'HTTP 4%' OR retry_count >= ? THEN NULL
+              ELSE datetime('now')
+            END
+        WHERE status='ERROR' AND error_class IS NULL
+        """,
+        (int(max_retries),),
+    )
     con.commit()
+    return cur.rowcount
 
 
 def main():
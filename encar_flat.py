@@ -0,0 +1,651 @@
+# encar_flat.py
+# 차량 1대 = 1행 평탄화 테이블 (vehicle_flat)
+# - vehicle/inspection/record/options_choice raw payload에서 목록/집계에 쓰는 값만 뽑아 타입 있는 컬럼으로
+# - 워커가 raw upsert 때 같은 트랜잭션에서 갱신 (save_flat), 기존 DB는 rebuild로 한 번 채움
+# - Django 화면(encar.views)은 payload를 풀지 않고 이 테이블 컬럼으로 필터/정렬/집계
+#
+# 사용:
+#   python encar_flat.py rebuild   # raw 테이블 전체로 vehicle_flat 다시 채움 (워커 실행 중에도 가능)
+#   python encar_flat.py sync      # raw가 flat보다 새로운 차량만 다시 평탄화 (rebuild 없이 따라잡기)
+#   python encar_flat.py stats     # vehicle_raw 대비 누락/잉여 행 수 + raw 테이블별 지연(lag)
+
+import argparse
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import encar_codec
+import encar_db
+
+# -------------------------
+# 설정
+# -------------------------
+REBUILD_BATCH = 2000
+
+# vehicle_flat 원천 raw 테이블 (changed_at > vehicle_flat.updated_at 이면 flat이 뒤처진 것)
+SOURCE_TABLES = ("vehicle_raw", "inspection_raw", "record_raw", "options_choice_raw")
+
+ACCIDENT_CODES = {"X", "W", "C"}
+
+OPTION_CODE_MAP: Dict[str, str] = {
+    "10": "선루프",
+    "1": "헤드램프(HID, LED)",
+    "59": "파워 전동 트렁크",
+    "80": "고스트 도어 클로징",
+    "24": "전동접이 사이드 미러",
+    "17": "알루미늄 휠",
+    "62": "루프랙",
+    "82": "열선 스티어링 휠",
+    "83": "전동 조절 스티어링 휠",
+    "84": "패들 시프트",
+    "31": "스티어링 휠 리모컨",
+    "30": "ECM 룸미러",
+    "74": "하이패스",
+    "6": "파워 도어록",
+    "8": "파워 스티어링 휠",
+    "7": "파워 윈도우",
+
+    "2": "에어백(운전석, 동승석)",
+    "20": "에어백(사이드)",
+    "56": "에어백(커튼)",
+    "19": "미끄럼 방지(TCS)",
+    "55": "차체자세 제어장치(ESC)",
+    "33": "타이어 공기압센서(TPMS)",
+    "88": "차선이탈 경보 시스템(LDWS)",
+    "86": "후측방 경보 시스템",
+    "58": "후방 카메라",
+    "87": "360도 어라운드 뷰",
+
+    "4": "크루즈 컨트롤(일반, 어댑티브)",
+    "95": "헤드업 디스플레이(HUD)",
+    "94": "전자식 주차브레이크(EPB)",
+    "23": "자동 에어컨",
+    "57": "스마트키",
+    "15": "무선도어 잠금장치",
+    "81": "레인센서",
+    "97": "오토 라이트",
+    "96": "블루투스",
+    "72": "USB 단자",
+    "71": "AUX 단자",
+
+    "14": "가죽시트",
+    "89": "전동시트(뒷좌석)",
+    "90": "통풍시트(뒷좌석)",
+    "91": "마사지 시트",
+}
+
+# vehicle_flat 컬럼 순서 (encar_db.DDL과 같게)
+FLAT_COLUMNS = [
+    "car_id",
+    "vehicle_no",
+    "maker",
+    "model",
+    "trim",
+    "sub_trim",
+    "model_year",
+    "first_reg",
+    "fuel",
+    "body",
+    "color",
+    "mileage",
+    "price",
+    "accident",
+    "simple_repair",
+    "accident_summary",
+    "insurance_summary",
+    "options_std",
+    "options_paid",
+    "option_paid_sum",
+]
+
+# 화면/엑셀 키 -> vehicle_flat 컬럼
+ROW_KEYS: List[Tuple[str, str]] = [
+    ("carid", "car_id"),
+    ("차량번호", "vehicle_no"),
+    ("색상", "color"),
+    ("제조사", "maker"),
+    ("세부모델", "model"),
+    ("트림", "trim"),
+    ("세부트림", "sub_trim"),
+    ("연식", "model_year"),
+    ("최초등록일", "first_reg"),
+    ("유종", "fuel"),
+    ("차형", "body"),
+    ("주행거리", "mileage"),
+    ("판매가", "price"),
+    ("단순수리 Y/N", "simple_repair"),
+    ("사고여부 Y/N", "accident"),
+    ("사고이력", "accident_summary"),
+    ("보험이력", "insurance_summary"),
+    ("옵션", "options_std"),
+    ("유상옵션", "options_paid"),
+    ("옵션 합계금액", "option_paid_sum"),
+]
+
+_UPSERT_SQL = (
+    f"INSERT INTO vehicle_flat({','.join(FLAT_COLUMNS)}, updated_at) "
+    f"VALUES({','.join('?' * len(FLAT_COLUMNS))}, datetime('now')) "
+    "ON CONFLICT(car_id) DO UPDATE SET "
+    + ",".join(f"{c}=excluded.{c}" for c in FLAT_COLUMNS[1:])
+    + ",updated_at=excluded.updated_at"
+)
+
+# 차량별 raw payload 4종 (vehicle_raw 기준)
+_RAW_JOIN_SQL = """
+SELECT v.car_id, v.payload, i.payload, r.payload, o.payload
+FROM vehicle_raw v
+LEFT JOIN inspection_raw i ON i.car_id = v.car_id
+LEFT JOIN record_raw r ON r.car_id = v.car_id
+LEFT JOIN options_choice_raw o ON o.car_id = v.car_id
+"""
+
+
+# -------------------------
+# 유틸
+# -------------------------
+def safe_get(d: Any, path: List[Any], default=None):
+    cur = d
+    for p in path:
+        if cur is None:
+            return default
+        if isinstance(p, int):
+            if isinstance(cur, list) and 0 <= p < len(cur):
+                cur = cur[p]
+            else:
+                return default
+        else:
+            if isinstance(cur, dict) and p in cur:
+                cur = cur[p]
+            else:
+                return default
+    return default if cur is None else cur
+
+
+def yn(v: Any) -> str:
+    return "Y" if bool(v) else "N"
+
+
+def normalize_opt_code(code: Any) -> str:
+    s = str(code).strip()
+    s2 = s.lstrip("0")
+    return s2 if s2 else "0"
+
+
+def yyyymmdd_to_iso(s: Optional[str]) -> str:
+    if not s:
+        return ""
+    s = str(s).strip()
+    if len(s) == 8 and s.isdigit():
+        return f"{s[0:4]}-{s[4:6]}-{s[6:8]}"
+    return s
+
+
+def to_int(v: Any, default: int = 0) -> int:
+    try:
+        if v is None:
+            return default
+        if isinstance(v, bool):
+            return int(v)
+        if isinstance(v, (int, float)):
+            return int(v)
+        s = str(v).strip().replace(",", "")
+        if s == "":
+            return default
+        return int(float(s))
+    except Exception:
+        return default
+
+
+def _int_or_none(v: Any) -> Optional[int]:
+    if v is None or v == "":
+        return None
+    return to_int(v, None)
+
+
+def _text_or_none(v: Any) -> Optional[str]:
+    s = "" if v is None else str(v).strip()
+    return s or None
+
+
+# -------------------------
+# 사고/보험/옵션 요약
+# -------------------------
+def accident_easy_summary(inspection_raw: Optional[Dict[str, Any]]) -> str:
+    if not inspection_raw:
+        return ""
+    outers = inspection_raw.get("outers") or []
+    if not outers:
+        return "무사고"
+
+    items: List[str] = []
+    for o in outers:
+        part = safe_get(o, ["type", "title"]) or safe_get(o, ["type", "code"]) or ""
+        sts = o.get("statusTypes") or []
+        for s in sts:
+            cd = str(s.get("code") or "").strip()
+            title = str(s.get("title") or "").strip()
+            if cd in ACCIDENT_CODES:
+                items.append(f"{part}-{title or cd}")
+                break
+
+    return "무사고" if not items else " / ".join(items)
+
+
+def insurance_summary(record_raw: Optional[Dict[str, Any]]) -> str:
+    if not record_raw:
+        return ""
+
+    r = record_raw
+    if isinstance(record_raw, dict) and isinstance(record_raw.get("record"), dict):
+        r = record_raw["record"]
+
+    def pick(*keys):
+        for k in keys:
+            if isinstance(r, dict) and k in r and r[k] is not None:
+                return r[k]
+        return None
+
+    acc_cnt = pick("accidentCnt", "acc_cnt", "accCnt", "totalAccidentCnt")
+    my_cnt = pick("myAccidentCnt", "my_cnt", "myAccCnt")
+    other_cnt = pick("otherAccidentCnt", "other_cnt", "otherAccCnt")
+    my_cost = pick("myAccidentCost", "my_cost", "myAccCost")
+    other_cost = pick("otherAccidentCost", "other_cost", "otherAccCost")
+
+    parts = []
+    try:
+        if acc_cnt is not None:
+            parts.append(f"보험이력 {int(acc_cnt)}건")
+        if my_cnt is not None:
+            parts.append(f"내차 {int(my_cnt)}건")
+        if my_cost is not None:
+            parts.append(f"내차 {int(my_cost):,}원")
+        if other_cnt is not None:
+            parts.append(f"타차 {int(other_cnt)}건")
+        if other_cost is not None:
+            parts.append(f"타차 {int(other_cost):,}원")
+    except Exception:
+        return str(record_raw)[:200]
+
+    return " / ".join(parts)
+
+
+def standard_options_kr(vehicle_raw: Dict[str, Any]) -> str:
+    std_codes = safe_get(vehicle_raw, ["options", "standard"], default=[]) or []
+    names: List[str] = []
+    for c in std_codes:
+        k = normalize_opt_code(c)
+        nm = OPTION_CODE_MAP.get(k)
+        names.append(nm or f"({c})")
+    return ", ".join(names)
+
+
+def paid_options_kr_and_sum(
+    vehicle_raw: Dict[str, Any],
+    options_choice_list: List[Dict[str, Any]]
+) -> Tuple[str, str, int]:
+    choice_codes = safe_get(vehicle_raw, ["options", "choice"], default=[]) or []
+    choice_codes = [str(x).strip() for x in choice_codes if str(x).strip()]
+
+    # optionCd -> {name, price}
+    m: Dict[str, Dict[str, Any]] = {}
+    for it in options_choice_list or []:
+        cd = str(it.get("optionCd") or "").strip()
+        if not cd:
+            continue
+        m[cd] = {"name": it.get("optionName"), "price": it.get("price")}
+
+    all_names: List[str] = []
+    paid_names: List[str] = []
+    paid_sum = 0
+
+    for cd in choice_codes:
+        info = m.get(cd)
+        if not info:
+            all_names.append(f"({cd})")
+            continue
+
+        nm = info.get("name") or f"({cd})"
+        all_names.append(nm)
+
+        price_int = to_int(info.get("price"), 0)
+        if price_int > 0:
+            paid_names.append(nm)
+            paid_sum += price_int
+
+    return ", ".join(all_names), ", ".join(paid_names), paid_sum
+
+
+def build_combined_row(
+    vehicle_raw: Dict[str, Any],
+    inspection_raw: Optional[Dict[str, Any]],
+    record_raw: Optional[Dict[str, Any]],
+    options_choice_list: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    carid = safe_get(vehicle_raw, ["vehicleId"]) or safe_get(vehicle_raw, ["manage", "dummyVehicleId"]) or ""
+
+    car_no = safe_get(vehicle_raw, ["vehicleNo"]) or ""
+    maker = safe_get(vehicle_raw, ["category", "manufacturerName"]) or ""
+    model_detail = safe_get(vehicle_raw, ["category", "modelName"]) or ""
+    trim = safe_get(vehicle_raw, ["category", "gradeName"]) or ""
+    sub_trim = safe_get(vehicle_raw, ["category", "gradeDetailName"]) or ""
+
+    model_year = (
+        safe_get(vehicle_raw, ["category", "formYear"])
+        or (safe_get(vehicle_raw, ["category", "yearMonth"], "")[:4] or "")
+        or ""
+    )
+
+    fuel = safe_get(vehicle_raw, ["spec", "fuelName"]) or ""
+    body_type = safe_get(vehicle_raw, ["spec", "bodyName"]) or ""
+    mileage_km = safe_get(vehicle_raw, ["spec", "mileage"]) or ""
+    color = safe_get(vehicle_raw, ["spec", "colorName"]) or ""
+    price = safe_get(vehicle_raw, ["advertisement", "price"]) or ""
+
+    first_reg = ""
+    if inspection_raw:
+        first_reg = yyyymmdd_to_iso(safe_get(inspection_raw, ["master", "detail", "firstRegistrationDate"]))
+
+    accident_yn = yn(inspection_raw and safe_get(inspection_raw, ["master", "accdient"]))
+    simple_repair_yn = yn(inspection_raw and safe_get(inspection_raw, ["master", "simpleRepair"]))
+
+    accident_easy = accident_easy_summary(inspection_raw)
+    insurance = insurance_summary(record_raw)
+
+    opt_std_kr = standard_options_kr(vehicle_raw)
+    _, opt_paid_kr, opt_paid_sum = paid_options_kr_and_sum(vehicle_raw, options_choice_list)
+
+    # ✅ UI에서 바로 쓰는 키로 내려준다
+    return {
+        "carid": carid,
+        "차량번호": car_no,
+        "색상": color,
+        "제조사": maker,
+        "세부모델": model_detail,
+        "트림": trim,
+        "세부트림": sub_trim,
+        "연식": str(model_year).strip() if model_year is not None else "",
+        "최초등록일": first_reg,
+        "유종": fuel,
+        "차형": body_type,
+        "주행거리": mileage_km,
+        "판매가": price,
+        "단순수리 Y/N": simple_repair_yn,
+        "사고여부 Y/N": accident_yn,
+
+        "사고이력": accident_easy,
+        "보험이력": insurance,
+        "옵션": opt_std_kr,
+        "유상옵션": opt_paid_kr,
+        "옵션 합계금액": opt_paid_sum,
+    }
+
+
+# -------------------------
+# flat 행 <-> 화면 행
+# -------------------------
+def _options_list(payload_obj: Any) -> List[Dict[str, Any]]:
+    if isinstance(payload_obj, list):
+        return [x for x in payload_obj if isinstance(x, dict)]
+    if isinstance(payload_obj, dict):
+        return [payload_obj]
+    return []
+
+
+def flat_row(
+    car_id: str,
+    vehicle_raw: Any,
+    inspection_raw: Any,
+    record_raw: Any,
+    options_choice: Any,
+) -> Optional[Tuple[Any, ...]]:
+    """
+    파싱된 payload 4종 -> vehicle_flat 1행 (FLAT_COLUMNS 순서, vehicle이 dict가 아니면 None)
+    - 표시용 문자열은 build_combined_row 그대로, 숫자/플래그만 타입 변환
+    """
+    if not isinstance(vehicle_raw, dict):
+        return None
+    iraw = inspection_raw if isinstance(inspection_raw, dict) else None
+    rraw = record_raw if isinstance(record_raw, dict) else None
+    row = build_combined_row(vehicle_raw, iraw, rraw, _options_list(options_choice))
+
+    year = row["연식"]
+    return (
+        str(car_id),
+        _text_or_none(row["차량번호"]),
+        _text_or_none(row["제조사"]),
+        _text_or_none(row["세부모델"]),
+        _text_or_none(row["트림"]),
+        _text_or_none(row["세부트림"]),
+        int(year) if len(year) == 4 and year.isdigit() else None,
+        _text_or_none(row["최초등록일"]),
+        _text_or_none(row["유종"]),
+        _text_or_none(row["차형"]),
+        _text_or_none(row["색상"]),
+        _int_or_none(row["주행거리"]),
+        _int_or_none(row["판매가"]),
+        int(row["사고여부 Y/N"] == "Y"),
+        int(row["단순수리 Y/N"] == "Y"),
+        row["사고이력"] or None,
+        row["보험이력"] or None,
+        row["옵션"] or None,
+        row["유상옵션"] or None,
+        int(row["옵션 합계금액"] or 0),
+    )
+
+
+def combined_row_from_flat(r: Any) -> Dict[str, Any]:
+    """
+    vehicle_flat 1행(컬럼명 접근 가능한 Row/dict) -> 화면/엑셀 키 dict (build_combined_row와 같은 모양)
+    """
+    out: Dict[str, Any] = {}
+    for key, col in ROW_KEYS:
+        v = r[col]
+        if col in ("accident", "simple_repair"):
+            v = yn(v)
+        elif col == "option_paid_sum":
+            v = v or 0
+        elif v is None:
+            v = ""
+        else:
+            v = str(v) if col == "model_year" else v
+        out[key] = v
+    return out
+
+
+# -------------------------
+# DB 반영
+# -------------------------
+def upsert_flat_rows(con: sqlite3.Connection, rows: Iterable[Optional[Tuple[Any, ...]]]) -> int:
+    rows = [r for r in rows if r]
+    if rows:
+        con.executemany(_UPSERT_SQL, rows)
+    return len(rows)
+
+
+def refresh_flat(con: sqlite3.Connection, car_ids: List[str]) -> int:
+    """
+    차량들의 vehicle_flat을 raw 테이블 현재 값으로 갱신 (commit은 호출부에서)
+    - vehicle_raw가 없거나 깨진 차량은 flat 행도 지움
+    반환: 갱신한 행 수
+    """
+    if not car_ids:
+        return 0
+    marks = ",".join("?" * len(car_ids))
+    got = con.execute(_RAW_JOIN_SQL + f" WHERE v.car_id IN ({marks})", car_ids).fetchall()
+
+    rows = [_flat_from_payloads(r) for r in got]
+    keep = {r[0] for r in rows if r}
+    gone = [(cid,) for cid in car_ids if cid not in keep]
+    if gone:
+        con.executemany("DELETE FROM vehicle_flat WHERE car_id=?", gone)
+    return upsert_flat_rows(con, rows)
+
+
+def save_flat(
+    con: sqlite3.Connection,
+    car_id: str,
+    vehicle_raw: Any,
+    inspection_raw: Any,
+    record_raw: Any,
+    options_choice: Any,
+) -> int:
+    """
+    워커가 방금 받은 객체로 vehicle_flat 1행 갱신 (payload를 다시 풀지 않음, commit은 호출부에서)
+    - record_raw가 None(이번에 안 받음)이면 record_raw 테이블에 남아 있는 값을 씀
+    """
+    if record_raw is None:
+        row = con.execute("SELECT payload FROM record_raw WHERE car_id=?", (car_id,)).fetchone()
+        record_raw = encar_codec.loads_payload(row[0]) if row else None
+    return upsert_flat_rows(con, [flat_row(car_id, vehicle_raw, inspection_raw, record_raw, options_choice)])
+
+
+def _flat_from_payloads(r: Any) -> Optional[Tuple[Any, ...]]:
+    car_id, v, i, rec, o = r
+    return flat_row(
+        car_id,
+        encar_codec.loads_payload(v),
+        encar_codec.loads_payload(i),
+        encar_codec.loads_payload(rec),
+        encar_codec.loads_payload(o),
+    )
+
+
+def rebuild(con: sqlite3.Connection, batch: int = REBUILD_BATCH) -> int:
+    """
+    vehicle_raw 전체로 vehicle_flat 재생성 (car_id keyset 순회, 배치마다 commit -> 워커와 같이 돌려도 잠금이 짧음)
+    - vehicle_raw에 없는 flat 행은 마지막에 삭제
+    반환: 기록한 행 수
+    """
+    written = 0
+    last = ""
+    t0 = time.time()
+    while True:
+        got = con.execute(
+            _RAW_JOIN_SQL + " WHERE v.car_id > ? ORDER BY v.car_id LIMIT ?", (last, batch)
+        ).fetchall()
+        if not got:
+            break
+        last = got[-1][0]
+        with con:
+            written += upsert_flat_rows(con, (_flat_from_payloads(r) for r in got))
+        print(f"   rebuilt={written} last_car_id={last} sec={time.time() - t0:.1f}")
+
+    with con:
+        con.execute("DELETE FROM vehicle_flat WHERE car_id NOT IN (SELECT car_id FROM vehicle_raw)")
+    return written
+
+
+def stale_car_ids(con: sqlite3.Connection, limit: int, after: str = "") -> List[str]:
+    """
+    flat이 뒤처진 차량 (raw 내용이 flat 갱신 이후에 바뀌었거나, vehicle_raw는 있는데 flat 행이 없음)
+    - 워커는 raw와 flat을 같은 트랜잭션에서 쓰므로 평소엔 비어 있음
+    - car_id > after 인 것만 car_id 순으로 (sync가 keyset으로 한 번씩만 훑음)
+    """
+    parts = [
+        f"SELECT r.car_id FROM {t} r JOIN vehicle_flat f ON f.car_id = r.car_id "
+        f"WHERE r.car_id > ? AND r.changed_at > f.updated_at"
+        for t in SOURCE_TABLES
+    ]
+    parts.append(
+        "SELECT v.car_id FROM vehicle_raw v "
+        "WHERE v.car_id > ? AND NOT EXISTS (SELECT 1 FROM vehicle_flat f WHERE f.car_id = v.car_id)"
+    )
+    rows = con.execute(
+        " UNION ".join(parts) + " ORDER BY 1 LIMIT ?", [after] * len(parts) + [limit]
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def sync(con: sqlite3.Connection, batch: int = REBUILD_BATCH) -> int:
+    """
+    뒤처진 차량만 다시 평탄화 (car_id keyset으로 한 번씩만, 배치마다 commit)
+    - payload가 깨져서 평탄화가 안 되는 차량은 flat 행 없이 남고(missing) 건너뜀 -> 다음 배치로 진행
+    - vehicle_raw에 없는 flat 행은 마지막에 삭제
+    반환: 갱신한 차량 수
+    """
+    done = 0
+    skipped = 0
+    last = ""
+    t0 = time.time()
+    while True:
+        ids = stale_car_ids(con, batch, after=last)
+        if not ids:
+            break
+        last = ids[-1]
+        with con:
+            written = refresh_flat(con, ids)
+        done += written
+        skipped += len(ids) - written
+        print(f"   synced={done} skipped={skipped} last_car_id={last} sec={time.time() - t0:.1f}")
+
+    if skipped:
+        print(f"⚠️ {skipped} cars could not be flattened (broken vehicle_raw payload), left missing")
+
+    with con:
+        con.execute(
+            "DELETE FROM vehicle_flat WHERE NOT EXISTS (SELECT 1 FROM vehicle_raw v WHERE v.car_id = vehicle_flat.car_id)"
+        )
+    return done
+
+
+def lag_report(con: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+    """
+    raw 테이블별 vehicle_flat 지연
+    - stale: flat 갱신 이후에 바뀐 raw 행 수
+    - lag_sec: 그중 가장 오래 반영 안 된 변경이 지금까지 밀린 시간 (없으면 0)
+    - vehicle_flat: flat 행이 아예 없는 차량(missing) / vehicle_raw에 없는 flat 행(extra)
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    for t in SOURCE_TABLES:
+        n, lag = con.execute(
+            f"""
+            SELECT COUNT(*), (julianday('now') - julianday(MIN(r.changed_at))) * 86400
+            FROM {t} r JOIN vehicle_flat f ON f.car_id = r.car_id
+            WHERE r.changed_at > f.updated_at
+            """
+        ).fetchone()
+        out[t] = {"stale": int(n), "lag_sec": int(lag or 0)}
+
+    missing = con.execute(
+        "SELECT COUNT(*) FROM vehicle_raw v WHERE NOT EXISTS (SELECT 1 FROM vehicle_flat f WHERE f.car_id = v.car_id)"
+    ).fetchone()[0]
+    extra = con.execute(
+        "SELECT COUNT(*) FROM vehicle_flat f WHERE NOT EXISTS (SELECT 1 FROM vehicle_raw v WHERE v.car_id = f.car_id)"
+    ).fetchone()[0]
+    last = con.execute("SELECT MAX(updated_at) FROM vehicle_flat").fetchone()[0]
+    out["vehicle_flat"] = {"missing": int(missing), "extra": int(extra), "last_updated_at": last}
+    return out
+
+
+def print_stats(con: sqlite3.Connection) -> None:
+    raw = con.execute("SELECT COUNT(*) FROM vehicle_raw").fetchone()[0]
+    flat = con.execute("SELECT COUNT(*) FROM vehicle_flat").fetchone()[0]
+    rep = lag_report(con)
+    f = rep["vehicle_flat"]
+    print(f"vehicle_raw={raw} vehicle_flat={flat} missing={f['missing']} extra={f['extra']} "
+          f"last_updated_at={f['last_updated_at']}")
+    for t in SOURCE_TABLES:
+        print(f"   {t:<20} stale={rep[t]['stale']} lag_sec={rep[t]['lag_sec']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="vehicle_flat(목록/집계용 평탄화 테이블) 관리")
+    ap.add_argument("command", choices=["rebuild", "sync", "stats"])
+    ap.add_argument("--batch", type=int, default=REBUILD_BATCH)
+    args = ap.parse_args()
+
+    con = encar_db.connect()
+    encar_db.init_db(con)
+
+    if args.command == "rebuild":
+        encar_codec.load_active_dicts(con)
+        print(f"✅ rebuilt rows={rebuild(con, args.batch)}")
+    elif args.command == "sync":
+        encar_codec.load_active_dicts(con)
+        print(f"✅ synced cars={sync(con, args.batch)}")
+
+    print_stats(con)
+
+
+if __name__ == "__main__":
+    main()
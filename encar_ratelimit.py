@@ -0,0 +1,161 @@
+# encar_ratelimit.py
+# 엔카 API 호출 속도 제어 (토큰 버킷 + AIMD)
+# - sleepy() 고정 랜덤 대기 / 고정 backoff 대신 응답에 따라 속도를 자동 조절
+# - 같은 프로세스 안의 스레드/asyncio 태스크가 endpoint family별 limiter 하나를 공유
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# -------------------------
+# 설정 (family별)
+# -------------------------
+# rate: 시작 속도(초당 요청 수), min_rate/max_rate: AIMD 범위
+RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "list": {"rate": 2.0, "min_rate": 0.2, "max_rate": 6.0},
+    "vehicle": {"rate": 4.0, "min_rate": 0.3, "max_rate": 20.0},
+    "inspection": {"rate": 4.0, "min_rate": 0.3, "max_rate": 20.0},
+    "record": {"rate": 4.0, "min_rate": 0.3, "max_rate": 20.0},
+    "options": {"rate": 4.0, "min_rate": 0.3, "max_rate": 20.0},
+    "user": {"rate": 2.0, "min_rate": 0.2, "max_rate": 10.0},
+}
+
+INCREASE_STEP = 0.05          # 200 응답마다 rate += (초당 요청 수)
+THROTTLE_DECREASE = 0.5       # 429/403: rate *= 0.5
+ERROR_DECREASE = 0.8          # 5xx/timeout: rate *= 0.8
+DECREASE_INTERVAL_SEC = 2.0   # 동시에 쏟아지는 429로 rate가 바닥까지 떨어지지 않게 감속은 이 간격에 한 번만
+THROTTLE_PAUSE_SEC = 5.0      # 429/403 이후 family 전체 정지 시간 (Retry-After가 더 길면 그걸 따름)
+ERROR_PAUSE_SEC = 1.0         # 5xx/timeout 이후 정지 시간
+JITTER = 0.2                  # 대기 시간에 (0 ~ JITTER/rate)초 랜덤 추가 (요청 간격이 기계적으로 보이지 않게)
+
+
+class AdaptiveRateLimiter:
+    """
+    토큰 버킷 + AIMD
+    - acquire()/acquire_async(): 토큰 하나를 예약하고 부족하면 그만큼 대기
+    - on_success(): rate를 조금씩 올림 (additive increase)
+    - on_throttle(): rate를 절반으로 + 잠시 전체 정지 (multiplicative decrease)
+    - on_error(): 5xx/timeout은 완만하게 감속
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        burst: float = 2.0,
+    ):
+        self.name = name
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.burst = float(burst)
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        self.stats = {"acquired": 0, "success": 0, "throttled": 0, "errors": 0, "waited_sec": 0.0}
+
+    def _reserve(self) -> float:
+        """
+        토큰 하나 예약 -> 대기할 초
+        - 정지 중이면 _updated가 정지 끝(_paused_until)에 있어서 거기서부터 1/rate 간격으로 자리를 잡음
+          (정지 동안 기다린 호출들이 정지가 끝나는 순간 한꺼번에 나가지 않게)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= 1.0
+
+            wait = self._updated - now
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            if wait > 0:
+                wait += random.uniform(0, JITTER / self.rate)
+
+            self.stats["acquired"] += 1
+            self.stats["waited_sec"] += wait
+            return wait
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+            self.stats["success"] += 1
+
+    def _decrease(self, factor: float, pause_sec: float) -> None:
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + pause_sec)
+        if self._updated < self._paused_until:
+            # 정지가 끝나면 토큰 1개에서 다시 시작 (정지 동안은 채우지 않음 -> burst로 몰리지 않음)
+            self._tokens = min(self._tokens, 1.0)
+            self._updated = self._paused_until
+        if now - self._last_decrease >= DECREASE_INTERVAL_SEC:
+            self.rate = max(self.min_rate, self.rate * factor)
+            self._last_decrease = now
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self._decrease(THROTTLE_DECREASE, max(THROTTLE_PAUSE_SEC, retry_after or 0.0))
+            self.stats["throttled"] += 1
+
+    def on_error(self) -> None:
+        with self._lock:
+            self._decrease(ERROR_DECREASE, ERROR_PAUSE_SEC)
+            self.stats["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"family": self.name, "rate": round(self.rate, 2), **self.stats}
+
+
+_LIMITERS: Dict[str, AdaptiveRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(family: str) -> AdaptiveRateLimiter:
+    """
+    family별 limiter (프로세스 전역 공유, 최초 호출 시 RATE_LIMITS로 생성)
+    """
+    with _LIMITERS_LOCK:
+        lim = _LIMITERS.get(family)
+        if lim is None:
+            cfg = RATE_LIMITS.get(family) or RATE_LIMITS["vehicle"]
+            lim = AdaptiveRateLimiter(family, **cfg)
+            _LIMITERS[family] = lim
+        return lim
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def print_limiter_stats() -> None:
+    for name in sorted(_LIMITERS):
+        s = _LIMITERS[name].snapshot()
+        print(
+            f"   rate[{name}] rate={s['rate']}/s acquired={s['acquired']} "
+            f"ok={s['success']} throttled={s['throttled']} errors={s['errors']} waited={s['waited_sec']:.1f}s"
+        )
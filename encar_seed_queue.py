@@ -1,10 +1,18 @@
 # encar_seed_queue.py
+import argparse
+import resource
+import sys
+import threading
 import time
-import random
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Any, Dict, List, Optional, Set, Tuple
 
 import requests
-from encar_db import connect, init_db
+
+import encar_codec
+from encar_db import connect, ensure_columns, init_db
+from encar_ratelimit import get_limiter, parse_retry_after, print_limiter_stats
 
 API_URL = "https://api.encar.com/search/car/list/pricesupply"
 
@@ -20,12 +28,45 @@ MAKERS: Dict[str, str] = {
 SORT_FIELD = "PriceAsc"
 LIMIT = 500
 
-SLEEP_BETWEEN_CALLS_SEC = (0.2, 0.55)
+# incremental 모드: 수정일 최신순으로 읽다가 제조사별 watermark(지난번 본 가장 최근 ModifiedDate)보다
+# 오래된 매물이 나오면 멈춤 (snapshot/inactive 판정은 하지 않음 -> 하루 1번 full 모드로)
+INCREMENTAL_SORT = "ModifiedDate"
+INCREMENTAL_LIMIT = 100
+INCREMENTAL_MAX_PAGES = 50
+
+# 호출 간격은 encar_ratelimit.RATE_LIMITS["list"]에서 조절
 TIMEOUT_SEC = 20
 MAX_RETRIES = 5
 
-EXISTING_TABLE = "car_queue"
-EXISTING_ID_COL = "car_id"
+# 쿼리 분할 (partition)
+# - 제조사 쿼리를 totalCount가 PARTITION_MAX_TOTAL 이하가 될 때까지 주행거리 -> 연식 순으로 반씩 나눔
+#   (깊은 offset은 느리고, 잘리고, 크롤 중 순서가 밀리기 쉬움)
+# - 범위는 양끝 포함, 인접 구간은 겹치지 않음 (lo..mid, mid+1..hi)
+PARTITION_MAX_TOTAL = 3000
+MILEAGE_SPLIT = 200000            # 기존 쿼리 상한. 0..200000 / 200001..MILEAGE_MAX 두 구간에서 시작
+MILEAGE_MAX = 9999999             # 20만km 초과 매물도 포함
+MIN_MILEAGE_SPAN = 2000           # 이보다 좁은 주행거리 구간은 연식으로 분할
+YEAR_RANGE = (0, 999999)          # Year(YYYYMM) 분할 시작 범위 (양끝은 열어 둬서 범위 밖 연식도 빠지지 않음)
+# 연식 분할은 실제 연식 구간 안에서만 이등분 (0..9999년을 나누면 의미 없는 probe가 13단계쯤 더 생김)
+# - 가장 오래된/최신 구간은 YEAR_RANGE 끝까지 열려 있음 (1990년 이전, 내년 연식도 포함)
+YEAR_SPLIT_FIRST = 1990
+YEAR_SPLIT_LAST = time.localtime().tm_year + 1
+# 분할될 것 같은 partition(부모 totalCount/2 > PARTITION_MAX_TOTAL)의 첫 요청은 totalCount만 보게 작게
+# (분할되면 첫 페이지는 버려지므로), 분할 안 되면 offset 0부터 LIMIT으로 다시 가져옴
+PROBE_LIMIT = 10
+PARTITION_RETRIES = 2             # 페이지 요청 실패 시 그 페이지만 다시 시도하는 횟수 (EncarClient 재시도와 별도)
+
+# 실행 모드: "parallel" 은 제조사/페이지를 동시에 가져옴, "serial" 은 기존 순차 처리
+SEED_MODE = "parallel"
+# parallel 모드 fetch 스레드 수 (실제 호출 속도는 "list" limiter가 전체로 제한)
+SEED_WORKERS = 4
+
+# partition 완전성: 반영한 페이지 id 수가 totalCount의 이 비율 이상이어야 "끝까지 읽음"
+# (크롤 중 목록이 밀려 조금 모자랄 수 있음, offset 상한/분할 불가로 잘린 partition은 크게 모자람)
+PARTITION_COMPLETE_RATIO = 0.99
+
+# 목록 응답 fingerprint (car_state.list_fp): 이 값이 바뀐 차량만 상세 재수집 대상으로 다시 큐에 넣음
+LIST_FP_FIELDS = ("Price", "Mileage", "ModifiedDate", "SalesStatus")
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)",
@@ -36,10 +77,6 @@ DEFAULT_HEADERS = {
 }
 
 
-def sleepy():
-    time.sleep(random.uniform(*SLEEP_BETWEEN_CALLS_SEC))
-
-
 def safe_get(d: Any, path: List[Any], default=None):
     cur = d
     for p in path:
@@ -80,6 +117,19 @@ def pick_car_id(item: Dict[str, Any]) -> Optional[str]:
     return str(v) if v is not None else None
 
 
+def list_fingerprint(item: Dict[str, Any]) -> str:
+    """
+    목록 항목의 가격/주행거리/수정일/판매상태를 "370|182271|...|" 같은 짧은 문자열로 (없는 필드는 빈 값)
+    """
+    parts = []
+    for k in LIST_FP_FIELDS:
+        v = item.get(k)
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        parts.append("" if v is None else str(v))
+    return "|".join(parts)
+
+
 def get_total_count(j: Dict[str, Any]) -> Optional[int]:
     for p in (
         ["common", "totalCount"],
@@ -95,34 +145,97 @@ def get_total_count(j: Dict[str, Any]) -> Optional[int]:
     return None
 
 
-def table_exists(con, name: str) -> bool:
-    r = con.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
-        (name,),
-    ).fetchone()
-    return r is not None
-
-
-def preload_existing_queue_ids(con) -> Set[str]:
-    if not table_exists(con, EXISTING_TABLE):
-        return set()
-    rows = con.execute(f"SELECT {EXISTING_ID_COL} FROM {EXISTING_TABLE}").fetchall()
-    return {str(r[0]) for r in rows if r and r[0] is not None}
+def peak_rss_mb() -> float:
+    """
+    프로세스 최대 상주 메모리(MB) (ru_maxrss 단위: Linux KB, macOS bytes)
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
 
 
-def build_q(maker_kr: str) -> str:
+def build_q(
+    maker_kr: str,
+    mileage: Tuple[int, int] = (0, MILEAGE_SPLIT),
+    year: Optional[Tuple[int, int]] = None,
+) -> str:
+    year_q = f"_.Year.range({year[0]}..{year[1]})." if year else ""
     return (
         "(And.Hidden.N._.ServiceCopyCar.Original._."
-        f"(C.CarType.A._.Manufacturer.{maker_kr}.)_.Mileage.range(0..200000).)"
+        f"(C.CarType.A._.Manufacturer.{maker_kr}.)_.Mileage.range({mileage[0]}..{mileage[1]}).{year_q})"
     )
 
 
-def build_sr(offset: int, limit: int) -> str:
-    return f"|{SORT_FIELD}|{offset}|{limit}"
+# -------------------------
+# partition
+# -------------------------
+def root_partitions(maker_key: str, maker_kr: str) -> List[Dict[str, Any]]:
+    return [
+        {"maker_key": maker_key, "maker_kr": maker_kr, "mileage": (0, MILEAGE_SPLIT), "year": None},
+        {"maker_key": maker_key, "maker_kr": maker_kr, "mileage": (MILEAGE_SPLIT + 1, MILEAGE_MAX), "year": None},
+    ]
+
+
+def split_partition(part: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    partition을 겹치지 않는 두 개로 (주행거리 우선, 더 못 나누면 연식, 그것도 안 되면 None)
+    """
+    lo, hi = part["mileage"]
+    if hi - lo + 1 > MIN_MILEAGE_SPAN:
+        mid = (lo + hi) // 2
+        return [{**part, "mileage": (lo, mid)}, {**part, "mileage": (mid + 1, hi)}]
+
+    ylo, yhi = part["year"] or YEAR_RANGE
+    y0, y1 = max(ylo // 100, YEAR_SPLIT_FIRST), min(yhi // 100, YEAR_SPLIT_LAST)
+    if y1 > y0:
+        ymid = (y0 + y1) // 2
+        return [{**part, "year": (ylo, ymid * 100 + 99)}, {**part, "year": ((ymid + 1) * 100, yhi)}]
+
+    return None
+
+
+def is_probe(part: Dict[str, Any], offset: int) -> bool:
+    """
+    첫 요청을 PROBE_LIMIT건으로 보낼지 (부모 totalCount로 봐서 이 partition도 분할될 것 같을 때)
+    """
+    return offset == 0 and "total" not in part and part.get("expected", 0) > PARTITION_MAX_TOTAL
+
+
+def partition_label(part: Dict[str, Any]) -> str:
+    lo, hi = part["mileage"]
+    label = f"{part['maker_key']} km={lo}..{hi}"
+    if part["year"]:
+        label += f" year={part['year'][0]}..{part['year'][1]}"
+    return label
+
+
+def partition_params(part: Dict[str, Any], offset: int) -> Dict[str, str]:
+    return {
+        "count": "true",
+        "q": build_q(part["maker_kr"], part["mileage"], part["year"]),
+        "sr": build_sr(offset, PROBE_LIMIT if is_probe(part, offset) else LIMIT),
+    }
+
+
+def plan_first_page(part: Dict[str, Any], data: Dict[str, Any]) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+    """
+    partition 첫 페이지(count=true) 결과로 분할 여부 결정
+    반환: (totalCount, 자식 partition 목록 | None=이대로 크롤)
+    """
+    total = get_total_count(data)
+    if total is None:
+        raise RuntimeError(f"totalCount not found (count=true) {partition_label(part)}")
+    if total > PARTITION_MAX_TOTAL:
+        children = split_partition(part)
+        if children:
+            for c in children:
+                c["expected"] = total // len(children)
+            return total, children
+        print(f"⚠️ cannot split further: {partition_label(part)} total={total}")
+    return total, None
 
 
-def chunk_list(xs: List[str], n: int) -> List[List[str]]:
-    return [xs[i:i+n] for i in range(0, len(xs), n)]
+def build_sr(offset: int, limit: int, sort: str = SORT_FIELD) -> str:
+    return f"|{sort}|{offset}|{limit}"
 
 
 # -------------------------
@@ -146,108 +259,359 @@ def ensure_tables(con) -> None:
     """)
     con.execute("CREATE INDEX IF NOT EXISTS idx_car_state_status ON car_state(status)")
     con.execute("CREATE INDEX IF NOT EXISTS idx_car_state_last_seen ON car_state(last_seen_at)")
+    ensure_columns(
+        con, "car_state", [("list_fp", "TEXT"), ("list_fp_changed_at", "DATETIME"), ("maker_key", "TEXT")]
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_car_state_maker ON car_state(maker_key, status)")
+    # 일별 게시 이력: 차량별 연속 게시 구간 1행 (run-length). 날짜는 full 스냅샷이 끝난 날 기준(seed_days)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS car_presence (
+        car_id    TEXT NOT NULL,
+        start_day TEXT NOT NULL,          -- YYYY-MM-DD
+        end_day   TEXT NOT NULL,          -- YYYY-MM-DD (포함)
+        PRIMARY KEY (car_id, start_day)
+    ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_car_presence_days ON car_presence(end_day, start_day)")
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS seed_days (
+        day         TEXT PRIMARY KEY,     -- full 스냅샷을 끝까지 마친 날
+        cars        INTEGER NOT NULL,
+        finished_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS seed_watermark (
+        scope      TEXT PRIMARY KEY,      -- maker_key
+        watermark  TEXT NOT NULL,         -- 마지막으로 본 가장 최근 ModifiedDate
+        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    # full 실행 체크포인트: 중단된 실행을 --resume으로 이어서 (이미 반영한 페이지는 다시 안 가져옴)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS seed_run (
+        run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+        day         TEXT NOT NULL,        -- 시작일 (YYYY-MM-DD, 게시 이력 기록일)
+        mode        TEXT,
+        status      TEXT NOT NULL DEFAULT 'RUNNING',   -- RUNNING | DONE | ABANDONED
+        started_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        finished_at DATETIME
+    )
+    """)
+    # partition별 분할 여부/totalCount (key = partition_label)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS seed_partition (
+        run_id    INTEGER NOT NULL,
+        part_key  TEXT NOT NULL,
+        maker_key TEXT NOT NULL,
+        total     INTEGER,
+        split     INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (run_id, part_key)
+    ) WITHOUT ROWID
+    """)
+    # 반영 끝난 페이지 (parallel 모드는 순서 없이 끝나므로 "마지막 offset" 대신 페이지별 1행)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS seed_checkpoint (
+        run_id   INTEGER NOT NULL,
+        part_key TEXT NOT NULL,
+        offset   INTEGER NOT NULL,
+        ids      INTEGER NOT NULL DEFAULT 0,   -- 페이지에서 받은 차량 수
+        done_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_id, part_key, offset)
+    ) WITHOUT ROWID
+    """)
+    ensure_columns(con, "seed_checkpoint", [("ids", "INTEGER NOT NULL DEFAULT 0")])
+    # 페이지 반영용 staging (커넥션 전용 TEMP, kind: new | reappear | changed | NULL)
+    con.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS seed_stage (
+        car_id TEXT PRIMARY KEY,
+        fp     TEXT,
+        kind   TEXT
+    )
+    """)
     con.commit()
 
 
-def reset_today_snapshot(con) -> None:
-    con.execute("DELETE FROM car_snapshot_today")
-    con.commit()
+# -------------------------
+# 실행 체크포인트
+# -------------------------
+def start_run(con, mode: str) -> Tuple[int, str]:
+    """
+    새 full 실행 시작: 열려 있던 실행은 ABANDONED, 지난 체크포인트 정리, 오늘 스냅샷 초기화
+    반환: (run_id, day)
+    """
+    day = time.strftime("%Y-%m-%d")
+    with con:
+        con.execute("UPDATE seed_run SET status='ABANDONED' WHERE status='RUNNING'")
+        con.execute("DELETE FROM seed_checkpoint WHERE run_id IN (SELECT run_id FROM seed_run WHERE status != 'RUNNING')")
+        con.execute("DELETE FROM seed_partition WHERE run_id IN (SELECT run_id FROM seed_run WHERE status != 'RUNNING')")
+        con.execute("DELETE FROM car_snapshot_today")
+        run_id = con.execute("INSERT INTO seed_run(day, mode) VALUES(?, ?)", (day, mode)).lastrowid
+    return int(run_id), day
 
 
-def select_existing_states(con, ids: List[str]) -> Dict[str, str]:
-    if not ids:
-        return {}
-    result: Dict[str, str] = {}
-    for part in chunk_list(ids, 900):
-        placeholders = ",".join(["?"] * len(part))
-        rows = con.execute(
-            f"SELECT car_id, status FROM car_state WHERE car_id IN ({placeholders})",
-            part,
-        ).fetchall()
-        for r in rows:
-            result[str(r[0])] = str(r[1])
-    return result
-
-
-def filter_out_existing_raw(con, ids: List[str]) -> List[str]:
-    """
-    vehicle_raw에 이미 있는 car_id는 제외
-    """
-    if not ids:
-        return []
-    keep: List[str] = []
-    for part in chunk_list(ids, 900):
-        placeholders = ",".join(["?"] * len(part))
-        rows = con.execute(
-            f"SELECT car_id FROM vehicle_raw WHERE car_id IN ({placeholders})",
-            part
-        ).fetchall()
-        exists = {str(r[0]) for r in rows}
-        keep.extend([cid for cid in part if cid not in exists])
-    return keep
-
-
-def upsert_snapshot_today(con, ids: List[str]) -> None:
-    con.executemany(
-        "INSERT OR IGNORE INTO car_snapshot_today(car_id) VALUES(?)",
-        [(cid,) for cid in ids],
-    )
+def open_run(con) -> Optional[Tuple[int, str]]:
+    """
+    이어서 할 실행 (가장 최근 RUNNING) -> (run_id, day) | None
+    """
+    r = con.execute("SELECT run_id, day FROM seed_run WHERE status='RUNNING' ORDER BY run_id DESC LIMIT 1").fetchone()
+    return (int(r[0]), str(r[1])) if r else None
 
 
-def insert_new_states(con, new_ids: List[str]) -> None:
-    con.executemany(
-        "INSERT OR IGNORE INTO car_state(car_id, status) VALUES(?, 'ACTIVE')",
-        [(cid,) for cid in new_ids],
-    )
+def finish_run(con, run_id: int) -> None:
+    con.execute("UPDATE seed_run SET status='DONE', finished_at=CURRENT_TIMESTAMP WHERE run_id=?", (run_id,))
 
 
-def touch_active_states(con, ids: List[str]) -> None:
-    if not ids:
-        return
-    for part in chunk_list(ids, 900):
-        placeholders = ",".join(["?"] * len(part))
+def save_partition(con, run_id: int, part: Dict[str, Any], total: int, split: bool) -> None:
+    with con:
         con.execute(
-            f"""
-            UPDATE car_state
-               SET last_seen_at = CURRENT_TIMESTAMP,
-                   status = 'ACTIVE',
-                   last_change_at = CASE WHEN status != 'ACTIVE' THEN CURRENT_TIMESTAMP ELSE last_change_at END
-             WHERE car_id IN ({placeholders})
+            """
+            INSERT INTO seed_partition(run_id, part_key, maker_key, total, split) VALUES(?, ?, ?, ?, ?)
+            ON CONFLICT(run_id, part_key) DO UPDATE SET total=excluded.total, split=excluded.split
             """,
-            part
+            (run_id, partition_label(part), part["maker_key"], total, int(split)),
         )
 
 
-def enqueue_ids(con, queue_existing_ids: Set[str], ids: List[str]) -> int:
+def pending_tasks(con, run_id: int, makers: Dict[str, str]) -> List[Tuple[Dict[str, Any], int]]:
     """
-    ✅ 큐에 없는 것만 추가 (기존 큐 상태 절대 건드리지 않음)
+    실행에서 아직 안 끝난 (partition, offset) 목록 (새 실행이면 제조사별 root partition 첫 페이지들)
+    - 분할이 기록된 partition은 같은 규칙(split_partition)으로 자식을 다시 만들어 내려감
+    - totalCount가 기록된 partition은 체크포인트에 없는 offset만 (part["total"]을 채워서 첫 페이지 판단 생략)
+    - 기록이 없는 partition은 첫 페이지부터
     """
-    if not ids:
-        return 0
+    parts = {
+        str(r[0]): (r[1], bool(r[2]))
+        for r in con.execute("SELECT part_key, total, split FROM seed_partition WHERE run_id=?", (run_id,))
+    }
+    done = {
+        (str(r[0]), int(r[1]))
+        for r in con.execute("SELECT part_key, offset FROM seed_checkpoint WHERE run_id=?", (run_id,))
+    }
+
+    out: List[Tuple[Dict[str, Any], int]] = []
+    stack = [part for key, kr in reversed(list(makers.items())) for part in reversed(root_partitions(key, kr))]
+    while stack:
+        part = stack.pop()
+        key = partition_label(part)
+        rec = parts.get(key)
+        if rec is None:
+            out.append((part, 0))
+            continue
+        total, split = rec
+        children = split_partition(part) if split else None
+        if children:
+            stack.extend(reversed(children))
+            continue
+        part["total"] = int(total or 0)
+        out.extend((part, off) for off in range(0, part["total"], LIMIT) if (key, off) not in done)
+    return out
+
+
+def enqueue_new(con) -> int:
+    """
+    ✅ 신규 + 재등장(seed_stage kind)을 큐에 없는 것만 추가 (기존 큐 상태 절대 건드리지 않음)
+    - 중복 판정은 car_queue PK가 함 (메모리에 기존 id를 올리지 않음)
+    """
+    return con.execute("""
+        INSERT OR IGNORE INTO car_queue(car_id, status)
+        SELECT car_id, 'PENDING' FROM seed_stage WHERE kind IN ('new', 'reappear')
+    """).rowcount
+
+
+def enqueue_refresh(con) -> int:
+    """
+    목록 fingerprint가 바뀐 차량(seed_stage kind='changed')을 상세 재수집 대상으로
+    - 큐에 없으면 추가, DONE/ERROR면 PENDING으로 (재시도 횟수/예약 초기화)
+    - PENDING/RUNNING은 그대로 (곧 수집됨)
+    """
+    cur = con.execute("""
+        INSERT OR IGNORE INTO car_queue(car_id, status)
+        SELECT car_id, 'PENDING' FROM seed_stage WHERE kind = 'changed'
+    """)
+    n = cur.rowcount
+    cur = con.execute("""
+        UPDATE car_queue
+           SET status='PENDING', retry_count=0, last_error=NULL, error_class=NULL, next_attempt_at=NULL,
+               updated_at=datetime('now')
+         WHERE car_id IN (SELECT car_id FROM seed_stage WHERE kind = 'changed')
+           AND status IN ('DONE', 'ERROR')
+    """)
+    return n + cur.rowcount
+
 
-    new_to_queue = [cid for cid in ids if cid not in queue_existing_ids]
-    con.executemany(
-        "INSERT OR IGNORE INTO car_queue(car_id, status) VALUES(?, 'PENDING')",
-        [(cid,) for cid in new_to_queue],
+def record_presence(con, day: str, complete_makers: List[str], all_complete: bool) -> Tuple[int, int]:
+    """
+    오늘 스냅샷(car_snapshot_today)을 게시 이력에 반영 (full 스냅샷이 끝났을 때만 호출)
+    - 직전 기록일(seed_days)에 끝난 구간은 오늘까지 연장, 그 외 차량은 오늘부터 새 구간
+      (seeder가 안 돈 날은 앞뒤 기록일이 이어져 있으면 게시된 것으로 봄)
+    - 스냅샷에 없어서 구간이 끝나는 건 끝까지 읽은 제조사만 (finalize_inactive와 같은 범위)
+      잘린 제조사(+ 모든 제조사가 완전하지 않으면 maker_key 없는 차량)의 열린 구간은 스냅샷에 없어도 연장
+    - 같은 날 다시 돌리면 그날 구간에 합쳐짐
+    반환: (연장된 구간 수, 새 구간 수)
+    """
+    r = con.execute("SELECT MAX(day) FROM seed_days WHERE day < ?", (day,)).fetchone()
+    prev = r[0] if r else None
+
+    extended = 0
+    if prev:
+        # NOT IN (NULL)은 항상 거짓이라 완전한 제조사가 없으면 maker_key가 있는 차량 전부
+        incomplete = "maker_key IS NOT NULL"
+        if complete_makers:
+            incomplete = f"maker_key NOT IN ({','.join('?' * len(complete_makers))})"
+        extended = con.execute(
+            f"""
+            UPDATE car_presence SET end_day = ?
+             WHERE end_day = ?
+               AND (car_id IN (SELECT car_id FROM car_snapshot_today)
+                    OR car_id IN (SELECT car_id FROM car_state
+                                   WHERE status = 'ACTIVE'
+                                     AND ({incomplete} OR (maker_key IS NULL AND NOT ?))))
+            """,
+            (day, prev, *complete_makers, int(all_complete)),
+        ).rowcount
+
+    started = con.execute(
+        """
+        INSERT OR IGNORE INTO car_presence(car_id, start_day, end_day)
+        SELECT s.car_id, ?, ?
+          FROM car_snapshot_today s
+         WHERE NOT EXISTS (
+               -- +end_day: end_day 인덱스 대신 PK(car_id, ...)로 찾게 함
+               SELECT 1 FROM car_presence p WHERE p.car_id = s.car_id AND +p.end_day = ?
+         )
+        """,
+        (day, day, day),
+    ).rowcount
+
+    con.execute(
+        """
+        INSERT INTO seed_days(day, cars) VALUES(?, (SELECT COUNT(*) FROM car_snapshot_today))
+        ON CONFLICT(day) DO UPDATE SET cars=excluded.cars, finished_at=CURRENT_TIMESTAMP
+        """,
+        (day,),
     )
+    return extended, started
 
-    for cid in new_to_queue:
-        queue_existing_ids.add(cid)
 
-    return len(new_to_queue)
+def supply_by_day(con, start_day: str, end_day: str) -> List[Tuple[str, int]]:
+    """
+    기록일별 게시 중인 차량 수 [(day, count)]
+    - car_presence를 한 번만 읽음: 구간 시작/끝을 날짜별 이벤트로 모아 누적합
+      (day의 게시 수 = start_day <= day 인 구간 수 - end_day < day 인 구간 수)
+    - 기록일마다 car_presence를 다시 세면 O(기록일 × 구간)이라 기간이 길수록 느려짐
+    """
+    rows = con.execute(
+        """
+        WITH ev(day, starts, ends) AS (
+            SELECT start_day, COUNT(*), 0 FROM car_presence WHERE start_day <= ? GROUP BY start_day
+            UNION ALL
+            SELECT end_day, 0, COUNT(*) FROM car_presence WHERE end_day < ? GROUP BY end_day
+            UNION ALL
+            SELECT day, 0, 0 FROM seed_days WHERE day BETWEEN ? AND ?
+        ),
+        per_day AS (
+            SELECT day, SUM(starts) AS starts, SUM(ends) AS ends FROM ev GROUP BY day
+        ),
+        running AS (
+            -- 같은 날 끝난 구간은 그날까지 게시 중 -> 누적 끝 수에서 그날 몫은 뺌
+            SELECT day, SUM(starts) OVER w - SUM(ends) OVER w + ends AS cars
+              FROM per_day
+            WINDOW w AS (ORDER BY day)
+        )
+        SELECT r.day, r.cars
+          FROM running r JOIN seed_days d ON d.day = r.day
+         WHERE r.day BETWEEN ? AND ?
+         ORDER BY r.day
+        """,
+        (end_day, end_day, start_day, end_day, start_day, end_day),
+    ).fetchall()
+    return [(str(r[0]), int(r[1])) for r in rows]
 
 
-def finalize_inactive(con) -> int:
-    before = con.execute("SELECT COUNT(*) FROM car_state WHERE status='INACTIVE'").fetchone()[0]
-    con.execute("""
+def car_lifetime(con, car_id: str) -> Dict[str, Any]:
+    """
+    차량 게시 구간 목록 + 총 게시 일수
+    """
+    rows = con.execute(
+        "SELECT start_day, end_day FROM car_presence WHERE car_id=? ORDER BY start_day",
+        (car_id,),
+    ).fetchall()
+    spans = [(str(r[0]), str(r[1])) for r in rows]
+    days = con.execute(
+        """
+        SELECT COALESCE(SUM(julianday(end_day) - julianday(start_day) + 1), 0)
+          FROM car_presence WHERE car_id=?
+        """,
+        (car_id,),
+    ).fetchone()[0]
+    return {"car_id": car_id, "spans": spans, "listed_days": int(days)}
+
+
+def get_watermark(con, scope: str) -> Optional[str]:
+    r = con.execute("SELECT watermark FROM seed_watermark WHERE scope=?", (scope,)).fetchone()
+    return str(r[0]) if r else None
+
+
+def set_watermark(con, scope: str, watermark: str) -> None:
+    with con:
+        con.execute(
+            """
+            INSERT INTO seed_watermark(scope, watermark) VALUES(?, ?)
+            ON CONFLICT(scope) DO UPDATE SET watermark=excluded.watermark, updated_at=CURRENT_TIMESTAMP
+            """,
+            (scope, watermark),
+        )
+
+
+def maker_completeness(con, run_id: int, makers: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    실행의 제조사별 완전성 {maker_key: {"complete", "partitions", "incomplete": [(part_key, ids, total)]}}
+    - 분할되지 않은 partition마다 반영한 id 수 >= totalCount * PARTITION_COMPLETE_RATIO 이어야 완전
+    - partition 기록이 하나도 없는 제조사는 불완전
+    """
+    out: Dict[str, Dict[str, Any]] = {k: {"complete": False, "partitions": 0, "incomplete": []} for k in makers}
+    rows = con.execute(
+        """
+        SELECT p.maker_key, p.part_key, p.total, COALESCE(SUM(c.ids), 0)
+          FROM seed_partition p
+          LEFT JOIN seed_checkpoint c ON c.run_id = p.run_id AND c.part_key = p.part_key
+         WHERE p.run_id = ? AND p.split = 0
+         GROUP BY p.maker_key, p.part_key
+        """,
+        (run_id,),
+    ).fetchall()
+    for maker_key, part_key, total, ids in rows:
+        st = out.setdefault(str(maker_key), {"complete": False, "partitions": 0, "incomplete": []})
+        st["partitions"] += 1
+        if ids < (total or 0) * PARTITION_COMPLETE_RATIO:
+            st["incomplete"].append((str(part_key), int(ids), int(total or 0)))
+    for st in out.values():
+        st["complete"] = st["partitions"] > 0 and not st["incomplete"]
+    return out
+
+
+def finalize_inactive(con, complete_makers: List[str], all_complete: bool) -> int:
+    """
+    끝까지 읽은 제조사 안에서만 ACTIVE인데 오늘 스냅샷에 없는 차량을 INACTIVE로
+    - 잘린 제조사는 건드리지 않음 (다음날 "재등장"으로 다시 큐에 들어가는 헛수고 방지)
+    - maker_key가 없는(아직 한 번도 full 실행에서 못 본) 차량은 모든 제조사가 완전할 때만
+    반환: 이번에 INACTIVE가 된 수
+    """
+    if not complete_makers and not all_complete:
+        return 0
+    marks = ",".join("?" * len(complete_makers)) or "NULL"
+    return con.execute(
+        f"""
         UPDATE car_state
            SET status='INACTIVE',
                last_change_at=CURRENT_TIMESTAMP
          WHERE status='ACTIVE'
-           AND car_id NOT IN (SELECT car_id FROM car_snapshot_today)
-    """)
-    after = con.execute("SELECT COUNT(*) FROM car_state WHERE status='INACTIVE'").fetchone()[0]
-    return int(after - before)
+           AND (maker_key IN ({marks}) OR (? AND maker_key IS NULL))
+           AND NOT EXISTS (SELECT 1 FROM car_snapshot_today s WHERE s.car_id = car_state.car_id)
+        """,
+        (*complete_makers, int(all_complete)),
+    ).rowcount
 
 
 # -------------------------
@@ -261,114 +625,441 @@ class EncarClient:
 
 
     def get_json(self, params: Dict[str, str]) -> Dict[str, Any]:
+        limiter = get_limiter("list")
         last_err = None
         for attempt in range(1, MAX_RETRIES + 1):
+            limiter.acquire()
             try:
                 r = self.s.get(API_URL, params=params, timeout=TIMEOUT_SEC)
                 if r.status_code == 200:
-                    return r.json()
+                    limiter.on_success()
+                    return encar_codec.loads(r.content)
 
                 if r.status_code == 400:
                     raise RuntimeError(f"HTTP 400 Bad Request: {r.url}")
 
-                if r.status_code in (429, 403, 502, 503, 504):
+                if r.status_code in (429, 403):
+                    last_err = r.text
+                    limiter.on_throttle(parse_retry_after(r.headers.get("Retry-After")))
+                    continue
+
+                if r.status_code in (502, 503, 504):
                     last_err = r.text
-                    time.sleep(min(30, 2 ** attempt) + random.uniform(0, 1.5))
+                    limiter.on_error()
                     continue
 
                 r.raise_for_status()
             except Exception as e:
                 last_err = e
-                time.sleep(min(30, 2 ** attempt) + random.uniform(0, 1.5))
+                limiter.on_error()
 
         raise RuntimeError(f"GET failed: {last_err}")
 
 
+_thread_local = threading.local()
+
+
+def thread_client() -> EncarClient:
+    """
+    스레드마다 Session 하나 (requests.Session은 스레드 간 공유하지 않음)
+    """
+    c = getattr(_thread_local, "client", None)
+    if c is None:
+        c = EncarClient()
+        _thread_local.client = c
+    return c
+
+
+def fetch_page(part: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    return thread_client().get_json(partition_params(part, offset))
+
+
+def fetch_page_retrying(client: EncarClient, part: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    """
+    serial 모드 페이지 요청: parallel 모드처럼 실패한 페이지만 PARTITION_RETRIES번 다시 시도, 그래도 실패하면 예외
+    """
+    attempt = 0
+    while True:
+        try:
+            return client.get_json(partition_params(part, offset))
+        except Exception as e:
+            if attempt >= PARTITION_RETRIES:
+                raise
+            print(f"⚠️ retry {partition_label(part)} offset={offset}: {str(e)[:200]}")
+            attempt += 1
+
+
+# -------------------------
+# 페이지 반영 (writer)
+# -------------------------
+def page_items(data: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    페이지 -> [(car_id, list_fp)] (페이지 안 중복 제거)
+    """
+    out: List[Tuple[str, str]] = []
+    seen_page: Set[str] = set()
+    for it in extract_items(data):
+        if isinstance(it, dict):
+            cid = pick_car_id(it)
+            if cid and cid not in seen_page:
+                seen_page.add(cid)
+                out.append((cid, list_fingerprint(it)))
+    return out
+
+
+def apply_page(
+    con,
+    items: List[Tuple[str, str]],
+    snapshot: bool = True,
+    checkpoint: Optional[Tuple[int, str, int]] = None,
+    maker_key: Optional[str] = None,
+) -> Tuple[int, int, int, int]:
+    """
+    한 페이지분 snapshot/state/queue 반영 (트랜잭션 1개)
+    - 페이지 (id, fingerprint)를 seed_stage에 한 번에 넣고, 분류/반영은 set 단위 SQL 몇 개로 처리
+      (car_state가 커져도 페이지당 쿼리 수/비용이 일정)
+    - 신규 = car_state에 없던 것, 재등장 = INACTIVE -> ACTIVE (둘 다 vehicle_raw에 이미 있으면 제외)
+    - 변경 = 저장된 list_fp와 다름 (raw가 있어도 상세 재수집 대상)
+    - raw만 있고 car_state가 없던 차량도 state/fingerprint는 기록 (큐에는 안 넣음)
+    - snapshot=False(incremental 모드)면 car_snapshot_today는 건드리지 않음
+    - checkpoint=(run_id, part_key, offset)이면 같은 트랜잭션에서 페이지 완료(+id 수) 기록
+    - maker_key는 car_state에 남겨 제조사별 inactive 판정 범위로 씀
+    반환: (신규 state 수, 재등장 수, 큐 신규 추가 수, 변경으로 재수집 예약한 수)
+    """
+    with con:
+        con.execute("DELETE FROM seed_stage")
+        con.executemany("INSERT OR IGNORE INTO seed_stage(car_id, fp) VALUES(?, ?)", items)
+
+        # 분류는 touch(ACTIVE 전환) 전에
+        con.execute("""
+            UPDATE seed_stage
+               SET kind = CASE
+                     WHEN s.car_id IS NULL THEN
+                       CASE WHEN NOT EXISTS (SELECT 1 FROM vehicle_raw v WHERE v.car_id = seed_stage.car_id)
+                            THEN 'new' END
+                     WHEN s.list_fp IS NOT NULL AND s.list_fp != seed_stage.fp THEN 'changed'
+                     WHEN s.status != 'ACTIVE' THEN
+                       CASE WHEN NOT EXISTS (SELECT 1 FROM vehicle_raw v WHERE v.car_id = seed_stage.car_id)
+                            THEN 'reappear' END
+                   END
+              FROM (SELECT st.car_id AS stage_id, cs.car_id, cs.status, cs.list_fp
+                      FROM seed_stage st LEFT JOIN car_state cs ON cs.car_id = st.car_id) AS s
+             WHERE s.stage_id = seed_stage.car_id
+        """)
+
+        if snapshot:
+            con.execute("INSERT OR IGNORE INTO car_snapshot_today(car_id) SELECT car_id FROM seed_stage")
+        con.execute(
+            """
+            INSERT OR IGNORE INTO car_state(car_id, status, list_fp, maker_key)
+            SELECT car_id, 'ACTIVE', fp, ? FROM seed_stage
+            """,
+            (maker_key,),
+        )
+        con.execute(
+            """
+            UPDATE car_state
+               SET last_seen_at = CURRENT_TIMESTAMP,
+                   status = 'ACTIVE',
+                   last_change_at = CASE WHEN status != 'ACTIVE' THEN CURRENT_TIMESTAMP ELSE last_change_at END,
+                   list_fp_changed_at = CASE
+                     WHEN list_fp IS NOT NULL AND list_fp != st.fp THEN CURRENT_TIMESTAMP ELSE list_fp_changed_at
+                   END,
+                   list_fp = st.fp,
+                   maker_key = COALESCE(?, maker_key)
+              FROM seed_stage st
+             WHERE car_state.car_id = st.car_id
+            """,
+            (maker_key,),
+        )
+
+        n_new, n_reappear = con.execute(
+            "SELECT COALESCE(SUM(kind = 'new'), 0), COALESCE(SUM(kind = 'reappear'), 0) FROM seed_stage"
+        ).fetchone()
+
+        # ✅ 큐에는 신규 + 재등장만 "추가" (기존 큐 상태 변경 X)
+        queued = enqueue_new(con)
+
+        # fingerprint 변경분만 상세 재수집
+        refresh = enqueue_refresh(con)
+
+        if checkpoint:
+            con.execute(
+                "INSERT OR IGNORE INTO seed_checkpoint(run_id, part_key, offset, ids) VALUES(?, ?, ?, ?)",
+                (*checkpoint, len(items)),
+            )
+
+    return int(n_new), int(n_reappear), queued, refresh
+
+
 # -------------------------
 # main
 # -------------------------
 def seed_one_maker(
     con,
     client: EncarClient,
-    queue_existing_ids: Set[str],
+    run_id: int,
     maker_key: str,
     maker_kr: str,
-) -> Tuple[int, int, int]:
+) -> Tuple[int, int, int, int]:
     print("\n==============================")
     print(f"🚗 MAKER: {maker_key} ({maker_kr})")
     print("==============================")
 
-    first_params = {"count": "true", "q": build_q(maker_kr), "sr": build_sr(0, LIMIT)}
-    j0 = client.get_json(first_params)
-    total = get_total_count(j0)
-    if total is None:
-        raise RuntimeError("totalCount not found (count=true)")
-
-    print(f"✅ totalCount={total} limit={LIMIT}")
-
-    offset = 0
     new_state_total = 0
     reappear_total = 0
     queued_new_total = 0
+    refresh_total = 0
+    partitions = 0
+
+    stack = list(reversed(pending_tasks(con, run_id, {maker_key: maker_kr})))
+    while stack:
+        part, offset = stack.pop()
+        data = fetch_page_retrying(client, part, offset)
+
+        if "total" not in part:
+            probe = is_probe(part, offset)
+            total, children = plan_first_page(part, data)
+            if children:
+                save_partition(con, run_id, part, total, split=True)
+                stack.extend(reversed([(c, 0) for c in children]))
+                continue
+            part["total"] = total
+            save_partition(con, run_id, part, total, split=False)
+            partitions += 1
+            print(f"✅ {partition_label(part)} totalCount={total} limit={LIMIT}")
+            # probe였으면 첫 페이지도 LIMIT으로 다시
+            stack.extend(reversed([(part, off) for off in range(0 if probe else LIMIT, total, LIMIT)]))
+            if probe:
+                continue
+
+        items = page_items(data)
+        n_new, n_reappear, n_queued, n_refresh = apply_page(
+            con, items, checkpoint=(run_id, partition_label(part), offset), maker_key=maker_key
+        )
+        new_state_total += n_new
+        reappear_total += n_reappear
+        queued_new_total += n_queued
+        refresh_total += n_refresh
 
-    while offset < total:
-        params = {"count": "true", "q": build_q(maker_kr), "sr": build_sr(offset, LIMIT)}
-        data = j0 if offset == 0 else client.get_json(params)
+        print(
+            f"offset={offset}/{part['total']} "
+            f"page_ids={len(items)} "
+            f"new_state+={n_new} reappear+={n_reappear} refresh+={n_refresh} "
+            f"queued_new_total~={queued_new_total}"
+        )
 
-        items = extract_items(data)
+    print(
+        f"🏁 DONE maker={maker_key} partitions={partitions} "
+        f"new_state={new_state_total} reappear={reappear_total} queued_new~={queued_new_total} "
+        f"refresh={refresh_total}"
+    )
+    return new_state_total, reappear_total, queued_new_total, refresh_total
 
-        page_ids: List[str] = []
-        seen_page: Set[str] = set()
-        for it in items:
-            if isinstance(it, dict):
-                cid = pick_car_id(it)
-                if cid and cid not in seen_page:
-                    seen_page.add(cid)
-                    page_ids.append(cid)
 
-        with con:
-            upsert_snapshot_today(con, page_ids)
+def seed_one_maker_incremental(
+    con,
+    client: EncarClient,
+    maker_key: str,
+    maker_kr: str,
+) -> Tuple[int, int, int, int, int]:
+    """
+    수정일 최신순으로 watermark까지만 읽기
+    - 페이지의 가장 오래된 ModifiedDate가 watermark보다 이전이면 그 페이지까지 반영하고 멈춤
+    - watermark가 없으면(첫 실행) 첫 페이지만 반영하고 watermark를 잡음
+    - 응답에 ModifiedDate가 없으면 신규/재등장/변경이 하나도 없는 페이지에서 멈춤
+    - watermark는 제조사를 끝까지 처리한 뒤에만 갱신 (중간 실패 시 다음 실행에서 다시 읽음)
+    - 옛 watermark에 닿거나 결과가 끝났을 때만 갱신, INCREMENTAL_MAX_PAGES에서 끊기면 옛 watermark 유지
+      (그 사이 매물을 건너뛰지 않도록 다음 실행/full 모드에서 다시 읽음)
+    반환: (신규 state 수, 재등장 수, 큐 신규 추가 수, 변경으로 재수집 예약한 수, 페이지 수)
+    """
+    wm = get_watermark(con, maker_key)
+    newest = wm
+    new_state_total = reappear_total = queued_new_total = refresh_total = 0
+    pages = 0
+    offset = 0
+    reached = False
+
+    while pages < INCREMENTAL_MAX_PAGES:
+        params = {
+            "count": "true",
+            "q": build_q(maker_kr, (0, MILEAGE_MAX)),
+            "sr": build_sr(offset, INCREMENTAL_LIMIT, INCREMENTAL_SORT),
+        }
+        data = client.get_json(params)
+        raw_items = [it for it in extract_items(data) if isinstance(it, dict)]
+        if not raw_items:
+            reached = True
+            break
+
+        n_new, n_reappear, n_queued, n_refresh = apply_page(con, page_items(data), snapshot=False, maker_key=maker_key)
+        new_state_total += n_new
+        reappear_total += n_reappear
+        queued_new_total += n_queued
+        refresh_total += n_refresh
+        pages += 1
+
+        mods = [str(it["ModifiedDate"]) for it in raw_items if it.get("ModifiedDate")]
+        if mods:
+            newest = max(newest or "", max(mods))
 
-            existing_map = select_existing_states(con, page_ids)
+        print(
+            f"maker={maker_key} offset={offset} oldest={min(mods) if mods else '-'} watermark={wm} "
+            f"new_state+={n_new} reappear+={n_reappear} refresh+={n_refresh}"
+        )
 
-            # 신규(상태에 없던 것)
-            new_ids = [cid for cid in page_ids if cid not in existing_map]
-            # 재등장(INACTIVE -> ACTIVE)
-            reappear_ids = [cid for cid, st in existing_map.items() if st != "ACTIVE" and cid in seen_page]
+        if not mods:
+            if n_new + n_reappear + n_refresh == 0:
+                reached = True
+                break
+        elif wm is None or min(mods) < wm:
+            reached = True
+            break
 
-            # ✅ raw에 이미 있으면 신규/재등장 후보에서 제거
-            new_ids = filter_out_existing_raw(con, new_ids)
-            reappear_ids = filter_out_existing_raw(con, reappear_ids)
+        if len(raw_items) < INCREMENTAL_LIMIT:
+            reached = True
+            break
 
-            if new_ids:
-                insert_new_states(con, new_ids)
+        offset += INCREMENTAL_LIMIT
 
-            touch_active_states(con, page_ids)
+    if not reached:
+        print(
+            f"⚠️ maker={maker_key} stopped at max_pages={INCREMENTAL_MAX_PAGES} before watermark={wm} "
+            f"-> watermark kept"
+        )
+    elif newest and newest != wm:
+        set_watermark(con, maker_key, newest)
 
-            # ✅ 큐에는 신규 + 재등장만 "추가" (기존 큐 상태 변경 X)
-            queued_new_total += enqueue_ids(con, queue_existing_ids, new_ids + reappear_ids)
+    return new_state_total, reappear_total, queued_new_total, refresh_total, pages
 
-            new_state_total += len(new_ids)
-            reappear_total += len(reappear_ids)
 
-        print(
-            f"offset={offset}/{total} "
-            f"page_ids={len(page_ids)} "
-            f"new_state+={len(new_ids)} reappear+={len(reappear_ids)} "
-            f"queued_new_total~={queued_new_total}"
-        )
+def run_incremental():
+    t_start = time.time()
+    con = connect()
+    init_db(con)
+    ensure_tables(con)
+
+    client = EncarClient()
 
-        offset += LIMIT
-        sleepy()
+    print("✅ Start INCREMENTAL crawl (ModifiedDate watermark, no snapshot/inactive detection)")
+    print(f"   makers={list(MAKERS.keys())} limit={INCREMENTAL_LIMIT} max_pages={INCREMENTAL_MAX_PAGES}")
+    print(f"   startup_sec={time.time() - t_start:.2f} rss={peak_rss_mb():.1f}MB")
 
-    print(
-        f"🏁 DONE maker={maker_key} "
-        f"new_state={new_state_total} reappear={reappear_total} queued_new~={queued_new_total}"
-    )
-    return new_state_total, reappear_total, queued_new_total
+    t0 = time.time()
+    totals = [0, 0, 0, 0, 0]
+    for maker_key, maker_kr in MAKERS.items():
+        r = seed_one_maker_incremental(con, client, maker_key, maker_kr)
+        totals = [a + b for a, b in zip(totals, r)]
+
+    print("\n✅ INCREMENTAL DONE")
+    print(f"   crawl_sec={time.time() - t0:.1f} pages={totals[4]}")
+    print(f"   new_state_total={totals[0]}")
+    print(f"   reappear_total={totals[1]}")
+    print(f"   queued_new_total~={totals[2]}")
+    print(f"   refresh_queued_total={totals[3]}")
+    print(f"   peak_rss={peak_rss_mb():.1f}MB")
+    print_limiter_stats()
 
 
-def run_all_makers():
+def seed_all_parallel(
+    con,
+    run_id: int,
+    makers: Dict[str, str],
+    workers: int = SEED_WORKERS,
+) -> Tuple[int, int, int, int]:
+    """
+    partition 첫 페이지(분할 판단) + 페이지들을 스레드 풀로 동시에 가져오고, DB 반영은 이 스레드(writer) 하나가 처리
+    - 첫 페이지 totalCount가 크면 자식 partition 첫 페이지들을, 아니면 나머지 offset을 작업 큐에 추가
+    - 전체 호출 속도는 스레드 수와 무관하게 공유 "list" limiter가 제한
+    - 가져왔지만 아직 반영 안 한 페이지가 쌓이지 않도록 동시에 진행하는 페이지 수는 workers*2로 제한
+    - 실패한 페이지는 그 페이지만 PARTITION_RETRIES번 다시 시도, 그래도 실패하면 예외로 중단
+      (불완전한 snapshot으로 finalize_inactive 하지 않도록, 반영한 페이지는 체크포인트에 남아 --resume으로 이어감)
+    """
+    workers = max(1, workers)
+    tasks = deque((part, offset, 0) for part, offset in pending_tasks(con, run_id, makers))
+    inflight: Dict[Any, Tuple[Dict[str, Any], int, int]] = {}
+    stats = {
+        key: {"partitions": 0, "pages": 0, "new": 0, "reappear": 0, "queued": 0, "refresh": 0} for key in makers
+    }
+    total_new = total_reappear = total_queued = total_refresh = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="seed") as pool:
+        try:
+            while tasks or inflight:
+                while tasks and len(inflight) < workers * 2:
+                    part, offset, attempt = tasks.popleft()
+                    inflight[pool.submit(fetch_page, part, offset)] = (part, offset, attempt)
+
+                done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    part, offset, attempt = inflight.pop(fut)
+                    try:
+                        data = fut.result()
+                    except Exception as e:
+                        if attempt >= PARTITION_RETRIES:
+                            raise
+                        print(f"⚠️ retry {partition_label(part)} offset={offset}: {str(e)[:200]}")
+                        tasks.append((part, offset, attempt + 1))
+                        continue
+
+                    st = stats[part["maker_key"]]
+
+                    if "total" not in part:
+                        probe = is_probe(part, offset)
+                        total, children = plan_first_page(part, data)
+                        if children:
+                            save_partition(con, run_id, part, total, split=True)
+                            tasks.extend((c, 0, 0) for c in children)
+                            continue
+                        part["total"] = total
+                        save_partition(con, run_id, part, total, split=False)
+                        st["partitions"] += 1
+                        # probe였으면 첫 페이지도 LIMIT으로 다시
+                        tasks.extend((part, off, 0) for off in range(0 if probe else LIMIT, total, LIMIT))
+                        print(f"✅ {partition_label(part)} totalCount={total} pages={(total + LIMIT - 1) // LIMIT}")
+                        if probe:
+                            continue
+
+                    items = page_items(data)
+                    n_new, n_reappear, n_queued, n_refresh = apply_page(
+                        con, items, checkpoint=(run_id, partition_label(part), offset), maker_key=part["maker_key"]
+                    )
+                    st["pages"] += 1
+                    st["new"] += n_new
+                    st["reappear"] += n_reappear
+                    st["queued"] += n_queued
+                    st["refresh"] += n_refresh
+                    total_new += n_new
+                    total_reappear += n_reappear
+                    total_queued += n_queued
+                    total_refresh += n_refresh
+
+                    print(
+                        f"{partition_label(part)} offset={offset}/{part['total']} "
+                        f"page_ids={len(items)} "
+                        f"new_state+={n_new} reappear+={n_reappear} refresh+={n_refresh} "
+                        f"queued_new_total~={total_queued}"
+                    )
+        except BaseException:
+            for fut in inflight:
+                fut.cancel()
+            raise
+
+    for key, st in stats.items():
+        print(
+            f"🏁 DONE maker={key} partitions={st['partitions']} pages={st['pages']} "
+            f"new_state={st['new']} reappear={st['reappear']} queued_new~={st['queued']} refresh={st['refresh']}"
+        )
+    return total_new, total_reappear, total_queued, total_refresh
+
+
+def run_all_makers(mode: str = SEED_MODE, workers: int = SEED_WORKERS, resume: bool = False):
+    """
+    full 크롤 -> (끝까지 마쳤을 때만) inactive 판정(끝까지 읽은 제조사만) + 게시 이력 기록
+    - resume=True면 가장 최근 미완료 실행을 체크포인트부터 이어감 (없으면 새 실행)
+    - 중간에 죽으면 실행은 RUNNING으로 남고 car_snapshot_today도 그대로 (다음 --resume에서 이어짐)
+    """
+    t_start = time.time()
     con = connect()
     init_db(con)
 
@@ -379,41 +1070,91 @@ def run_all_makers():
         pass
 
     ensure_tables(con)
-    reset_today_snapshot(con)
 
-    client = EncarClient()
-    queue_existing_ids = preload_existing_queue_ids(con)
+    run = open_run(con) if resume else None
+    if run:
+        run_id, day = run
+        done_pages = con.execute("SELECT COUNT(*) FROM seed_checkpoint WHERE run_id=?", (run_id,)).fetchone()[0]
+        print(f"✅ Resume run_id={run_id} day={day} done_pages={done_pages}")
+    else:
+        if resume:
+            print("⚠️ no unfinished run to resume, starting a new one")
+        run_id, day = start_run(con, mode)
 
     print("✅ Start FULL crawl (OFFSET) + snapshot/state + inactive detection")
-    print(f"   makers={list(MAKERS.keys())}")
-    print(f"   limit={LIMIT}")
-    print(f"   existing_queue_skip={EXISTING_TABLE}.{EXISTING_ID_COL} preloaded={len(queue_existing_ids)}")
+    print(f"   run_id={run_id} makers={list(MAKERS.keys())}")
+    print(f"   limit={LIMIT} partition_max={PARTITION_MAX_TOTAL} mode={mode} workers={workers if mode == 'parallel' else 1}")
+    print(f"   startup_sec={time.time() - t_start:.2f} rss={peak_rss_mb():.1f}MB")
 
+    t0 = time.time()
     total_new = 0
     total_reappear = 0
     total_queued_new = 0
+    total_refresh = 0
 
-    for maker_key, maker_kr in MAKERS.items():
-        n, r, q = seed_one_maker(con, client, queue_existing_ids, maker_key, maker_kr)
-        total_new += n
-        total_reappear += r
-        total_queued_new += q
+    try:
+        if mode == "parallel":
+            total_new, total_reappear, total_queued_new, total_refresh = seed_all_parallel(
+                con, run_id, MAKERS, workers
+            )
+        else:
+            client = EncarClient()
+            for maker_key, maker_kr in MAKERS.items():
+                n, r, q, f = seed_one_maker(con, client, run_id, maker_key, maker_kr)
+                total_new += n
+                total_reappear += r
+                total_queued_new += q
+                total_refresh += f
+    except BaseException:
+        print(f"❌ crawl interrupted run_id={run_id} (continue with --resume, inactive detection skipped)")
+        raise
+    crawl_sec = time.time() - t0
+
+    completeness = maker_completeness(con, run_id, MAKERS)
+    complete_makers = [k for k, st in completeness.items() if st["complete"]]
+    for key, st in completeness.items():
+        if not st["complete"]:
+            print(f"⚠️ maker={key} incomplete partitions={len(st['incomplete'])}/{st['partitions']} -> inactive skipped")
+            for part_key, ids, total in st["incomplete"][:5]:
+                print(f"   {part_key} ids={ids}/{total}")
 
     with con:
-        became_inactive = finalize_inactive(con)
+        became_inactive = finalize_inactive(con, complete_makers, len(complete_makers) == len(completeness))
+        presence_extended, presence_started = record_presence(
+            con, day, complete_makers, len(complete_makers) == len(completeness)
+        )
+        finish_run(con, run_id)
 
     active_cnt = con.execute("SELECT COUNT(*) FROM car_state WHERE status='ACTIVE'").fetchone()[0]
     inactive_cnt = con.execute("SELECT COUNT(*) FROM car_state WHERE status='INACTIVE'").fetchone()[0]
     snapshot_cnt = con.execute("SELECT COUNT(*) FROM car_snapshot_today").fetchone()[0]
 
     print("\n✅ ALL DONE")
+    print(f"   crawl_sec={crawl_sec:.1f}")
     print(f"   new_state_total={total_new}")
     print(f"   reappear_total={total_reappear}")
     print(f"   queued_new_total~={total_queued_new}")
+    print(f"   refresh_queued_total={total_refresh}")
     print(f"   snapshot_today_count={snapshot_cnt}")
-    print(f"   became_inactive_this_run~={became_inactive}")
+    print(f"   became_inactive_this_run={became_inactive} complete_makers={len(complete_makers)}/{len(completeness)}")
+    print(f"   presence extended={presence_extended} started={presence_started}")
     print(f"   car_state ACTIVE={active_cnt} INACTIVE={inactive_cnt}")
+    print(f"   peak_rss={peak_rss_mb():.1f}MB")
+    print_limiter_stats()
 
 
 if __name__ == "__main__":
-    run_all_makers()
+    ap = argparse.ArgumentParser(description="엔카 목록 -> car_queue 시드 + snapshot/state")
+    ap.add_argument(
+        "--mode",
+        choices=["serial", "parallel", "incremental"],
+        default=SEED_MODE,
+        help="serial/parallel: 전체 스냅샷 + inactive 판정, incremental: 수정일 watermark까지만 (10~15분 주기용)",
+    )
+    ap.add_argument("--workers", type=int, default=SEED_WORKERS, help="parallel 모드 fetch 스레드 수")
+    ap.add_argument("--resume", action="store_true", help="serial/parallel: 중단된 full 실행을 체크포인트부터 이어서")
+    args = ap.parse_args()
+    if args.mode == "incremental":
+        run_incremental()
+    else:
+        run_all_makers(args.mode, args.workers, args.resume)
@@ -3,9 +3,7 @@
 # -> inspection(성능점검) 세부항목 + record(보험이력) + options(choice 옵션)
 # -> 엑셀 저장 + Summary(종합) 시트 생성
 
-import time
 import json
-import random
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
@@ -13,6 +11,8 @@ from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment
 
+from encar_ratelimit import get_limiter, parse_retry_after, print_limiter_stats
+
 
 # =========================
 # 설정
@@ -36,7 +36,7 @@ OPTIONS_CHOICE_URL = "https://api.encar.com/v1/readside/vehicles/car/{carId}/opt
 
 OUTPUT_XLSX = "encar_100cars_detail.xlsx"
 
-SLEEP_BETWEEN_CALLS_SEC = (0.15, 0.35)
+# 호출 간격은 encar_ratelimit.RATE_LIMITS (family별)에서 조절
 MAX_RETRIES = 4
 TIMEOUT_SEC = 15
 
@@ -52,10 +52,6 @@ DEFAULT_HEADERS = {
 # =========================
 # 유틸
 # =========================
-def sleepy():
-    time.sleep(random.uniform(*SLEEP_BETWEEN_CALLS_SEC))
-
-
 def safe_get(d: Any, path: List[Any], default=None):
     cur = d
     for p in path:
@@ -108,47 +104,61 @@ class EncarClient:
         self.s = requests.Session()
         self.s.headers.update(headers or DEFAULT_HEADERS)
 
-    def get_json(self, url: str) -> Any:
+    def get_json(self, url: str, family: str = "vehicle") -> Any:
+        limiter = get_limiter(family)
         last_err = None
         for attempt in range(1, MAX_RETRIES + 1):
+            limiter.acquire()
             try:
                 resp = self.s.get(url, timeout=TIMEOUT_SEC)
                 if resp.status_code == 200:
+                    limiter.on_success()
                     return resp.json()
 
-                if resp.status_code in (429, 403, 502, 503, 504):
+                # 성능점검/기록이 없는 차량: 재시도/감속 없이 바로 위로 (속도 문제가 아님)
+                if resp.status_code in (404, 410):
+                    raise FileNotFoundError(f"HTTP {resp.status_code} Not Found: {url}")
+
+                if resp.status_code in (429, 403):
+                    last_err = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                    limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                    continue
+
+                if resp.status_code in (502, 503, 504):
                     last_err = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
-                    time.sleep(0.7 * attempt)
+                    limiter.on_error()
                     continue
 
                 resp.raise_for_status()
+            except FileNotFoundError:
+                raise
             except Exception as e:
                 last_err = e
-                time.sleep(0.7 * attempt)
+                limiter.on_error()
 
         raise RuntimeError(f"GET failed after retries: {url}\nlast_err={last_err}")
 
     def fetch_list_100(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        data = self.get_json(LIST_URL)
+        data = self.get_json(LIST_URL, family="list")
         cars = extract_list_items(data)
         return cars, data
 
     def fetch_vehicle(self, car_id: str) -> Dict[str, Any]:
-        return self.get_json(VEHICLE_URL.format(carId=car_id))
+        return self.get_json(VEHICLE_URL.format(carId=car_id), family="vehicle")
 
     def fetch_inspection(self, car_id: str) -> Dict[str, Any]:
-        return self.get_json(INSPECTION_URL.format(carId=car_id))
+        return self.get_json(INSPECTION_URL.format(carId=car_id), family="inspection")
 
     def fetch_user(self, user_id: str) -> Dict[str, Any]:
-        return self.get_json(USER_URL.format(userId=user_id))
+        return self.get_json(USER_URL.format(userId=user_id), family="user")
 
     # ✅ 보험이력
     def fetch_record_open(self, car_id: str, vehicle_no: str) -> Dict[str, Any]:
-        return self.get_json(RECORD_OPEN_URL.format(carId=car_id, vehicleNo=vehicle_no))
+        return self.get_json(RECORD_OPEN_URL.format(carId=car_id, vehicleNo=vehicle_no), family="record")
 
     # ✅ 옵션(choice)
     def fetch_options_choice(self, car_id: str) -> Any:
-        return self.get_json(OPTIONS_CHOICE_URL.format(carId=car_id))
+        return self.get_json(OPTIONS_CHOICE_URL.format(carId=car_id), family="options")
 
 
 def extract_list_items(list_json: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -633,7 +643,6 @@ def main():
         # -----------------
         # vehicle
         # -----------------
-        sleepy()
         v = None
         vehicle_summary = {}
         user_id = None
@@ -654,7 +663,6 @@ def main():
         # -----------------
         # inspection (핵심)
         # -----------------
-        sleepy()
         car_item_rows_this: List[Dict[str, Any]] = []
         issue_count = 0
         issue_top = ""
@@ -686,7 +694,6 @@ def main():
         record_summary = build_record_summary(None)
 
         if vehicle_no:
-            sleepy()
             try:
                 record_json = client.fetch_record_open(car_id, vehicle_no)
 
@@ -716,7 +723,6 @@ def main():
         # ✅ options/choice (옵션)
         # -----------------
         options_summary = build_options_choice_summary(None)
-        sleepy()
         try:
             choice = client.fetch_options_choice(car_id)
             options_choice_rows.extend(normalize_options_choice_rows(car_id, choice))
@@ -730,7 +736,6 @@ def main():
         # -----------------
         if user_id:
             if user_id not in user_cache:
-                sleepy()
                 try:
                     user_cache[user_id] = client.fetch_user(user_id)
                 except Exception as e:
@@ -789,6 +794,7 @@ def main():
 
     wb.save(OUTPUT_XLSX)
     print(f"✅ DONE: {OUTPUT_XLSX}")
+    print_limiter_stats()
 
 
 if __name__ == "__main__":
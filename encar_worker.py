@@ -1,12 +1,35 @@
 # encar_worker.py
+import argparse
+import asyncio
+import hashlib
 import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
 import time
-import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Optional, List, Tuple
 
+import httpx
 import requests
 
-from encar_db import connect, init_db, set_status
+import encar_codec
+import encar_flat
+from encar_db import (
+    LEASE_SEC,
+    claim_batch,
+    connect,
+    init_db,
+    reap_expired_leases,
+    renew_leases,
+    schedule_legacy_errors,
+    set_error,
+    set_status,
+)
+from encar_ratelimit import get_limiter, parse_retry_after, print_limiter_stats
 
 # -------------------------
 # 설정
@@ -27,20 +50,50 @@ DEFAULT_HEADERS = {
 
 TIMEOUT_SEC = (3.0, 12.0)
 MAX_RETRIES = 3
-SLEEP_BETWEEN_CALLS_SEC = (0.0, 0.15)
+# 호출 간격은 encar_ratelimit.RATE_LIMITS (family: vehicle/inspection/record/options/user)에서 조절
 
 # 한 번 실행 시 몇 대 처리할지
 BATCH_LIMIT = 100000  # 처음엔 200~500 권장
 MAX_RETRY_PER_CAR = 5
 
+# ERROR 재시도 정책 (error_class별 지수 backoff: base_sec * 2^retry_count, 최대 max_sec)
+# - transient: 429/403/5xx/timeout 등 (API가 잠깐 불안정) -> 금방 다시
+# - permanent: 400/404/410(매물 삭제 등) -> 재시도 예약 없이 ERROR로 끝 (max_retries=0 -> next_attempt_at=NULL)
+#   (목록 내용이 바뀌어 다시 보이면 seeder의 enqueue_refresh가 PENDING으로 되돌림)
+RETRY_POLICY: Dict[str, Dict[str, int]] = {
+    "transient": {"base_sec": 60, "max_sec": 6 * 3600, "max_retries": MAX_RETRY_PER_CAR},
+    "permanent": {"base_sec": 0, "max_sec": 0, "max_retries": 0},
+}
+
+# car_queue에서 한 번에 claim(RUNNING + lease)할 차량 수
+# lease(LEASE_SEC) 안에 처리가 끝날 만큼만 가져가야 다른 워커에게 뺏기지 않음
+CLAIM_SIZE = 50
+# claim 때 lease 만료 행 회수(reaper)를 돌리는 최소 간격 (시작 시 1번 + 실행 중 주기적으로)
+REAP_INTERVAL_SEC = 60
+
+# seller(user) 캐시: user_raw.fetched_at 이 TTL 안이면 /readside/user 재호출 안 함
+SELLER_TTL_SEC = 7 * 24 * 3600
+SELLER_CACHE_SIZE = 50000   # 메모리 LRU에 들고 있을 seller 수 (user_id + 시각만 저장)
+SELLER_PRELOAD = 20000      # 시작 시 최근 수집된 seller를 이만큼 미리 올림
+
+# 내용이 그대로인 payload: True면 fetched_at/changed=0만 갱신(touch), False면 아무것도 안 씀
+TOUCH_UNCHANGED = True
+
+# 결과 writer(group commit): 이 대수만큼 모이거나 첫 결과 후 이 시간이 지나면 한 트랜잭션으로 flush
+WRITER_FLUSH_SIZE = 200
+WRITER_FLUSH_SEC = 2.0
+# 큐가 찼을 때 submit이 writer 생존을 다시 확인하는 간격
+WRITER_PUT_POLL_SEC = 0.5
+
+# 실행 모드: "async" 는 여러 차량을 동시에 처리, "sync" 는 기존 순차 처리
+WORKER_MODE = "async"
+# async 모드에서 동시에 진행할 차량 파이프라인 수
+CONCURRENCY = 8
+
 
 # -------------------------
 # 유틸
 # -------------------------
-def sleepy():
-    time.sleep(random.uniform(*SLEEP_BETWEEN_CALLS_SEC))
-
-
 def safe_get(d: Any, path: List[Any], default=None):
     cur = d
     for p in path:
@@ -62,6 +115,19 @@ def safe_get(d: Any, path: List[Any], default=None):
     return cur if cur is not None else default
 
 
+def classify_error(e: BaseException) -> str:
+    """
+    재시도 정책용 에러 분류
+    - 400(ValueError) / 404·410(FileNotFoundError): permanent
+    - 200인데 JSON이 아닌 응답(차단 페이지 등), 재시도 소진(429/5xx/timeout), 기타: transient
+    """
+    if isinstance(e, json.JSONDecodeError):
+        return "transient"
+    if isinstance(e, (ValueError, FileNotFoundError)):
+        return "permanent"
+    return "transient"
+
+
 def first_not_none(*vals):
     for v in vals:
         if v is not None and v != "":
@@ -112,16 +178,24 @@ class EncarClient:
         self.s = requests.Session()
         self.s.headers.update(headers or DEFAULT_HEADERS)
 
-    def get_json(self, url: str) -> Any:
+    def get_json(self, url: str, family: str = "vehicle") -> Any:
+        """
+        family별 공유 limiter로 속도 조절
+        - 200: limiter 가속 / 429·403: 감속 + 잠시 정지 / 5xx·timeout: 완만한 감속
+        - 재시도 대기는 limiter의 정지 시간이 대신함 (고정 backoff 없음)
+        """
+        limiter = get_limiter(family)
         last_err = None
 
         for attempt in range(1, MAX_RETRIES + 1):
+            limiter.acquire()
             try:
                 resp = self.s.get(url, timeout=TIMEOUT_SEC)
 
                 # ✅ 성공
                 if resp.status_code == 200:
-                    return resp.json()
+                    limiter.on_success()
+                    return encar_codec.loads(resp.content)
 
                 # ✅ 여기부터: "재시도하면 안 되는" 케이스
                 if resp.status_code in (404, 410):
@@ -133,17 +207,15 @@ class EncarClient:
                     raise ValueError(f"HTTP 400 Bad Request: {resp.text[:200]}")
 
                 # ✅ 재시도 가치 있는 케이스
-                if resp.status_code in (429, 502, 503, 504):
+                if resp.status_code in (429, 403):
+                    # 레이트리밋/차단 가능 → family 전체 감속 + 정지
                     last_err = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
-                    backoff = min(30, (2 ** attempt)) + random.uniform(0, 1.5)
-                    time.sleep(backoff)
+                    limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
                     continue
 
-                if resp.status_code == 403:
-                    # 차단/보호 장치 가능 → 짧게 몇 번만 시도 후 더 길게 쉬는 게 낫다
-                    last_err = RuntimeError(f"HTTP 403: {resp.text[:200]}")
-                    backoff = min(60, 10 * attempt) + random.uniform(0, 2.0)
-                    time.sleep(backoff)
+                if resp.status_code in (502, 503, 504):
+                    last_err = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                    limiter.on_error()
                     continue
 
                 # 나머지는 에러로 처리
@@ -154,139 +226,831 @@ class EncarClient:
                 raise
             except Exception as e:
                 last_err = e
-                backoff = min(30, (2 ** attempt)) + random.uniform(0, 1.5)
-                time.sleep(backoff)
+                limiter.on_error()
 
         raise RuntimeError(f"GET failed: {url}\nlast_err={last_err}")
 
 
+class AsyncEncarClient:
+    """
+    EncarClient의 asyncio 버전 (httpx.AsyncClient)
+    - 재시도/예외 규칙은 EncarClient.get_json과 동일
+    - 커넥션 풀 하나를 모든 차량 파이프라인이 공유
+    """
+
+    def __init__(self, headers: Dict[str, str] = None, concurrency: int = CONCURRENCY):
+        self.s = httpx.AsyncClient(
+            headers=headers or DEFAULT_HEADERS,
+            timeout=httpx.Timeout(TIMEOUT_SEC[1], connect=TIMEOUT_SEC[0]),
+            limits=httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2),
+            follow_redirects=True,
+        )
+
+    async def aclose(self) -> None:
+        await self.s.aclose()
+
+    async def get_json(self, url: str, family: str = "vehicle") -> Any:
+        limiter = get_limiter(family)
+        last_err = None
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            await limiter.acquire_async()
+            try:
+                resp = await self.s.get(url)
+
+                if resp.status_code == 200:
+                    limiter.on_success()
+                    return encar_codec.loads(resp.content)
+
+                if resp.status_code in (404, 410):
+                    raise FileNotFoundError(f"HTTP {resp.status_code} Not Found: {url}")
+
+                if resp.status_code == 400:
+                    raise ValueError(f"HTTP 400 Bad Request: {resp.text[:200]}")
+
+                if resp.status_code in (429, 403):
+                    last_err = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                    limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+                    continue
+
+                if resp.status_code in (502, 503, 504):
+                    last_err = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                    limiter.on_error()
+                    continue
+
+                resp.raise_for_status()
+
+            except (FileNotFoundError, ValueError):
+                raise
+            except Exception as e:
+                last_err = e
+                limiter.on_error()
+
+        raise RuntimeError(f"GET failed: {url}\nlast_err={last_err}")
+
 
 # -------------------------
 # DB upsert
 # -------------------------
-def upsert_raw(con, table: str, key_col: str, key_val: str, payload_obj: Any, extra_cols: Dict[str, Any] | None = None):
+def payload_hash(payload_obj: Any, extra_cols: Dict[str, Any] | None = None) -> str:
+    """
+    키 순서와 무관한 내용 해시 (sort_keys + 공백 없는 직렬화)
+    - extra_cols(record_raw.vehicle_no 등)도 내용에 포함
+    """
+    obj = [payload_obj, extra_cols] if extra_cols else payload_obj
+    canon = encar_codec.dumps(obj, sort_keys=True)
+    return hashlib.blake2b(canon.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def upsert_raw(
+    con,
+    table: str,
+    key_col: str,
+    key_val: str,
+    payload_obj: Any,
+    extra_cols: Dict[str, Any] | None = None,
+) -> bool:
+    """
+    raw 테이블 upsert + 내용 해시 비교
+    - 저장된 content_hash와 같으면 payload는 다시 쓰지 않음 (TOUCH_UNCHANGED면 fetched_at/changed=0만 갱신)
+    - 다르면(또는 처음이면) payload 전체 기록 + changed=1, changed_at 갱신
+    - 반환: 내용이 바뀌었는지
+    """
     extra_cols = extra_cols or {}
-    payload = json.dumps(payload_obj, ensure_ascii=False)
+    h = payload_hash(payload_obj, extra_cols)
 
-    cols = [key_col, "payload"] + list(extra_cols.keys())
-    vals = [key_val, payload] + list(extra_cols.values())
+    row = con.execute(f"SELECT content_hash FROM {table} WHERE {key_col}=?", (key_val,)).fetchone()
+    if row is not None and row[0] == h:
+        if TOUCH_UNCHANGED:
+            con.execute(
+                f"UPDATE {table} SET fetched_at=datetime('now'), changed=0 WHERE {key_col}=?",
+                (key_val,),
+            )
+        return False
+
+    # 해시는 객체 기준이라 저장 포맷(텍스트/압축)이 바뀌어도 그대로 비교됨
+    payload = encar_codec.encode_payload(table, encar_codec.dumps(payload_obj))
+
+    cols = [key_col, "payload"] + list(extra_cols.keys()) + ["content_hash"]
+    vals = [key_val, payload] + list(extra_cols.values()) + [h]
 
     placeholders = ",".join(["?"] * len(cols))
     updates = ",".join([f"{c}=excluded.{c}" for c in cols if c != key_col])
 
     sql = f"""
-    INSERT INTO {table} ({",".join(cols)})
-    VALUES ({placeholders})
+    INSERT INTO {table} ({",".join(cols)}, changed, changed_at)
+    VALUES ({placeholders}, 1, datetime('now'))
     ON CONFLICT({key_col}) DO UPDATE SET
       {updates},
+      changed=1,
+      changed_at=datetime('now'),
       fetched_at=datetime('now')
     """
     con.execute(sql, vals)
+    return True
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def make_claimer(con, worker_id: str, limit: int):
+    """
+    BATCH_LIMIT까지 CLAIM_SIZE씩 car_queue에서 원자적으로 가져오는 함수 반환
+    (빈 리스트면 더 가져올 것이 없음)
+    - 가져올 때마다 이 워커의 RUNNING lease 연장
+    - REAP_INTERVAL_SEC마다 lease 만료된 RUNNING(죽은 워커 몫)을 PENDING으로 (재시작을 기다리지 않음)
+    """
+    state = {"claimed": 0, "reaped_at": time.monotonic()}
+
+    def claim() -> List[str]:
+        renew_leases(con, worker_id, lease_sec=LEASE_SEC)
+        if time.monotonic() - state["reaped_at"] >= REAP_INTERVAL_SEC:
+            state["reaped_at"] = time.monotonic()
+            reaped = reap_expired_leases(con)
+            if reaped:
+                print(f"⚠️ reaped {reaped} expired leases -> PENDING")
+        n = min(CLAIM_SIZE, limit - state["claimed"])
+        if n <= 0:
+            return []
+        ids = claim_batch(con, worker_id, n, lease_sec=LEASE_SEC)
+        state["claimed"] += len(ids)
+        return ids
+
+    return claim
+
+
+class SellerCache:
+    """
+    seller 프로필 캐시 (메모리 LRU + user_raw TTL)
+    - 메모리에는 user_id -> fetched_at(epoch)만 둬서 payload 크기와 무관하게 메모리 고정
+    - 메모리 miss면 user_raw를 PK로 한 번 조회, fetched_at이 TTL 안이면 hit
+    - preload(): 최근 수집된 seller(딜러)부터 미리 올려서 시작 직후에도 DB 조회를 줄임
+    - async 모드에서 진행 중인 user 요청(Future)은 inflight에 둬서 공유
+    - 받은 user payload는 차량과 별개로 writer에 USER 행으로 넘기고(submit -> on_fetched),
+      commit된 뒤에야 mark_fetched로 캐시에 올림 (commit 전까지는 pending, 실패하면 forget으로 다시 받게)
+    - mark_fetched/forget은 writer 스레드에서 불리므로 LRU/pending은 lock으로 보호
+    - async 모드: is_fresh_async는 메모리 miss일 때만 user_raw 조회를 db_executor(DB 전용 스레드)로 넘김
+      (이벤트 루프에서 SQLite를 직접 부르지 않음)
+    """
+
+    def __init__(self, con, ttl_sec: int = SELLER_TTL_SEC, max_size: int = SELLER_CACHE_SIZE, on_fetched=None):
+        self.con = con
+        self.ttl_sec = ttl_sec
+        self.max_size = max(1, max_size)
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.inflight: Dict[str, Any] = {}
+        self.pending: Dict[str, Any] = {}
+        self.on_fetched = on_fetched
+        self.db_executor = None
+        self.stats = {"mem_hit": 0, "db_hit": 0, "miss": 0, "preloaded": 0}
+
+    def _remember(self, user_id: str, fetched_epoch: int) -> None:
+        with self._lock:
+            self._lru[user_id] = fetched_epoch
+            self._lru.move_to_end(user_id)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def preload(self, limit: int = SELLER_PRELOAD) -> int:
+        rows = self.con.execute(
+            """
+            SELECT user_id, CAST(strftime('%s', fetched_at) AS INTEGER)
+            FROM user_raw
+            WHERE fetched_at >= datetime('now', ?)
+            ORDER BY fetched_at DESC
+            LIMIT ?
+            """,
+            (f"-{int(self.ttl_sec)} seconds", min(limit, self.max_size)),
+        ).fetchall()
+        # 가장 최근 limit명을 고르고, 넣을 때는 오래된 것부터 (최근 것이 LRU 뒤쪽 = 늦게 밀려남)
+        for uid, ts in reversed(rows):
+            if uid is not None and ts is not None:
+                self._remember(str(uid), int(ts))
+        self.stats["preloaded"] = len(rows)
+        return len(rows)
+
+    def is_fresh(self, user_id: str) -> bool:
+        return self._mem_fresh(user_id) or self._db_fresh(user_id)
 
+    async def is_fresh_async(self, user_id: str) -> bool:
+        if self._mem_fresh(user_id):
+            return True
+        if self.db_executor is None:
+            return self._db_fresh(user_id)
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, self._db_fresh, user_id)
 
-def fetch_pending_batch(con, limit: int) -> List[str]:
-    rows = con.execute(
+    def _mem_fresh(self, user_id: str) -> bool:
+        now = int(time.time())
+        with self._lock:
+            ts = self._lru.get(user_id)
+            if user_id in self.pending or (ts is not None and now - ts < self.ttl_sec):
+                if ts is not None:
+                    self._lru.move_to_end(user_id)
+                self.stats["mem_hit"] += 1
+                return True
+        return False
+
+    def _db_fresh(self, user_id: str) -> bool:
+        now = int(time.time())
+        r = self.con.execute(
+            "SELECT CAST(strftime('%s', fetched_at) AS INTEGER) FROM user_raw WHERE user_id=?",
+            (user_id,),
+        ).fetchone()
+        if r is not None and r[0] is not None and now - int(r[0]) < self.ttl_sec:
+            self._remember(user_id, int(r[0]))
+            self.stats["db_hit"] += 1
+            return True
+
+        self.stats["miss"] += 1
+        return False
+
+    def submit(self, user_id: str, payload: Any) -> None:
         """
-        SELECT car_id
-        FROM car_queue
-        WHERE status='PENDING'
-        ORDER BY updated_at ASC
-        LIMIT ?
-        """,
-        (limit,),
-    ).fetchall()
-    return [r["car_id"] for r in rows]
-
-
-def main():
-    con = connect()
-    init_db(con)
-    client = EncarClient()
+        받은 user payload를 저장하러 보냄 (on_fetched가 없으면 바로 캐시에 올림)
+        """
+        if self.on_fetched is None:
+            self.mark_fetched(user_id)
+            return
+        with self._lock:
+            self.pending[user_id] = payload
+        self.on_fetched(user_id, payload)
 
-    # user 캐시 (같은 seller 반복 호출 줄임)
-    user_cache: Dict[str, Any] = {}
+    def mark_fetched(self, user_id: str) -> None:
+        # user_raw commit 이후 호출
+        with self._lock:
+            self.pending.pop(user_id, None)
+        self._remember(user_id, int(time.time()))
 
-    car_ids = fetch_pending_batch(con, BATCH_LIMIT)
-    if not car_ids:
-        print("✅ No PENDING cars. done.")
-        return
+    def forget(self, user_id: str) -> None:
+        # 저장 실패: 다음 차량이 다시 받게
+        with self._lock:
+            self.pending.pop(user_id, None)
+
+    def report(self) -> str:
+        st = self.stats
+        hits = st["mem_hit"] + st["db_hit"]
+        total = hits + st["miss"]
+        rate = (hits / total * 100) if total else 0.0
+        return (
+            f"seller cache: hit_rate={rate:.1f}% mem_hit={st['mem_hit']} db_hit={st['db_hit']} "
+            f"miss={st['miss']} preloaded={st['preloaded']} size={len(self._lru)}"
+        )
+
+
+def save_car_result(con, car_id: str, fetched: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    한 차량의 수집 결과를 raw 테이블들에 upsert + vehicle_flat 갱신 (commit은 호출부에서)
+    - raw가 전부 그대로면 vehicle_flat은 건드리지 않음 (data_version/FTS 트리거가 안 돌아서 화면 캐시 유지)
+    fetched 키: vehicle / inspection / record(vehicle_no, payload) / options
+    (user_raw는 차량과 별개로 SellerCache.submit -> ResultWriter USER 행으로 저장)
+    반환: (내용이 바뀐 raw 행 수, 그대로인 raw 행 수)
+    """
+    flags = [
+        upsert_raw(con, "vehicle_raw", "car_id", car_id, fetched["vehicle"]),
+        upsert_raw(con, "inspection_raw", "car_id", car_id, fetched["inspection"]),
+    ]
+
+    if fetched.get("record"):
+        vehicle_no, rec = fetched["record"]
+        flags.append(upsert_raw(con, "record_raw", "car_id", car_id, rec, extra_cols={"vehicle_no": vehicle_no}))
+
+    flags.append(upsert_raw(con, "options_choice_raw", "car_id", car_id, fetched["options"]))
+
+    changed = sum(1 for f in flags if f)
+
+    # raw가 하나도 안 바뀌었으면 flat도 그대로 (flat 행이 없을 때만 다시 만듦)
+    if changed or con.execute("SELECT 1 FROM vehicle_flat WHERE car_id=?", (car_id,)).fetchone() is None:
+        rec = fetched["record"][1] if fetched.get("record") else None
+        encar_flat.save_flat(con, car_id, fetched["vehicle"], fetched["inspection"], rec, fetched["options"])
+
+    return changed, len(flags) - changed
+
+
+def fetch_car(client: EncarClient, car_id: str, sellers: SellerCache) -> Dict[str, Any]:
+    fetched: Dict[str, Any] = {"record": None, "user": None}
+
+    # vehicle
+    v = client.get_json(VEHICLE_URL.format(carId=car_id), family="vehicle")
+    fetched["vehicle"] = v
+
+    user_id = pick_userid_from_vehicle(v) if isinstance(v, dict) else None
+    vehicle_no = pick_vehicle_no_from_vehicle(v) if isinstance(v, dict) else None
+
+    # inspection
+    try:
+        fetched["inspection"] = client.get_json(INSPECTION_URL.format(carId=car_id), family="inspection")
+    except FileNotFoundError:
+        # ✅ 성능점검 없음: 스킵
+        fetched["inspection"] = {"_meta": "NOT_FOUND"}
+
+    # record/open (vehicle_no 없으면 record_raw는 건너뜀)
+    if vehicle_no:
+        rec = client.get_json(RECORD_OPEN_URL.format(carId=car_id, vehicleNo=vehicle_no), family="record")
+        fetched["record"] = (vehicle_no, rec)
 
-    print(f"✅ Worker start: batch={len(car_ids)}")
+    # options/choice
+    fetched["options"] = client.get_json(OPTIONS_CHOICE_URL.format(carId=car_id), family="options")
 
-    done = 0
-    err = 0
+    # user (TTL 안에 수집된 seller는 호출/upsert 생략)
+    if user_id and not sellers.is_fresh(user_id):
+        u = client.get_json(USER_URL.format(userId=user_id), family="user")
+        sellers.submit(user_id, u)
+        fetched["user"] = (user_id, u)
 
-    for i, car_id in enumerate(car_ids, start=1):
-        print(f"\n[{i}/{len(car_ids)}] carId={car_id}")
-        set_status(con, car_id, "RUNNING")
+    return fetched
 
+
+async def fetch_car_async(client: AsyncEncarClient, car_id: str, sellers: SellerCache) -> Dict[str, Any]:
+    """
+    의존성 기반 fetch plan (요청 수는 fetch_car와 동일, 스킵 규칙도 동일)
+      1단계: vehicle | inspection | options/choice  -> 동시에 시작
+      2단계: record/open(vehicleNo 필요) | user(userId 필요) -> vehicle 응답 직후 바로 시작
+    하나라도 실패하면 남은 요청은 취소하고 예외를 그대로 올림
+    """
+    fetched: Dict[str, Any] = {"record": None, "user": None}
+
+    ins_task = asyncio.ensure_future(_fetch_inspection_async(client, car_id))
+    opt_task = asyncio.ensure_future(client.get_json(OPTIONS_CHOICE_URL.format(carId=car_id), family="options"))
+    tasks = [ins_task, opt_task]
+    rec_task = None
+    user_task = None
+
+    try:
+        v = await client.get_json(VEHICLE_URL.format(carId=car_id), family="vehicle")
+        fetched["vehicle"] = v
+
+        user_id = pick_userid_from_vehicle(v) if isinstance(v, dict) else None
+        vehicle_no = pick_vehicle_no_from_vehicle(v) if isinstance(v, dict) else None
+
+        if vehicle_no:
+            rec_task = asyncio.ensure_future(
+                client.get_json(RECORD_OPEN_URL.format(carId=car_id, vehicleNo=vehicle_no), family="record")
+            )
+            tasks.append(rec_task)
+        if user_id:
+            user_task = asyncio.ensure_future(_fetch_user_cached_async(client, user_id, sellers))
+            tasks.append(user_task)
+
+        fetched["inspection"] = await ins_task
+        fetched["options"] = await opt_task
+        if rec_task is not None:
+            fetched["record"] = (vehicle_no, await rec_task)
+        if user_task is not None:
+            fetched["user"] = await user_task
+
+    except BaseException:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return fetched
+
+
+async def _fetch_inspection_async(client: AsyncEncarClient, car_id: str) -> Any:
+    try:
+        return await client.get_json(INSPECTION_URL.format(carId=car_id), family="inspection")
+    except FileNotFoundError:
+        # ✅ 성능점검 없음: 스킵
+        return {"_meta": "NOT_FOUND"}
+
+
+async def _fetch_user_cached_async(
+    client: AsyncEncarClient,
+    user_id: str,
+    sellers: SellerCache,
+) -> Optional[Tuple[str, Any]]:
+    """
+    같은 seller를 동시에 여러 차량이 요청할 수 있어서 진행 중인 요청(Future)을 sellers.inflight에 넣고 공유
+    - 호출한 차량도 기다린 차량도 (user_id, payload)를 받음
+    - user_raw 저장은 요청이 끝나는 시점에 sellers.submit으로 (요청한 차량이 실패/취소돼도 저장됨)
+    - 공유 Future는 shield로 감싸서 한 차량이 취소돼도 다른 차량 대기는 유지
+    """
+    inflight = sellers.inflight.get(user_id)
+    if inflight is not None:
+        return user_id, await asyncio.shield(inflight)
+    if await sellers.is_fresh_async(user_id):
+        return None
+    # DB 조회를 기다리는 동안 다른 차량이 같은 seller 요청을 시작했을 수 있음
+    inflight = sellers.inflight.get(user_id)
+    if inflight is not None:
+        return user_id, await asyncio.shield(inflight)
+
+    fut = asyncio.ensure_future(client.get_json(USER_URL.format(userId=user_id), family="user"))
+    sellers.inflight[user_id] = fut
+
+    def settle(f: asyncio.Future) -> None:
+        # 성공하면 저장하러 보냄(commit 후 캐시 기록), 실패하면 다음 차량이 다시 시도
+        sellers.inflight.pop(user_id, None)
+        if not f.cancelled() and f.exception() is None:
+            sellers.submit(user_id, f.result())
+
+    fut.add_done_callback(settle)
+    u = await asyncio.shield(fut)
+    return user_id, u
+
+
+def rollback_savepoint(con, name: str, cause: Exception) -> None:
+    """
+    SAVEPOINT 안에서 난 예외 -> 그 SAVEPOINT만 되돌림
+    - 트랜잭션 자체가 깨져서(SQLITE_FULL/IOERR 등으로 자동 rollback) 되돌릴 수 없으면 원래 예외를 올림
+      (호출부 flush 재시도로)
+    """
+    try:
+        con.execute(f"ROLLBACK TO {name}")
+        con.execute(f"RELEASE {name}")
+    except sqlite3.Error:
+        raise cause
+
+
+class ResultWriter:
+    """
+    수집이 끝난 차량 결과를 큐로 받아 여러 대를 한 트랜잭션으로 쓰는 writer 스레드 (group commit)
+    - flush 조건: WRITER_FLUSH_SIZE대가 모이거나, 첫 결과가 들어온 뒤 WRITER_FLUSH_SEC초
+    - flush 1번 = raw upsert + car_queue DONE/ERROR 를 여러 차량분 묶어서 commit 1번
+    - 차량마다 SAVEPOINT를 걸어서 한 차량 저장 실패(sqlite3.Error 포함)는 그 차량만 ERROR 처리
+      (SAVEPOINT로 되돌릴 수 없을 때만 flush 전체를 다시 시도)
+    - USER 행(seller 프로필)은 차량과 별개로 저장, commit 후 on_user_saved / 실패하면 on_user_failed
+    - worker_id를 주면 DONE/ERROR는 이 워커가 아직 잡고 있는 행에만 쓰고(lease를 잃은 차량은 건드리지 않음),
+      flush마다 이 워커의 RUNNING lease를 연장
+    - writer 스레드가 죽으면 error에 남기고 큐를 비움 -> 이후 submit_*/close는 RuntimeError (put에서 무한 대기 안 함)
+
+    내구성:
+    - 프로세스가 죽으면 아직 flush 안 된 결과(마지막 flush 윈도우: 최대 WRITER_FLUSH_SIZE대 / WRITER_FLUSH_SEC초)만 유실
+    - 유실된 차량은 car_queue에 RUNNING(+lease)으로 남아 있다가 lease 만료 후 reaper가 PENDING으로 되돌림 -> 재수집
+    - commit된 flush는 WAL + synchronous=NORMAL 이라 프로세스 크래시에는 안전,
+      OS/전원 장애에서는 마지막 commit들이 롤백될 수 있음 (그 경우도 위와 같이 재수집)
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        flush_size: int = WRITER_FLUSH_SIZE,
+        flush_sec: float = WRITER_FLUSH_SEC,
+        on_user_saved=None,
+        on_user_failed=None,
+        worker_id: Optional[str] = None,
+    ):
+        self.flush_size = max(1, flush_size)
+        self.worker_id = worker_id
+        self.flush_sec = flush_sec
+        self.on_user_saved = on_user_saved
+        self.on_user_failed = on_user_failed
+        # 쓰기가 밀리면 put에서 잠깐 막혀서 수집 쪽 속도를 자연스럽게 늦춤
+        self.q: queue.Queue = queue.Queue(maxsize=self.flush_size * 4)
+        self.stats = {"done": 0, "error": 0, "lease_lost": 0, "flushes": 0, "rows_changed": 0, "rows_unchanged": 0}
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+
+    def start(self) -> "ResultWriter":
+        self._thread.start()
+        return self
+
+    def submit_done(self, car_id: str, fetched: Dict[str, Any]) -> None:
+        self._put(("DONE", car_id, fetched))
+
+    def submit_error(self, car_id: str, msg: str, error_class: str = "transient") -> None:
+        self._put(("ERROR", car_id, (msg, error_class)))
+
+    def submit_user(self, user_id: str, payload: Any) -> None:
+        self._put(("USER", user_id, payload))
+
+    async def submit_done_async(self, car_id: str, fetched: Dict[str, Any]) -> None:
+        await self._put_async(("DONE", car_id, fetched))
+
+    async def submit_error_async(self, car_id: str, msg: str, error_class: str = "transient") -> None:
+        await self._put_async(("ERROR", car_id, (msg, error_class)))
+
+    async def submit_user_async(self, user_id: str, payload: Any) -> None:
+        await self._put_async(("USER", user_id, payload))
+
+    async def _put_async(self, item: Any) -> None:
+        # 이벤트 루프용: 자리가 있으면 바로 넣고, 찼으면 기다리는 put은 스레드에서 (루프는 계속 돎)
+        self._raise_if_dead()
         try:
-            # vehicle
-            sleepy()
-            v = client.get_json(VEHICLE_URL.format(carId=car_id))
-            upsert_raw(con, "vehicle_raw", "car_id", car_id, v)
+            self.q.put_nowait(item)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._put, item)
+
+    def close(self) -> None:
+        if self.error is None:
+            self._put(self._STOP)
+        self._thread.join()
+        self._raise_if_dead()
 
-            user_id = pick_userid_from_vehicle(v) if isinstance(v, dict) else None
-            vehicle_no = pick_vehicle_no_from_vehicle(v) if isinstance(v, dict) else None
+    def _raise_if_dead(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"result writer stopped: {self.error!r}") from self.error
 
-            # inspection
+    def _put(self, item: Any) -> None:
+        # 큐가 찬 채로 writer가 죽어도 막히지 않게 짧게 끊어서 기다림
+        while True:
+            self._raise_if_dead()
             try:
-                sleepy()
-                ins = client.get_json(INSPECTION_URL.format(carId=car_id))
-                upsert_raw(con, "inspection_raw", "car_id", car_id, ins)
-            except FileNotFoundError:
-                # ✅ 성능점검 없음: 스킵
-                upsert_raw(con, "inspection_raw", "car_id", car_id, {"_meta": "NOT_FOUND"})
-            except Exception as e:
-                # ✅ 진짜 장애(429/5xx 등)만 여기로
-                raise
+                self.q.put(item, timeout=WRITER_PUT_POLL_SEC)
+                return
+            except queue.Full:
+                continue
 
-            # record/open
-            if vehicle_no:
-                sleepy()
-                rec = client.get_json(RECORD_OPEN_URL.format(carId=car_id, vehicleNo=vehicle_no))
-                upsert_raw(con, "record_raw", "car_id", car_id, rec, extra_cols={"vehicle_no": vehicle_no})
-            else:
-                # vehicle_no 없으면 record_raw는 건너뜀
+    def _run(self) -> None:
+        buf: List[Tuple[str, str, Any]] = []
+        try:
+            self._loop(buf)
+        except BaseException as e:
+            self.error = e
+            print(f"❌ result writer died: {e!r} (unflushed cars are re-queued by lease reaper)")
+            # 남은 결과는 버림: 차량은 RUNNING -> reaper, seller는 pending에서 빼서 다시 받게
+            while True:
+                try:
+                    item = self.q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not self._STOP:
+                    buf.append(item)
+            try:
+                self._settle_users([], [key for kind, key, _ in buf if kind == "USER"])
+            except Exception:
                 pass
 
-            # options/choice
-            sleepy()
-            opt = client.get_json(OPTIONS_CHOICE_URL.format(carId=car_id))
-            upsert_raw(con, "options_choice_raw", "car_id", car_id, opt)
-
-            # user (캐시)
-            if user_id:
-                if user_id not in user_cache:
-                    sleepy()
-                    u = client.get_json(USER_URL.format(userId=user_id))
-                    user_cache[user_id] = u
-                    # user_raw는 car_id가 아니라 user_id가 PK
-                    upsert_raw(con, "user_raw", "user_id", user_id, u)
-                # 캐시된 경우는 DB upsert 생략 가능(원하면 주석 해제)
-                # else:
-                #     upsert_raw(con, "user_raw", "user_id", user_id, user_cache[user_id])
-
-            con.commit()
-            set_status(con, car_id, "DONE")
-            done += 1
-            print("✅ DONE")
-
-        except Exception as e:
-            con.rollback()
-            err += 1
-            msg = str(e)[:500]
-            print(f"❌ ERROR: {msg}")
-            # retry_count 증가 + ERROR
-            set_status(con, car_id, "ERROR", err=msg, inc_retry=True)
-
-            # 너무 많은 재시도 방지: retry가 너무 많으면 PENDING으로 돌리지 않고 ERROR 유지
-            # (재시도는 별도 스크립트/쿼리로 관리)
-            continue
-
-    print(f"\n✅ Worker finished. DONE={done}, ERROR={err}")
+    def _loop(self, buf: List[Tuple[str, str, Any]]) -> None:
+        con = connect()
+        deadline = 0.0
+
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic()) if buf else None
+                try:
+                    item = self.q.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
 
+                if item is self._STOP:
+                    break
+                if item is not None:
+                    if not buf:
+                        deadline = time.monotonic() + self.flush_sec
+                    buf.append(item)
 
-if __name__ == "__main__":
-    main()
+                if buf and (len(buf) >= self.flush_size or time.monotonic() >= deadline):
+                    self._flush(con, buf)
+                    buf.clear()
+
+            if buf:
+                self._flush(con, buf)
+                buf.clear()
+        finally:
+            con.close()
 
+    def _flush(self, con, buf: List[Tuple[str, str, Any]]) -> None:
+        for attempt in range(1, 4):
+            done = 0
+            err = 0
+            rows_changed = 0
+            rows_unchanged = 0
+            users_saved: List[str] = []
+            users_failed: List[str] = []
+            lost: List[str] = []
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                for kind, car_id, data in buf:
+                    if kind == "USER":
+                        # car_id 자리에 user_id (user_raw PK)
+                        con.execute("SAVEPOINT usr")
+                        try:
+                            if upsert_raw(con, "user_raw", "user_id", car_id, data):
+                                rows_changed += 1
+                            else:
+                                rows_unchanged += 1
+                            con.execute("RELEASE usr")
+                            users_saved.append(car_id)
+                        except Exception as e:
+                            rollback_savepoint(con, "usr", e)
+                            print(f"userId={car_id} ❌ SAVE ERROR: {str(e)[:500]}")
+                            users_failed.append(car_id)
+                        continue
+
+                    if kind == "ERROR":
+                        msg, error_class = data
+                        if set_error(con, car_id, msg, error_class, **RETRY_POLICY[error_class],
+                                     commit=False, worker_id=self.worker_id):
+                            err += 1
+                        else:
+                            lost.append(car_id)
+                        continue
+
+                    con.execute("SAVEPOINT car")
+                    try:
+                        changed, unchanged = save_car_result(con, car_id, data)
+                        con.execute("RELEASE car")
+                        rows_changed += changed
+                        rows_unchanged += unchanged
+                        # raw는 그대로 저장 (새 데이터라 손해 없음), 상태는 아직 이 워커 것일 때만
+                        if set_status(con, car_id, "DONE", commit=False, worker_id=self.worker_id):
+                            done += 1
+                        else:
+                            lost.append(car_id)
+                    except Exception as e:
+                        rollback_savepoint(con, "car", e)
+                        msg = str(e)[:500]
+                        print(f"carId={car_id} ❌ SAVE ERROR: {msg}")
+                        error_class = classify_error(e)
+                        if set_error(con, car_id, msg, error_class, **RETRY_POLICY[error_class],
+                                     commit=False, worker_id=self.worker_id):
+                            err += 1
+                        else:
+                            lost.append(car_id)
+                if self.worker_id is not None:
+                    # 아직 처리 중인 차량들 lease 연장 (flush가 돌 때마다)
+                    renew_leases(con, self.worker_id, commit=False)
+                con.commit()
+                self._settle_users(users_saved, users_failed)
+                if lost:
+                    print(f"⚠️ lease lost for {len(lost)} cars (re-claimed by another worker), status left as is: {lost[:5]}")
+                self._settle_users(users_saved, users_failed)
+
+                self.stats["done"] += done
+                self.stats["error"] += err
+                self.stats["lease_lost"] += len(lost)
+                self.stats["flushes"] += 1
+                self.stats["rows_changed"] += rows_changed
+                self.stats["rows_unchanged"] += rows_unchanged
+                return
+
+            except sqlite3.Error as e:
+                con.rollback()
+                print(f"⚠️ writer flush failed (attempt {attempt}/3, cars={len(buf)}): {e}")
+                time.sleep(attempt)
+
+        # 끝내 못 쓴 차량은 RUNNING으로 남고 lease 만료 후 reaper가 PENDING으로 되돌림
+        print(f"❌ writer dropped {len(buf)} results (will be re-queued by lease reaper)")
+        self._settle_users([], [car_id for kind, car_id, _ in buf if kind == "USER"])
+
+    def _settle_users(self, saved: List[str], failed: List[str]) -> None:
+        for user_id in saved:
+            if self.on_user_saved:
+                self.on_user_saved(user_id)
+        for user_id in failed:
+            if self.on_user_failed:
+                self.on_user_failed(user_id)
+
+
+def run_sync(claim, writer: ResultWriter, sellers: SellerCache) -> None:
+    client = EncarClient()
+    n = 0
+
+    while True:
+        car_ids = claim()
+        if not car_ids:
+            break
+
+        for car_id in car_ids:
+            n += 1
+            print(f"\n[{n}] carId={car_id}")
+
+            try:
+                fetched = fetch_car(client, car_id, sellers)
+                writer.submit_done(car_id, fetched)
+                print("✅ fetched")
+
+            except Exception as e:
+                msg = str(e)[:500]
+                print(f"❌ ERROR: {msg}")
+                # retry_count 증가 + ERROR, 재시도 시각은 분류별 backoff로 예약
+                # (MAX_RETRY_PER_CAR 넘으면 예약 없이 ERROR 유지)
+                writer.submit_error(car_id, msg, classify_error(e))
+                continue
+
+
+async def run_async(claim, writer: ResultWriter, sellers: SellerCache, concurrency: int) -> None:
+    """
+    차량 N대를 동시에 처리하는 asyncio 워커
+    - 네트워크 대기는 겹치고, DB 쓰기는 ResultWriter 스레드가 묶어서 처리
+    - car_queue 상태 전이는 sync 모드와 동일: PENDING -> RUNNING(claim) -> DONE | ERROR(-> 재시도 시각에 다시 claim)
+    - 로컬 큐가 비면 그때 claim해서 채움 (CLAIM_SIZE 단위로 끊기지 않고 계속 N대 유지)
+    - 이벤트 루프에서는 블로킹 호출을 하지 않음: claim/seller DB 조회는 DB 전용 스레드 1개,
+      writer 큐가 찼을 때의 put은 스레드에서 기다림 (그동안 다른 pipeline은 계속 진행)
+      (DB 전용 스레드가 main 커넥션을 쓰므로 connect(check_same_thread=False), 루프 밖에서는 안 씀)
+    """
+    loop = asyncio.get_running_loop()
+    client = AsyncEncarClient(concurrency=concurrency)
+    db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="worker-db")
+    pending: List[str] = []
+    state = {"n": 0, "exhausted": False}
+    claim_lock = asyncio.Lock()
+    user_saves: set = set()
+
+    async def next_car_id() -> Optional[str]:
+        if not pending and not state["exhausted"]:
+            # 여러 pipeline이 동시에 비어도 claim은 한 번만
+            async with claim_lock:
+                if not pending and not state["exhausted"]:
+                    pending.extend(reversed(await loop.run_in_executor(db, claim)))
+                    state["exhausted"] = not pending
+        return pending.pop() if pending else None
+
+    def on_user_fetched(user_id: str, payload: Any) -> None:
+        # settle 콜백(루프 위)에서 불림 -> put은 task로, 못 넣으면 pending에서 빼서 다시 받게
+        task = loop.create_task(writer.submit_user_async(user_id, payload))
+        user_saves.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            user_saves.discard(t)
+            if t.cancelled() or t.exception() is not None:
+                sellers.forget(user_id)
+
+        task.add_done_callback(done)
+
+    async def pipeline():
+        while True:
+            car_id = await next_car_id()
+            if car_id is None:
+                return
+
+            state["n"] += 1
+            n = state["n"]
+            try:
+                fetched = await fetch_car_async(client, car_id, sellers)
+                await writer.submit_done_async(car_id, fetched)
+                print(f"[{n}] carId={car_id} ✅ fetched")
+
+            except Exception as e:
+                msg = str(e)[:500]
+                print(f"[{n}] carId={car_id} ❌ ERROR: {msg}")
+                await writer.submit_error_async(car_id, msg, classify_error(e))
+
+    prev_on_fetched, prev_db = sellers.on_fetched, sellers.db_executor
+    sellers.on_fetched, sellers.db_executor = on_user_fetched, db
+    try:
+        await asyncio.gather(*(pipeline() for _ in range(max(1, concurrency))))
+        if user_saves:
+            await asyncio.gather(*list(user_saves), return_exceptions=True)
+    finally:
+        sellers.on_fetched, sellers.db_executor = prev_on_fetched, prev_db
+        db.shutdown(wait=True)
+        await client.aclose()
+
+
+def main(mode: str = WORKER_MODE, concurrency: int = CONCURRENCY):
+    # async 모드에서는 claim/seller 조회를 DB 전용 스레드가 이어받아 씀 (동시에 두 스레드가 쓰지는 않음)
+    con = connect(check_same_thread=False)
+    init_db(con)
+
+    # 죽은 워커가 남긴 RUNNING 회수 (lease 만료분만)
+    reaped = reap_expired_leases(con)
+    # 재시도 예약 컬럼 이전에 쌓인 ERROR 분류/예약 (처음 한 번만 해당)
+    legacy = schedule_legacy_errors(con, MAX_RETRY_PER_CAR)
+
+    worker_id = make_worker_id()
+    claim = make_claimer(con, worker_id, BATCH_LIMIT)
+
+    # seller 캐시 (user_raw 기준 TTL, 최근 seller 미리 올림)
+    sellers = SellerCache(con)
+    preloaded = sellers.preload()
+
+    # 압축 저장이면 테이블별 최신 사전 로드 (사전이 없으면 사전 없이 압축)
+    if encar_codec.STORE_COMPRESSED:
+        print(f"✅ payload compression on: dicts={encar_codec.load_active_dicts(con)}")
+
+    print(
+        f"✅ Worker start: worker_id={worker_id} mode={mode} "
+        f"concurrency={concurrency if mode == 'async' else 1} reaped={reaped} legacy_errors={legacy} sellers_preloaded={preloaded}"
+    )
+
+    t0 = time.time()
+    writer = ResultWriter(
+        on_user_saved=sellers.mark_fetched, on_user_failed=sellers.forget, worker_id=worker_id
+    ).start()
+    sellers.on_fetched = writer.submit_user
+    try:
+        if mode == "async":
+            asyncio.run(run_async(claim, writer, sellers, concurrency))
+        else:
+            run_sync(claim, writer, sellers)
+    finally:
+        writer.close()
+
+    done, err = writer.stats["done"], writer.stats["error"]
+    if done + err == 0:
+        print("✅ No PENDING cars. done.")
+        return
+
+    elapsed = max(time.time() - t0, 1e-9)
+    print(
+        f"\n✅ Worker finished. DONE={done}, ERROR={err}, cars/min={(done + err) * 60 / elapsed:.1f}, "
+        f"flushes={writer.stats['flushes']} lease_lost={writer.stats['lease_lost']}"
+    )
+    print(f"   raw rows: changed={writer.stats['rows_changed']} unchanged={writer.stats['rows_unchanged']}")
+    print(f"   {sellers.report()}")
+    print_limiter_stats()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="car_queue PENDING 차량 상세 수집 워커")
+    ap.add_argument("--mode", choices=["sync", "async"], default=WORKER_MODE)
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY, help="async 모드 동시 처리 차량 수")
+    args = ap.parse_args()
+    main(mode=args.mode, concurrency=args.concurrency)
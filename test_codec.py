@@ -0,0 +1,72 @@
+import json
+import math
+
+import pytest
+
+import encar_codec
+
+
+def _decode_error(v):
+    # orjson.JSONDecodeError 처럼 json.JSONDecodeError 하위 예외를 내는 백엔드
+    class BackendError(json.JSONDecodeError):
+        pass
+
+    raise BackendError("backend", str(v), 0)
+
+
+def test_loads_falls_back_to_std_json(monkeypatch):
+    """A backend error (even a json.JSONDecodeError subclass) is retried with the stdlib parser"""
+    monkeypatch.setattr(encar_codec, "_fast_loads", _decode_error)
+
+    out = encar_codec.loads('{"a": NaN, "b": Infinity, "s": "\\ud800"}')
+    assert math.isnan(out["a"]) and out["b"] == math.inf
+    assert out["s"] == "\ud800"
+    assert encar_codec.loads(memoryview(b"[1]")) == [1]
+
+
+def test_loads_broken_json_still_raises(monkeypatch):
+    monkeypatch.setattr(encar_codec, "_fast_loads", _decode_error)
+    with pytest.raises(json.JSONDecodeError):
+        encar_codec.loads("{broken")
+
+
+def test_loads_keeps_stdlib_semantics():
+    """Whatever backend was picked, big ints stay ints and non-standard values still parse"""
+    out = encar_codec.loads('[1180591620717411303424, -18446744073709551616, NaN, "a\\ud800b"]')
+    assert out[:2] == [2 ** 70, -(2 ** 64)]
+    assert isinstance(out[0], int)
+    assert math.isnan(out[2])
+    assert out[3] == "a\ud800b"
+
+
+def test_pick_backend_rejects_lossy_loads(monkeypatch):
+    """A backend that turns >64-bit ints into floats must not be used for loads"""
+    monkeypatch.setattr(encar_codec, "orjson", None)
+    monkeypatch.setattr(encar_codec, "ujson", None)
+
+    class Lossy:
+        @staticmethod
+        def loads(t):
+            return json.loads(t, parse_int=lambda s: int(s) if abs(int(s)) < 2 ** 63 else float(s))
+
+        @staticmethod
+        def dumps(obj, **kw):
+            return encar_codec._std_dumps(obj, kw.get("sort_keys", False))
+
+    monkeypatch.setattr(encar_codec, "ujson", Lossy)
+    name, loads_fn, _ = encar_codec._pick_backend()
+    assert name.split("/")[0] == "json"
+    assert loads_fn is json.loads
+
+
+def test_dumps_falls_back_on_any_backend_error(monkeypatch):
+    """dumps retries with stdlib json whatever the backend raises, like loads does"""
+
+    def backend_error(obj, sort_keys=False):
+        # TypeError/ValueError 계열이 아닌 백엔드 고유 예외
+        raise RuntimeError("backend")
+
+    monkeypatch.setattr(encar_codec, "_fast_dumps", backend_error)
+    assert encar_codec.dumps({"b": 1, "a": "가"}, sort_keys=True) == '{"a":"가","b":1}'
+    with pytest.raises(TypeError):
+        encar_codec.dumps({"x": object()})
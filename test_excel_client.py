@@ -0,0 +1,29 @@
+import pytest
+
+import encar_to_excel
+from encar_ratelimit import AdaptiveRateLimiter
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+        self.headers = {}
+
+
+def test_not_found_does_not_slow_the_family(monkeypatch):
+    """A missing inspection/record (404/410) is raised at once without retries or a rate cut"""
+    limiter = AdaptiveRateLimiter("inspection", rate=100.0, min_rate=1.0, max_rate=100.0)
+    monkeypatch.setattr(encar_to_excel, "get_limiter", lambda family: limiter)
+    client = encar_to_excel.EncarClient()
+    calls = []
+
+    for status in (404, 410):
+        monkeypatch.setattr(client.s, "get", lambda url, timeout: calls.append(url) or FakeResponse(status))
+        with pytest.raises(FileNotFoundError):
+            client.fetch_inspection("c1")
+
+    assert len(calls) == 2
+    assert limiter.rate == 100.0
+    assert limiter.stats["errors"] == 0
+    assert limiter._paused_until == 0.0
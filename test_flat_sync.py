@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+import encar_db
+import encar_flat
+
+
+@pytest.fixture
+def con(con):
+    # vehicle_raw: c1, c2(깨진 JSON), c3
+    rows = [
+        ("c1", '{"category": {"manufacturerName": "현대", "modelName": "그랜저"}}'),
+        ("c2", "{broken"),
+        ("c3", '{"category": {"manufacturerName": "기아", "modelName": "K7"}}'),
+    ]
+    with con:
+        con.executemany(
+            "INSERT INTO vehicle_raw(car_id, payload, changed_at) VALUES (?, ?, datetime('now'))", rows
+        )
+    return con
+
+
+def test_sync_terminates_with_unflattenable_payload(con, db_path):
+    """A broken vehicle_raw payload is skipped once; sync must not keep re-selecting it"""
+    result = {}
+
+    def run():
+        result["done"] = encar_flat.sync(encar_db.connect(db_path), batch=1)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(timeout=10)
+
+    assert not t.is_alive(), "sync did not terminate"
+    assert result["done"] == 2
+    assert [r[0] for r in con.execute("SELECT car_id FROM vehicle_flat ORDER BY car_id")] == ["c1", "c3"]
+    # 깨진 차량은 missing으로 남아 lag_report에 보임
+    assert encar_flat.lag_report(con)["vehicle_flat"]["missing"] == 1
+
+
+def test_stale_car_ids_keyset(con):
+    assert encar_flat.stale_car_ids(con, 10) == ["c1", "c2", "c3"]
+    assert encar_flat.stale_car_ids(con, 10, after="c1") == ["c2", "c3"]
+    assert encar_flat.stale_car_ids(con, 1, after="c2") == ["c3"]
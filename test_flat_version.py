@@ -0,0 +1,89 @@
+import encar_db
+import encar_flat
+from encar_worker import save_car_result
+
+VEHICLE = {"category": {"manufacturerName": "현대", "modelName": "그랜저"}, "advertisement": {"price": 1490}}
+
+
+def version(con):
+    return con.execute("SELECT version FROM data_version WHERE name='vehicle_flat'").fetchone()[0]
+
+
+def fetched(vehicle):
+    return {"vehicle": vehicle, "inspection": {"_meta": "NOT_FOUND"}, "record": None, "options": [], "user": None}
+
+
+def test_unchanged_save_keeps_data_version(con):
+    """Re-saving identical payloads must not bump data_version (the screen caches are keyed on it)"""
+    with con:
+        assert save_car_result(con, "c1", fetched(VEHICLE))[0] > 0
+    v1 = version(con)
+    updated = con.execute("SELECT updated_at FROM vehicle_flat WHERE car_id='c1'").fetchone()[0]
+
+    with con:
+        assert save_car_result(con, "c1", fetched(VEHICLE)) == (0, 3)
+    assert version(con) == v1
+    assert con.execute("SELECT updated_at FROM vehicle_flat WHERE car_id='c1'").fetchone()[0] == updated
+
+    changed = {**VEHICLE, "advertisement": {"price": 1390}}
+    with con:
+        save_car_result(con, "c1", fetched(changed))
+    assert version(con) == v1 + 1
+
+
+def test_noop_flat_upsert_skips_triggers(con):
+    """An upsert that rewrites the same values touches updated_at only: no version bump, FTS stays consistent"""
+    with con:
+        encar_flat.save_flat(con, "c1", VEHICLE, None, None, [])
+    v1 = version(con)
+
+    with con:
+        encar_flat.save_flat(con, "c1", VEHICLE, None, None, [])
+    assert version(con) == v1
+
+    renamed = {**VEHICLE, "category": {"manufacturerName": "기아", "modelName": "쏘렌토"}}
+    with con:
+        encar_flat.save_flat(con, "c1", renamed, None, None, [])
+    assert version(con) == v1 + 1
+    assert con.execute("SELECT COUNT(*) FROM vehicle_flat_fts WHERE vehicle_flat_fts MATCH '쏘렌토'").fetchone()[0] == 1
+    assert con.execute("SELECT COUNT(*) FROM vehicle_flat_fts WHERE vehicle_flat_fts MATCH '그랜저'").fetchone()[0] == 0
+    con.execute("INSERT INTO vehicle_flat_fts(vehicle_flat_fts) VALUES('integrity-check')")
+
+
+def test_old_triggers_replaced(con):
+    """Databases created before the WHEN guards get their update triggers recreated by init_db"""
+    with con:
+        con.execute("DROP TRIGGER vehicle_flat_ver_au")
+        con.execute(
+            "CREATE TRIGGER vehicle_flat_ver_au AFTER UPDATE ON vehicle_flat BEGIN "
+            "UPDATE data_version SET version = version + 1 WHERE name = 'vehicle_flat'; END"
+        )
+    encar_db.init_db(con)
+    sql = con.execute("SELECT sql FROM sqlite_master WHERE name='vehicle_flat_ver_au'").fetchone()[0]
+    assert "WHEN" in sql
+    assert "WHEN" in con.execute("SELECT sql FROM sqlite_master WHERE name='vehicle_flat_fts_au'").fetchone()[0]
+
+
+def test_count_cache_survives_unchanged_flush(con, tmp_path):
+    """The screen count cache keeps hitting across a writer flush that changed nothing"""
+    from encar import caches
+
+    with con:
+        save_car_result(con, "c1", fetched(VEHICLE))
+    calls = []
+
+    def count():
+        calls.append(1)
+        return con.execute("SELECT COUNT(*) FROM vehicle_flat").fetchone()[0]
+
+    key = ("test_flat_version", str(tmp_path))
+    assert caches.cached_count(con.cursor(), key, count) == 1
+    with con:
+        save_car_result(con, "c1", fetched(VEHICLE))
+    assert caches.cached_count(con.cursor(), key, count) == 1
+    assert len(calls) == 1
+
+    with con:
+        save_car_result(con, "c2", fetched(VEHICLE))
+    assert caches.cached_count(con.cursor(), key, count) == 2
+    assert len(calls) == 2
@@ -0,0 +1,25 @@
+import encar_ratelimit
+from encar_ratelimit import AdaptiveRateLimiter
+
+
+def test_callers_queued_during_pause_are_spaced(monkeypatch):
+    """Callers that arrive during a throttle pause get consecutive slots after it, not one shared release time"""
+    monkeypatch.setattr(encar_ratelimit, "JITTER", 0.0)
+    lim = AdaptiveRateLimiter("list", rate=10.0, min_rate=1.0, max_rate=10.0)
+    lim.on_throttle()
+    gap = 1.0 / lim.rate
+
+    waits = [lim._reserve() for _ in range(5)]
+
+    pause = encar_ratelimit.THROTTLE_PAUSE_SEC
+    assert pause - 0.1 < waits[0] <= pause
+    for a, b in zip(waits, waits[1:]):
+        assert b - a >= gap * 0.99
+
+
+def test_no_wait_within_burst(monkeypatch):
+    monkeypatch.setattr(encar_ratelimit, "JITTER", 0.0)
+    lim = AdaptiveRateLimiter("list", rate=10.0, min_rate=1.0, max_rate=10.0, burst=2.0)
+    assert lim._reserve() == 0.0
+    assert lim._reserve() == 0.0
+    assert 0.09 < lim._reserve() <= 0.1
@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+
+import pytest
+
+import encar_worker
+from encar_worker import ResultWriter
+
+VEHICLE = {"category": {"manufacturerName": "현대", "modelName": "그랜저"}}
+
+
+def fetched():
+    return {"vehicle": VEHICLE, "inspection": {"_meta": "NOT_FOUND"}, "record": None, "options": [], "user": None}
+
+
+def add_running(con, car_ids):
+    with con:
+        con.executemany("INSERT INTO car_queue(car_id, status) VALUES(?, 'RUNNING')", [(c,) for c in car_ids])
+
+
+def test_sqlite_error_in_one_car_only_fails_that_car(worker_db, monkeypatch):
+    """An sqlite3.Error inside one car's SAVEPOINT rolls back that car only; the rest of the batch commits"""
+    con = worker_db
+    add_running(con, ["c1", "bad", "c3"])
+    save = encar_worker.save_car_result
+
+    def failing_save(con, car_id, data):
+        changed = save(con, car_id, data)
+        if car_id == "bad":
+            raise sqlite3.IntegrityError("constraint failed")
+        return changed
+
+    monkeypatch.setattr(encar_worker, "save_car_result", failing_save)
+    writer = ResultWriter(flush_size=100, flush_sec=0.05).start()
+    for cid in ["c1", "bad", "c3"]:
+        writer.submit_done(cid, fetched())
+    writer.close()
+
+    assert dict(con.execute("SELECT car_id, status FROM car_queue")) == {"c1": "DONE", "bad": "ERROR", "c3": "DONE"}
+    assert [r[0] for r in con.execute("SELECT car_id FROM vehicle_raw ORDER BY car_id")] == ["c1", "c3"]
+    assert writer.stats["done"] == 2 and writer.stats["error"] == 1 and writer.stats["flushes"] == 1
+
+
+def test_dead_writer_does_not_block_producers(worker_db, monkeypatch):
+    """If the writer thread dies, submit_* raise instead of blocking forever on a full queue"""
+    add_running(worker_db, [f"c{i}" for i in range(50)])
+    monkeypatch.setattr(encar_worker, "WRITER_PUT_POLL_SEC", 0.01)
+
+    def broken(*args, **kwargs):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(encar_worker, "set_status", broken)
+    writer = ResultWriter(flush_size=1, flush_sec=0.0).start()
+    result = {}
+
+    def produce():
+        try:
+            for i in range(50):
+                writer.submit_done(f"c{i}", fetched())
+        except RuntimeError as e:
+            result["error"] = e
+
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    t.join(timeout=10)
+
+    assert not t.is_alive(), "producer blocked on a dead writer"
+    assert isinstance(result["error"].__cause__, ValueError)
+    assert isinstance(writer.error, ValueError)
+
+    with pytest.raises(RuntimeError):
+        writer.submit_user("D1", {})
+    with pytest.raises(RuntimeError):
+        writer.close()
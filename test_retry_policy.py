@@ -0,0 +1,34 @@
+import encar_db
+import encar_worker
+
+
+def test_permanent_error_is_terminal(con):
+    """404/410 (permanent) must end in ERROR with no retry scheduled, so claim never picks it again"""
+    encar_db.seed_one(con, "gone")
+    assert encar_db.claim_batch(con, "w", 10) == ["gone"]
+
+    err = FileNotFoundError("HTTP 404 Not Found: /v1/readside/vehicle/gone")
+    error_class = encar_worker.classify_error(err)
+    assert error_class == "permanent"
+    encar_db.set_error(con, "gone", str(err), error_class, **encar_worker.RETRY_POLICY[error_class])
+
+    status, retry_count, next_at = con.execute(
+        "SELECT status, retry_count, next_attempt_at FROM car_queue WHERE car_id='gone'"
+    ).fetchone()
+    assert (status, retry_count, next_at) == ("ERROR", 1, None)
+    # 예약 시각이 지나도 다시 잡히지 않음
+    with con:
+        con.execute("UPDATE car_queue SET updated_at=datetime('now', '-30 days')")
+    assert encar_db.claim_batch(con, "w", 10) == []
+
+
+def test_transient_error_is_rescheduled(con):
+    """Transient errors still get a next_attempt_at and come back once it is due"""
+    encar_db.seed_one(con, "slow")
+    encar_db.claim_batch(con, "w", 10)
+    encar_db.set_error(con, "slow", "HTTP 503", "transient", **encar_worker.RETRY_POLICY["transient"])
+
+    assert con.execute("SELECT next_attempt_at FROM car_queue WHERE car_id='slow'").fetchone()[0] is not None
+    with con:
+        con.execute("UPDATE car_queue SET next_attempt_at=datetime('now', '-1 seconds')")
+    assert encar_db.claim_batch(con, "w", 10) == ["slow"]
@@ -0,0 +1,57 @@
+import re
+
+import encar_seed_queue as sq
+
+
+class RangeListClient:
+    """List stub over cars spread evenly over mileage honouring the Mileage range and sr offset/limit"""
+
+    def __init__(self, n_cars, step):
+        self.cars = [{"Id": f"car{i}", "Mileage": i * step} for i in range(n_cars)]
+        self.requests = []
+
+    def get_json(self, params):
+        lo, hi = map(int, re.search(r"Mileage\.range\((\d+)\.\.(\d+)\)", params["q"]).groups())
+        _, _, offset, limit = params["sr"].split("|")
+        hits = [c for c in self.cars if lo <= c["Mileage"] <= hi]
+        self.requests.append((lo, hi, int(offset), int(limit), len(hits)))
+        return {"Count": len(hits), "SearchResults": hits[int(offset):int(offset) + int(limit)]}
+
+
+def test_year_split_stays_in_real_model_years():
+    """Year bisection starts from realistic model years, keeping both ends open so no listing is dropped"""
+    part = {"maker_key": "hyundai", "maker_kr": "현대", "mileage": (0, 100), "year": None}
+    lower, upper = sq.split_partition(part)
+    assert lower["year"][0] == sq.YEAR_RANGE[0] and upper["year"][1] == sq.YEAR_RANGE[1]
+    assert sq.YEAR_SPLIT_FIRST <= lower["year"][1] // 100 < sq.YEAR_SPLIT_LAST
+
+    depth, stack = 0, [(lower, 1), (upper, 1)]
+    while stack:
+        p, d = stack.pop()
+        depth = max(depth, d)
+        children = sq.split_partition(p)
+        if children:
+            stack.extend((c, d + 1) for c in children)
+    assert depth <= 7
+
+
+def test_oversized_children_are_probed_small(seed_con, monkeypatch):
+    """Partitions expected to split get a PROBE_LIMIT first request; every car is still read in full pages"""
+    monkeypatch.setattr(sq, "PARTITION_MAX_TOTAL", 10)
+    monkeypatch.setattr(sq, "LIMIT", 5)
+    monkeypatch.setattr(sq, "PROBE_LIMIT", 1)
+    monkeypatch.setattr(sq, "MIN_MILEAGE_SPAN", 1)
+    con = seed_con
+    run_id, _ = sq.start_run(con, "serial")
+    client = RangeListClient(n_cars=80, step=2500)
+
+    sq.seed_one_maker(con, client, run_id, "hyundai", "현대")
+
+    assert con.execute("SELECT COUNT(*) FROM car_state").fetchone()[0] == 80
+    assert sq.maker_completeness(con, run_id, {"hyundai": "현대"})["hyundai"]["complete"]
+    # 분할된 partition마다 full 첫 페이지를 버리던 것 -> 힌트가 빗나간 경우(+ root)만
+    split = con.execute("SELECT COUNT(*) FROM seed_partition WHERE run_id=? AND split=1", (run_id,)).fetchone()[0]
+    wasted = [r for r in client.requests if r[2] == 0 and r[3] == sq.LIMIT and r[4] > sq.PARTITION_MAX_TOTAL]
+    assert split >= 6
+    assert len(wasted) <= split // 3
+    assert any(r[3] == sq.PROBE_LIMIT for r in client.requests)
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+import encar_seed_queue as sq
+
+
+@pytest.fixture
+def makers_con(seed_con):
+    # 어제(2026-01-01) 게시: hyundai a1/a2, kia b1/b2, 제조사 모름 n1
+    con = seed_con
+    with con:
+        con.execute("INSERT INTO seed_days(day, cars) VALUES('2026-01-01', 4)")
+        con.executemany(
+            "INSERT INTO car_state(car_id, status, maker_key) VALUES(?, 'ACTIVE', ?)",
+            [("a1", "hyundai"), ("a2", "hyundai"), ("b1", "kia"), ("b2", "kia"), ("n1", None)],
+        )
+        con.executemany(
+            "INSERT INTO car_presence(car_id, start_day, end_day) VALUES(?, '2026-01-01', '2026-01-01')",
+            [("a1",), ("a2",), ("b1",), ("b2",), ("n1",)],
+        )
+        # 오늘 스냅샷: hyundai는 끝까지 읽었고 a2가 빠짐, kia는 잘려서 b1만 보임
+        con.executemany("INSERT INTO car_snapshot_today(car_id) VALUES(?)", [("a1",), ("b1",)])
+    return con
+
+
+def end_days(con):
+    return dict(con.execute("SELECT car_id, end_day FROM car_presence"))
+
+
+def test_presence_scoped_to_complete_makers(makers_con):
+    """Cars missing from an incomplete maker's snapshot keep their open stint; complete makers close it"""
+    con = makers_con
+    with con:
+        sq.finalize_inactive(con, ["hyundai"], False)
+        extended, started = sq.record_presence(con, "2026-01-02", ["hyundai"], False)
+
+    assert end_days(con) == {
+        "a1": "2026-01-02",
+        "a2": "2026-01-01",
+        "b1": "2026-01-02",
+        "b2": "2026-01-02",
+        "n1": "2026-01-02",
+    }
+    assert (extended, started) == (4, 0)
+
+
+def test_presence_all_complete_closes_missing(makers_con):
+    con = makers_con
+    with con:
+        sq.finalize_inactive(con, ["hyundai", "kia"], True)
+        sq.record_presence(con, "2026-01-02", ["hyundai", "kia"], True)
+
+    days = end_days(con)
+    assert [k for k, v in sorted(days.items()) if v == "2026-01-02"] == ["a1", "b1"]
+
+
+def test_presence_no_complete_maker_extends_all(makers_con):
+    con = makers_con
+    with con:
+        sq.finalize_inactive(con, [], False)
+        sq.record_presence(con, "2026-01-02", [], False)
+
+    assert set(end_days(con).values()) == {"2026-01-02"}
+
+
+def test_supply_by_day_matches_per_day_count(seed_con):
+    """supply_by_day counts spans covering each recorded day (inclusive ends), only for days in range"""
+    con = seed_con
+    days = [f"2026-02-{d:02d}" for d in range(1, 29) if d % 5]  # 기록이 빠진 날도 있음
+    rnd = random.Random(7)
+    spans = []
+    for i in range(300):
+        a, b = sorted(rnd.sample(range(len(days)), 2)) if i % 4 else (i % len(days),) * 2
+        spans.append((f"c{i}", days[a], days[b]))
+    with con:
+        con.executemany("INSERT INTO seed_days(day, cars) VALUES(?, 0)", [(d,) for d in days])
+        con.executemany("INSERT INTO car_presence(car_id, start_day, end_day) VALUES(?, ?, ?)", spans)
+
+    lo, hi = "2026-02-03", "2026-02-25"
+    expected = [(d, sum(1 for _, s, e in spans if s <= d <= e)) for d in days if lo <= d <= hi]
+    assert sq.supply_by_day(con, lo, hi) == expected
+    assert sq.supply_by_day(con, "2026-03-01", "2026-03-31") == []
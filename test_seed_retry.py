@@ -0,0 +1,43 @@
+import pytest
+
+import encar_seed_queue as sq
+
+
+class FlakyListClient:
+    """List stub: each (q, sr) request fails `failures` times before answering; 3 cars per root partition"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.seen = {}
+        self.answered = 0
+
+    def get_json(self, params):
+        key = (params["q"], params["sr"])
+        self.seen[key] = self.seen.get(key, 0) + 1
+        if self.seen[key] <= self.failures:
+            raise RuntimeError("GET failed: 502")
+        self.answered += 1
+        return {"Count": 3, "SearchResults": [{"Id": f"{self.answered}-{i}"} for i in range(3)]}
+
+
+def test_serial_mode_retries_failed_page(seed_con):
+    """Serial seeding retries a failed page PARTITION_RETRIES times, like the parallel path"""
+    con = seed_con
+    run_id, _ = sq.start_run(con, "serial")
+    client = FlakyListClient(failures=sq.PARTITION_RETRIES)
+
+    new_state = sq.seed_one_maker(con, client, run_id, "hyundai", "현대")[0]
+
+    assert new_state == 6
+    assert all(n == sq.PARTITION_RETRIES + 1 for n in client.seen.values())
+    assert sq.maker_completeness(con, run_id, {"hyundai": "현대"})["hyundai"]["complete"]
+
+
+def test_serial_mode_gives_up_after_retries(seed_con):
+    con = seed_con
+    run_id, _ = sq.start_run(con, "serial")
+    client = FlakyListClient(failures=sq.PARTITION_RETRIES + 1)
+
+    with pytest.raises(RuntimeError):
+        sq.seed_one_maker(con, client, run_id, "hyundai", "현대")
+    assert list(client.seen.values()) == [sq.PARTITION_RETRIES + 1]
@@ -0,0 +1,58 @@
+import encar_seed_queue as sq
+
+
+class FakeListClient:
+    """List stub: ModifiedDate 최신순으로 total건, 페이지는 sr의 offset으로 자름"""
+
+    def __init__(self, total, newest_day=28):
+        self.items = [
+            {"Id": str(1000 + i), "ModifiedDate": f"2026-01-{newest_day - i // 4:02d} 00:00:{59 - i % 4:02d}"}
+            for i in range(total)
+        ]
+        self.calls = 0
+
+    def get_json(self, params):
+        self.calls += 1
+        offset = int(params["sr"].split("|")[2])
+        return {"SearchResults": self.items[offset:offset + sq.INCREMENTAL_LIMIT]}
+
+
+def test_watermark_kept_when_page_cap_hit(seed_con, monkeypatch):
+    """Stopping on INCREMENTAL_MAX_PAGES before the old watermark must not advance it (listings in between would be skipped)"""
+    monkeypatch.setattr(sq, "INCREMENTAL_LIMIT", 10)
+    monkeypatch.setattr(sq, "INCREMENTAL_MAX_PAGES", 2)
+    con = seed_con
+    sq.set_watermark(con, "hyundai", "2026-01-01 00:00:00")
+
+    client = FakeListClient(total=60)
+    r = sq.seed_one_maker_incremental(con, client, "hyundai", "현대")
+
+    assert r[4] == 2
+    assert sq.get_watermark(con, "hyundai") == "2026-01-01 00:00:00"
+
+
+def test_watermark_advances_when_old_watermark_reached(seed_con, monkeypatch):
+    monkeypatch.setattr(sq, "INCREMENTAL_LIMIT", 10)
+    monkeypatch.setattr(sq, "INCREMENTAL_MAX_PAGES", 5)
+    con = seed_con
+    sq.set_watermark(con, "hyundai", "2026-01-26 00:00:00")
+
+    client = FakeListClient(total=60)
+    r = sq.seed_one_maker_incremental(con, client, "hyundai", "현대")
+
+    assert r[4] == 2
+    assert sq.get_watermark(con, "hyundai") == client.items[0]["ModifiedDate"]
+
+
+def test_watermark_advances_when_results_run_out(seed_con, monkeypatch):
+    monkeypatch.setattr(sq, "INCREMENTAL_LIMIT", 10)
+    monkeypatch.setattr(sq, "INCREMENTAL_MAX_PAGES", 5)
+    con = seed_con
+    sq.set_watermark(con, "hyundai", "2026-01-01 00:00:00")
+
+    client = FakeListClient(total=25)
+    r = sq.seed_one_maker_incremental(con, client, "hyundai", "현대")
+
+    assert r[4] == 3
+    assert client.calls == 3
+    assert sq.get_watermark(con, "hyundai") == client.items[0]["ModifiedDate"]
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from encar_worker import ResultWriter, SellerCache, fetch_car_async
+
+
+class FakeAsyncClient:
+    """Async client stub: every car belongs to dealer D1, options for car 'bad' fail"""
+
+    def __init__(self):
+        self.user_calls = 0
+
+    async def get_json(self, url, family="vehicle"):
+        if family == "vehicle":
+            return {"contact": {"userId": "D1"}}
+        if family == "user":
+            self.user_calls += 1
+            await asyncio.sleep(0.05)
+            return {"userId": "D1", "name": "dealer"}
+        if family == "options":
+            if "/car/bad/" in url:
+                raise RuntimeError("options failed")
+            await asyncio.sleep(0.01)
+            return []
+        return {}
+
+
+@pytest.fixture
+def env(worker_db):
+    con = worker_db
+    sellers = SellerCache(con)
+    writer = ResultWriter(flush_size=1000, flush_sec=0.05,
+                          on_user_saved=sellers.mark_fetched, on_user_failed=sellers.forget)
+    sellers.on_fetched = writer.submit_user
+    return con, sellers, writer
+
+
+def test_seller_saved_when_owner_car_fails(env):
+    """The car that started the seller request fails; the profile is still stored and waiters get it"""
+    con, sellers, writer = env
+    client = FakeAsyncClient()
+    writer.start()
+
+    async def run():
+        return await asyncio.gather(
+            *(fetch_car_async(client, cid, sellers) for cid in ["bad", "c2", "c3"]),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    writer.close()
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1]["user"] == ("D1", {"userId": "D1", "name": "dealer"})
+    assert results[2]["user"] == ("D1", {"userId": "D1", "name": "dealer"})
+    assert client.user_calls == 1
+    assert con.execute("SELECT COUNT(*) FROM user_raw WHERE user_id='D1'").fetchone()[0] == 1
+    assert sellers.pending == {}
+    assert sellers.is_fresh("D1")
+
+
+def test_seller_cached_only_after_commit(env):
+    """Until the writer commits, the seller is pending (not in the LRU); a failed save lets it be fetched again"""
+    con, sellers, writer = env
+
+    sellers.submit("D2", {"userId": "D2"})
+    assert "D2" in sellers.pending
+    assert "D2" not in sellers._lru
+
+    writer.start()
+    writer.close()
+    assert "D2" in sellers._lru
+    assert con.execute("SELECT COUNT(*) FROM user_raw WHERE user_id='D2'").fetchone()[0] == 1
+
+    sellers.pending["D3"] = {}
+    sellers.forget("D3")
+    assert not sellers.is_fresh("D3")
+
+
+def test_preload_keeps_most_recent_sellers(con):
+    """preload picks the most recently fetched sellers, with the newest at the LRU's recent end"""
+    with con:
+        con.executemany(
+            "INSERT INTO user_raw(user_id, payload, fetched_at) VALUES(?, '{}', datetime('now', ?))",
+            [(f"U{i}", f"-{i} minutes") for i in range(10)],
+        )
+
+    sellers = SellerCache(con, ttl_sec=3600, max_size=3)
+    assert sellers.preload(limit=100) == 3
+    assert list(sellers._lru) == ["U2", "U1", "U0"]
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import encar_db
+import encar_worker
+from encar_worker import ResultWriter, SellerCache, run_async
+
+
+class FakeAsyncClient:
+    """Every car belongs to its own dealer so each car needs a seller lookup"""
+
+    def __init__(self, concurrency=1):
+        pass
+
+    async def get_json(self, url, family="vehicle"):
+        await asyncio.sleep(0)
+        if family == "vehicle":
+            return {"contact": {"userId": "D" + url.rstrip("/").split("/")[-1][-2:]}}
+        if family == "user":
+            return {"name": "dealer"}
+        return {}
+
+    async def aclose(self):
+        pass
+
+
+def test_run_async_keeps_the_loop_free(worker_db, db_path, monkeypatch):
+    """A full writer queue, claim() and seller DB lookups must not block the event loop"""
+    # SellerCache의 DB 조회는 worker-db 스레드에서 돎 (main처럼 check_same_thread=False 커넥션)
+    con = encar_db.connect(db_path, check_same_thread=False)
+    monkeypatch.setattr(encar_worker, "AsyncEncarClient", FakeAsyncClient)
+
+    loop_threads = set()
+    db_threads = []
+    batches = [[f"c{i:02d}" for i in range(12)]]
+
+    def claim():
+        db_threads.append(threading.current_thread().name)
+        return batches.pop() if batches else []
+
+    db_fresh = SellerCache._db_fresh
+
+    def tracked_db_fresh(self, user_id):
+        db_threads.append(threading.current_thread().name)
+        return db_fresh(self, user_id)
+
+    monkeypatch.setattr(SellerCache, "_db_fresh", tracked_db_fresh)
+    sellers = SellerCache(con)
+    # flush_size=1 -> 큐 4칸, writer는 아직 안 돌아서 곧 가득 참
+    writer = ResultWriter(flush_size=1, flush_sec=0.0, on_user_saved=sellers.mark_fetched,
+                          on_user_failed=sellers.forget)
+    sellers.on_fetched = writer.submit_user
+    ticks = []
+
+    async def ticker():
+        loop_threads.add(threading.current_thread().name)
+        while len(ticks) < 20:
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+        writer.start()
+
+    async def run():
+        await asyncio.gather(run_async(claim, writer, sellers, concurrency=4), ticker())
+
+    t = threading.Thread(target=lambda: asyncio.run(run()), daemon=True)
+    t.start()
+    t.join(timeout=20)
+    assert not t.is_alive(), "event loop was blocked"
+    writer.close()
+
+    assert len(ticks) == 20
+    assert db_threads and not (set(db_threads) & loop_threads)
+    assert all(name.startswith("worker-db") for name in db_threads)
+    assert con.execute("SELECT COUNT(*) FROM user_raw").fetchone()[0] == 12
+    assert sellers.on_fetched == writer.submit_user and sellers.db_executor is None
@@ -0,0 +1,62 @@
+import encar_db
+import encar_worker
+from encar_worker import ResultWriter, make_claimer
+
+FETCHED = {"vehicle": {}, "inspection": {"_meta": "NOT_FOUND"}, "record": None, "options": [], "user": None}
+
+
+def queue_rows(con):
+    return {r[0]: (r[1], r[2]) for r in con.execute("SELECT car_id, status, worker_id FROM car_queue")}
+
+
+def test_reaped_worker_cannot_overwrite_new_owner(worker_db):
+    """A worker whose lease expired and was re-claimed elsewhere must not write DONE/ERROR over the new owner"""
+    con = worker_db
+    for cid in ("c1", "c2", "c3"):
+        encar_db.seed_one(con, cid)
+    assert sorted(encar_db.claim_batch(con, "A", 10)) == ["c1", "c2", "c3"]
+
+    # A의 lease 만료 -> reaper -> B가 c1, c2를 다시 가져감
+    with con:
+        con.execute("UPDATE car_queue SET lease_until=datetime('now', '-1 seconds')")
+    encar_db.reap_expired_leases(con)
+    with con:
+        con.execute("UPDATE car_queue SET status='RUNNING', worker_id='A' WHERE car_id='c3'")
+    assert sorted(encar_db.claim_batch(con, "B", 2)) == ["c1", "c2"]
+
+    writer = ResultWriter(flush_size=100, flush_sec=0.05, worker_id="A").start()
+    writer.submit_done("c1", FETCHED)
+    writer.submit_error("c2", "HTTP 502", "transient")
+    writer.submit_done("c3", FETCHED)
+    writer.close()
+
+    assert queue_rows(con) == {"c1": ("RUNNING", "B"), "c2": ("RUNNING", "B"), "c3": ("DONE", None)}
+    assert writer.stats["done"] == 1 and writer.stats["error"] == 0 and writer.stats["lease_lost"] == 2
+
+
+def test_claim_renews_leases_and_reaps_periodically(con, monkeypatch):
+    monkeypatch.setattr(encar_worker, "CLAIM_SIZE", 1)
+    monkeypatch.setattr(encar_worker, "REAP_INTERVAL_SEC", 0)
+    for cid in ("c1", "c2"):
+        encar_db.seed_one(con, cid)
+    with con:
+        con.execute(
+            "INSERT INTO car_queue(car_id, status, worker_id, lease_until) "
+            "VALUES('dead', 'RUNNING', 'X', datetime('now', '-1 seconds'))"
+        )
+
+    claim = make_claimer(con, "A", 10)
+    first = claim()
+    with con:
+        con.execute("UPDATE car_queue SET lease_until=datetime('now', '+1 seconds') WHERE worker_id='A'")
+    second = claim()
+
+    assert len(first) == 1 and len(second) == 1
+    # 죽은 워커 몫은 실행 중에 회수됨
+    assert queue_rows(con)["dead"][0] in ("PENDING", "RUNNING")
+    assert queue_rows(con)["dead"][1] != "X"
+    # 처음 가져간 차량의 lease는 claim 때 다시 LEASE_SEC만큼 연장됨
+    left = con.execute(
+        "SELECT (julianday(lease_until) - julianday('now')) * 86400 FROM car_queue WHERE car_id=?", (first[0],)
+    ).fetchone()[0]
+    assert left > encar_db.LEASE_SEC - 60